@@ -1,14 +1,296 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
 import random
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timezone
+from typing import Callable
 
 from fastapi import HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
-from backend.models import Game, Session as GameSession
+from backend.models import Game, Session as GameSession, SessionRevocation
+from backend.realtime import REALTIME_BROKER, broker, publish_control_after_commit
 
 SESSION_COOKIE_NAME = "session_token"
 SESSION_COOKIE_MAX_AGE = 60 * 60 * 24 * 30  # 30 days
 
+# Logouts and player deletions reach other workers' caches only through a cross-worker
+# broker, so the cache is on by default only with one. With the memory broker, set
+# SESSION_CACHE_SIZE only for single-worker deployments.
+SESSION_CACHE_SIZE = int(
+    os.environ.get("SESSION_CACHE_SIZE", "10000" if REALTIME_BROKER == "postgres" else "0")
+)  # 0 disables the cache
+SESSION_CACHE_TTL = float(os.environ.get("SESSION_CACHE_TTL", "60"))  # seconds
+
+# Signed session cookies: the cookie also carries the caller's game memberships,
+# HMAC-signed with SECRET_KEY, so authorizing a request needs no sessions lookup.
+# The sessions table stays the source of truth; revocations are checked in memory.
+SECRET_KEY = os.environ.get("SECRET_KEY", "")
+SIGNED_SESSIONS = os.environ.get("SIGNED_SESSIONS", "0") == "1"
+SIGNED_SESSION_MAX_GAMES = int(os.environ.get("SIGNED_SESSION_MAX_GAMES", "20"))  # keeps the cookie < 1 KB
+REVOCATION_REFRESH = float(os.environ.get("REVOCATION_REFRESH", str(SESSION_CACHE_TTL)))  # seconds
+
+if SIGNED_SESSIONS and not SECRET_KEY:
+    raise RuntimeError("SIGNED_SESSIONS=1 requires SECRET_KEY")
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedSession:
+    token: str
+    game_id: int
+    role: str  # 'host' | 'player'
+    player_id: int | None
+
+
+class SessionCache:
+    """
+    Bounded LRU of resolved `(token, game_id)` sessions with a TTL.
+
+    Only successful lookups are cached. Invalidations are sent through the realtime
+    broker after commit, so with REALTIME_BROKER=postgres every worker drops the
+    entry; the TTL bounds staleness if a message is ever lost.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, int], tuple[float, ResolvedSession]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lookup_listeners: list[Callable[[bool], None]] = []
+
+    def add_lookup_listener(self, listener: Callable[[bool], None]) -> None:
+        """Call `listener(hit)` after every lookup (backend.metrics exports them)."""
+        self._lookup_listeners.append(listener)
+
+    def get(self, token: str, game_id: int) -> ResolvedSession | None:
+        if self.max_size <= 0:
+            return None
+        key = (token, game_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                session = None
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                session = entry[1]
+        for listener in self._lookup_listeners:
+            listener(session is not None)
+        return session
+
+    def put(self, session: ResolvedSession) -> None:
+        if self.max_size <= 0:
+            return
+        key = (session.token, session.game_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, session)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_token(self, token: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == token]:
+                del self._entries[key]
+
+    def invalidate_game(self, game_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == game_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def handle_control(self, message: dict) -> None:
+        if message.get("kind") != "session_cache":
+            return
+        if "token" in message:
+            self.invalidate_token(message["token"])
+        if "game_id" in message:
+            self.invalidate_game(message["game_id"])
+
+
+session_cache = SessionCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+broker.add_control_handler(session_cache.handle_control)
+
+
+@dataclass(frozen=True, slots=True)
+class SessionClaims:
+    token: str
+    issued_at: int
+    games: dict[int, tuple[str, int | None]]  # game_id -> (role, player_id)
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _signature(body: str) -> str:
+    return _b64encode(hmac.new(SECRET_KEY.encode(), body.encode(), hashlib.sha256).digest())
+
+
+def encode_session_cookie(token: str, games: list[tuple[int, str, int | None]], issued_at: int) -> str:
+    """`token.claims.signature`; roles are abbreviated to their first letter."""
+    claims = json.dumps([issued_at, [[game_id, role[0], player_id] for game_id, role, player_id in games]])
+    body = f"{token}.{_b64encode(claims.replace(' ', '').encode())}"
+    return f"{body}.{_signature(body)}"
+
+
+def decode_session_cookie(value: str) -> SessionClaims | None:
+    """Claims of a signed cookie, or None if it is unsigned, forged or past SESSION_COOKIE_MAX_AGE."""
+    parts = value.split(".")
+    if len(parts) != 3 or not SECRET_KEY:
+        return None
+    token, claims, signature = parts
+    # As bytes: compare_digest rejects non-ASCII str, and cookies arrive decoded as latin-1
+    if not hmac.compare_digest(signature.encode(), _signature(f"{token}.{claims}").encode()):
+        return None
+    try:
+        issued_at, games = json.loads(_b64decode(claims))
+    except ValueError:
+        return None
+    if issued_at + SESSION_COOKIE_MAX_AGE < time.time():
+        return None
+    roles = {"h": "host", "p": "player"}
+    return SessionClaims(
+        token=token,
+        issued_at=issued_at,
+        games={game_id: (roles[role], player_id) for game_id, role, player_id in games},
+    )
+
+
+class RevocationList:
+    """
+    Tokens and games whose signed claims issued at or before a given time are void.
+
+    Revocations reach every worker as control messages; `refresh` also reads new
+    rows of `session_revocations` every `interval` seconds, so workers that missed
+    a message or started later catch up. Claims that are revoked are not trusted
+    and the request falls back to the sessions table.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._tokens: dict[str, float] = {}
+        self._games: dict[int, float] = {}
+        self._last_id = 0
+        self._next_refresh = 0.0
+
+    def revoke(self, token: str | None = None, game_id: int | None = None, at: float | None = None) -> None:
+        at = time.time() if at is None else at
+        with self._lock:
+            if token is not None:
+                self._tokens[token] = max(at, self._tokens.get(token, 0.0))
+            if game_id is not None:
+                self._games[game_id] = max(at, self._games.get(game_id, 0.0))
+
+    def is_revoked(self, claims: SessionClaims, game_id: int) -> bool:
+        with self._lock:
+            return (
+                self._tokens.get(claims.token, -1.0) >= claims.issued_at
+                or self._games.get(game_id, -1.0) >= claims.issued_at
+            )
+
+    def refresh(self, db: Session) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_refresh:
+                return
+            self._next_refresh = now + self.interval
+            last_id = self._last_id
+        rows = (
+            db.query(
+                SessionRevocation.id, SessionRevocation.token, SessionRevocation.game_id, SessionRevocation.revoked_at
+            )
+            .filter(SessionRevocation.id > last_id)
+            .order_by(SessionRevocation.id)
+            .all()
+        )
+        for _, token, game_id, revoked_at in rows:
+            if revoked_at.tzinfo is None:
+                revoked_at = revoked_at.replace(tzinfo=timezone.utc)
+            self.revoke(token, game_id, revoked_at.timestamp())
+        with self._lock:
+            if rows:
+                self._last_id = max(self._last_id, rows[-1][0])
+            # Claims older than the cookie lifetime are rejected anyway
+            horizon = time.time() - SESSION_COOKIE_MAX_AGE
+            self._tokens = {k: v for k, v in self._tokens.items() if v >= horizon}
+            self._games = {k: v for k, v in self._games.items() if v >= horizon}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._games.clear()
+            self._last_id = 0
+            self._next_refresh = 0.0
+
+    def handle_control(self, message: dict) -> None:
+        if message.get("kind") == "session_cache":
+            self.revoke(message.get("token"), message.get("game_id"))
+
+
+revocations = RevocationList(REVOCATION_REFRESH)
+broker.add_control_handler(revocations.handle_control)
+
+
+def invalidate_token_sessions(db: Session, token: str) -> None:
+    if SIGNED_SESSIONS:
+        db.add(SessionRevocation(token=token))
+    publish_control_after_commit(db, {"kind": "session_cache", "token": token})
+
+
+def invalidate_game_sessions(db: Session, game_id: int) -> None:
+    if SIGNED_SESSIONS:
+        db.add(SessionRevocation(game_id=game_id))
+    publish_control_after_commit(db, {"kind": "session_cache", "game_id": game_id})
+
+
+def session_cookie_value(db: Session, token: str) -> str:
+    """Cookie value for `token`: the token itself, or with SIGNED_SESSIONS its signed game claims."""
+    if not SIGNED_SESSIONS:
+        return token
+    games = (
+        db.query(GameSession.game_id, GameSession.role, GameSession.player_id)
+        .filter(GameSession.token == token)
+        .order_by(GameSession.created_at.desc())
+        .limit(SIGNED_SESSION_MAX_GAMES)
+        .all()
+    )
+    return encode_session_cookie(token, [tuple(row) for row in games], int(time.time()))
+
 
 def _unauthorized(detail: str = "Authentication required") -> HTTPException:
     return HTTPException(status_code=401, detail={"error": "Unauthorized", "message": detail})
@@ -19,7 +301,9 @@ def _forbidden(detail: str = "Host role required") -> HTTPException:
 
 
 def get_cookie_token(request: Request) -> str | None:
-    return request.cookies.get(SESSION_COOKIE_NAME)
+    value = request.cookies.get(SESSION_COOKIE_NAME)
+    # Signed cookies start with the token; tokens are UUIDs and never contain a dot
+    return value.split(".", 1)[0] if value else value
 
 
 def require_cookie_token(request: Request) -> str:
@@ -29,46 +313,115 @@ def require_cookie_token(request: Request) -> str:
     return token
 
 
-def resolve_session_for_game(db: Session, request: Request, game_id: int, required: bool = True) -> GameSession | None:
+def resolve_session_for_game(
+    db: Session, request: Request, game_id: int, required: bool = True
+) -> ResolvedSession | None:
     token = get_cookie_token(request)
     if not token:
         if required:
             raise _unauthorized()
         return None
 
-    session = (
-        db.query(GameSession)
+    if SIGNED_SESSIONS:
+        claims = decode_session_cookie(request.cookies[SESSION_COOKIE_NAME])
+        claim = claims.games.get(game_id) if claims is not None else None
+        if claim is not None:
+            revocations.refresh(db)
+            if not revocations.is_revoked(claims, game_id):
+                return ResolvedSession(token=token, game_id=game_id, role=claim[0], player_id=claim[1])
+
+    cached = session_cache.get(token, game_id)
+    if cached is not None:
+        return cached
+
+    row = (
+        db.query(GameSession.role, GameSession.player_id)
         .filter(GameSession.token == token, GameSession.game_id == game_id)
         .first()
     )
-    if required and not session:
-        raise _unauthorized("No session for this game")
+    if not row:
+        if required:
+            raise _unauthorized("No session for this game")
+        return None
+
+    session = ResolvedSession(token=token, game_id=game_id, role=row[0], player_id=row[1])
+    session_cache.put(session)
     return session
 
 
-def require_game_session(db: Session, request: Request, game_id: int) -> GameSession:
+def require_game_session(db: Session, request: Request, game_id: int) -> ResolvedSession:
     session = resolve_session_for_game(db, request, game_id, required=True)
     assert session is not None
     return session
 
 
-def require_host_session(db: Session, request: Request, game_id: int) -> GameSession:
+def require_host_session(db: Session, request: Request, game_id: int) -> ResolvedSession:
     session = require_game_session(db, request, game_id)
     if session.role != "host":
         raise _forbidden()
     return session
 
 
-def generate_pin(db: Session, max_attempts: int = 100) -> str:
-    for _ in range(max_attempts):
-        candidate = str(random.randint(100000, 999999))
-        conflict = (
-            db.query(Game)
-            .filter(Game.pin == candidate, Game.status == "active")
-            .first()
-        )
-        if not conflict:
-            return candidate
+PIN_MIN, PIN_MAX = 100000, 999999
+# Random guesses before searching for a gap; at 90% occupancy each guess still has
+# a 10% chance, and the gap search handles anything denser
+PIN_RANDOM_ATTEMPTS = 8
+PIN_WINDOW = 2048
+
+
+def _free_pin_near(db: Session, start: int) -> str | None:
+    """An unused active PIN from the first window at or after `start` that has one, wrapping around."""
+    windows = -(-(PIN_MAX - PIN_MIN + 1) // PIN_WINDOW)
+    first = (start - PIN_MIN) // PIN_WINDOW
+    for i in range(windows):
+        low = PIN_MIN + (first + i) % windows * PIN_WINDOW
+        high = min(low + PIN_WINDOW, PIN_MAX + 1)
+        # Same-length digit strings compare like the numbers, so this is a range scan of ix_games_pin_status
+        taken = {
+            int(pin)
+            for (pin,) in db.query(Game.pin).filter(
+                Game.pin >= str(low), Game.pin < str(high), Game.status == "active"
+            )
+        }
+        free = [pin for pin in range(low, high) if pin not in taken]
+        if free:
+            return str(random.choice(free))
+    return None
+
+
+def _insert_if_pin_free(db: Session, values: dict) -> Game | None:
+    # ON CONFLICT is spelled the same way by both dialects we run on
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = (
+        insert(Game)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=[Game.pin], index_where=text("status = 'active'"))
+        .returning(Game)
+    )
+    return db.scalars(stmt).first()
+
+
+def insert_game_with_pin(db: Session, **values) -> Game:
+    """
+    Insert a game built from `values` with a PIN no other active game holds, and return it.
+
+    Each candidate is inserted with ON CONFLICT DO NOTHING against the
+    uq_games_active_pin index, so concurrent creates cannot both take a PIN, no
+    lookup precedes the insert and a collision leaves the transaction usable.
+    (A savepoint would not do: with pysqlite, one opened before the transaction's
+    first write commits on release.) Random candidates are tried first; after
+    PIN_RANDOM_ATTEMPTS collisions a free PIN is read from a window of the index.
+    """
+    for attempt in range(PIN_RANDOM_ATTEMPTS + 3):
+        if attempt < PIN_RANDOM_ATTEMPTS:
+            pin = str(random.randint(PIN_MIN, PIN_MAX))
+        else:
+            pin = _free_pin_near(db, random.randint(PIN_MIN, PIN_MAX))
+            if pin is None:
+                break
+        game = _insert_if_pin_free(db, {**values, "pin": pin})
+        if game is not None:
+            return game
     raise HTTPException(
         status_code=503,
         detail={"error": "ServiceUnavailable", "message": "Unable to allocate game PIN"},
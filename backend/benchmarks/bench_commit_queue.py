@@ -0,0 +1,172 @@
+"""
+Write throughput with and without the SQLite commit queue.
+
+Seeds games as bench_api does, then drives a write-only mix (buy-ins, chip
+counts, joins) through the real FastAPI app, once with per-request commits and
+once through backend.commit_queue. Each mode runs in --processes worker processes
+against the same database file, like uvicorn workers sharing one SQLite file.
+Reports throughput, p50/p99 latency, failed requests (e.g. "database is locked"
+after the busy timeout) and the average group-commit batch.
+
+Run with:
+    uv run python -m backend.benchmarks.bench_commit_queue
+    uv run python -m backend.benchmarks.bench_commit_queue --processes 2 --concurrency 32 --window-ms 1
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+MODES = ("per-request", "queued")
+
+
+def _operations(games, rng: random.Random):
+    from backend.benchmarks.bench_api import _cookie
+
+    active = [g for g in games if g.status == "active"]
+
+    async def transact(client: httpx.AsyncClient) -> httpx.Response:
+        game = rng.choice(active)
+        return await client.post(
+            "/api/transactions/",
+            json={"game_id": game.id, "player_id": rng.choice(game.player_ids), "type": "buy_in", "chips": 100},
+            headers=_cookie(game.host_token),
+        )
+
+    async def chips(client: httpx.AsyncClient) -> httpx.Response:
+        game = rng.choice(active)
+        return await client.patch(
+            f"/api/players/{rng.choice(game.player_ids)}/chips",
+            json={"actual_chips": rng.randint(0, 500)},
+            headers=_cookie(game.host_token),
+        )
+
+    async def join(client: httpx.AsyncClient) -> httpx.Response:
+        game = rng.choice(active)
+        return await client.post(
+            "/api/games/join", json={"pin": game.pin, "player_name": "Walk-in"}, headers=_cookie(str(uuid.uuid4()))
+        )
+
+    return [transact] * 6 + [chips] * 3 + [join]
+
+
+async def _drive(app, games, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    operations = _operations(games, rng)
+    latencies: list[float] = []
+    failed = 0
+    remaining = iter(range(requests))
+
+    # Unhandled errors ("database is locked") become 500s, as under uvicorn
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker() -> None:
+            nonlocal failed
+            for _ in remaining:
+                start = time.perf_counter()
+                res = await rng.choice(operations)(client)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if res.status_code >= 400:
+                    failed += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"latencies": latencies, "failed": failed, "elapsed": elapsed}
+
+
+def _worker(mode: str, games, requests: int, concurrency: int, seed: int, window: float, barrier, results) -> None:
+    import logging
+
+    from backend import commit_queue as queue_module
+    from backend.database import SQLALCHEMY_DATABASE_URL
+    from backend.main import app
+
+    # Failed requests are counted; their tracebacks would only drown the report
+    logging.disable(logging.ERROR)
+    queue = queue_module.CommitQueue(SQLALCHEMY_DATABASE_URL, window=window) if mode == "queued" else None
+    queue_module.commit_queue = queue
+    barrier.wait()
+    result = asyncio.run(_drive(app, games, requests, concurrency, seed))
+    if queue is not None:
+        queue.stop()
+        result["batch"] = queue.stats()["avg_batch"]
+    results.put(result)
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def run_mode(mode: str, games, args) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(args.processes)
+    results = ctx.Queue()
+    per_process = args.requests // args.processes
+    processes = [
+        ctx.Process(
+            target=_worker,
+            args=(mode, games, per_process, args.concurrency, args.seed + i, args.window_ms / 1000, barrier, results),
+        )
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(ms for outcome in outcomes for ms in outcome["latencies"])
+    batches = [outcome["batch"] for outcome in outcomes if "batch" in outcome]
+    return {
+        "requests": len(latencies),
+        "failed": sum(outcome["failed"] for outcome in outcomes),
+        "rps": round(len(latencies) / max(outcome["elapsed"] for outcome in outcomes), 1),
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3),
+        "avg_batch": round(sum(batches) / len(batches), 2) if batches else 1.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100, help="Games to seed")
+    parser.add_argument("--requests", type=int, default=2000, help="Write requests per mode, over all processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests per process")
+    parser.add_argument("--processes", type=int, default=2, help="Worker processes sharing the database")
+    parser.add_argument("--window-ms", type=float, default=0.0, help="Group-commit window (DB_COMMIT_WINDOW_MS)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # SQLite only; spawned workers inherit the variable and bind their engines to it
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/commit-queue.db"
+        from backend.benchmarks.bench_api import _seed
+        from backend.database import engine
+        from backend.migrations import migrate
+
+        migrate(engine)
+        games = _seed(args.games, random.Random(args.seed))
+        engine.dispose()
+
+        print(f"{'mode':<11} | {'req/s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | {'batch':>5} | failed")
+        for mode in MODES:
+            row = run_mode(mode, games, args)
+            print(
+                f"{mode:<11} | {row['rps']:>8.1f} | {row['p50_ms']:>8.2f} | {row['p99_ms']:>8.2f} | "
+                f"{row['avg_batch']:>5} | {row['failed']}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Compare the per-player stats query path against lazy-loading every transaction.
+
+Run with:
+    uv run python -m backend.benchmarks.bench_player_stats
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend.models import Game, Player, Transaction
+from backend.reconcile import reconcile
+from backend.services.stats import get_player_totals
+
+PLAYERS_PER_GAME = 10
+
+
+def _legacy_totals(db, game_id: int) -> list[tuple[int, int, int]]:
+    game = db.query(Game).filter(Game.id == game_id).first()
+    return [
+        (
+            p.id,
+            sum(t.chips for t in p.transactions if t.type == "buy_in"),
+            sum(t.chips for t in p.transactions if t.type == "cash_out"),
+        )
+        for p in game.players
+    ]
+
+
+def _aggregate_totals(db, game_id: int) -> list[tuple[int, int, int]]:
+    db.query(Game).filter(Game.id == game_id).first()
+    return [(p.id, p.buy_in_chips, p.cash_out_chips) for p in get_player_totals(db, game_id)]
+
+
+def _seed(session_factory, transaction_count: int) -> int:
+    rng = random.Random(transaction_count)
+    db = session_factory()
+    game = Game(name=f"bench-{transaction_count}", pin=f"{100000 + transaction_count}", chip_value=0.5)
+    db.add(game)
+    db.flush()
+    players = [Player(game_id=game.id, name=f"P{i}") for i in range(PLAYERS_PER_GAME)]
+    db.add_all(players)
+    db.flush()
+    db.add_all(
+        Transaction(
+            game_id=game.id,
+            player_id=rng.choice(players).id,
+            type="buy_in" if rng.random() < 0.8 else "cash_out",
+            chips=rng.choice((50, 100, 200)),
+        )
+        for _ in range(transaction_count)
+    )
+    db.commit()
+    reconcile(db, game.id)
+    game_id = game.id
+    db.close()
+    return game_id
+
+
+def _measure(session_factory, statements: list[int], fn, game_id: int, iterations: int) -> dict:
+    timings = []
+    query_counts = []
+    result = None
+    for _ in range(iterations):
+        db = session_factory()
+        before = statements[0]
+        start = time.perf_counter()
+        result = fn(db, game_id)
+        timings.append((time.perf_counter() - start) * 1000)
+        query_counts.append(statements[0] - before)
+        db.close()
+    timings.sort()
+    return {
+        "queries": max(query_counts),
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(0.95 * (len(timings) - 1))],
+        "result": sorted(result),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_):
+        statements[0] += 1
+
+    print(f"{'txns':>6} | {'path':<9} | {'queries':>7} | {'p50 ms':>8} | {'p95 ms':>8}")
+    for size in args.sizes:
+        game_id = _seed(session_factory, size)
+        legacy = _measure(session_factory, statements, _legacy_totals, game_id, args.iterations)
+        aggregate = _measure(session_factory, statements, _aggregate_totals, game_id, args.iterations)
+        assert legacy["result"] == aggregate["result"], "aggregate totals diverge from legacy path"
+        for label, row in (("legacy", legacy), ("aggregate", aggregate)):
+            print(f"{size:>6} | {label:<9} | {row['queries']:>7} | {row['p50_ms']:>8.3f} | {row['p95_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Serialization cost of the large read responses: FastAPI's response_model path
+(validate, then encode) against rendering the handler's models directly (FAST_JSON).
+
+Seeds one game with 50 players and 5,000 transactions and measures GameDetail,
+SettlementOut and a 50-game list[GameOut].
+
+Run with:
+    uv run python -m backend.benchmarks.bench_serialization
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend.models import Game, Player, Transaction
+from backend.reconcile import reconcile
+from backend.responses import PydanticJSONResponse
+from backend.routers.games import _serialize_game_out, router
+from backend.schemas import GameDetail
+from backend.services.settlement import build_settlement
+from backend.services.stats import compute_player_stats, get_player_totals
+
+PLAYERS = 50
+TRANSACTIONS = 5000
+
+
+def _seed(db) -> Game:
+    rng = random.Random(0)
+    game = Game(name="bench", pin="100000", chip_value=0.5, status="closed")
+    db.add(game)
+    db.flush()
+    players = [Player(game_id=game.id, name=f"P{i}", actual_chips=rng.randint(0, 400)) for i in range(PLAYERS)]
+    db.add_all(players)
+    db.flush()
+    db.add_all(
+        Transaction(game_id=game.id, player_id=rng.choice(players).id, type="buy_in", chips=rng.choice((50, 100)))
+        for _ in range(TRANSACTIONS)
+    )
+    db.commit()
+    reconcile(db)
+    return game
+
+
+def _response_field(path: str):
+    return next(route.response_field for route in router.routes if route.path == path and "GET" in route.methods)
+
+
+def _time(fn, iterations: int) -> tuple[float, int]:
+    timings = []
+    size = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        size = len(fn().body)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    game = _seed(db)
+
+    stats = [compute_player_stats(p, game.chip_value) for p in get_player_totals(db, game.id)]
+    detail = GameDetail(
+        **_serialize_game_out(game, role="host").model_dump(),
+        session_player_id=None,
+        players=stats,
+    )
+    cases = {
+        "GameDetail": (detail, _response_field("/games/{game_id}")),
+        "SettlementOut": (build_settlement(db, game), _response_field("/games/{game_id}/settlement")),
+        "list[GameOut]": ([_serialize_game_out(game, role="player")] * PLAYERS, _response_field("/games/")),
+    }
+
+    loop = asyncio.new_event_loop()
+
+    def default_path(content, field):
+        return lambda: JSONResponse(
+            loop.run_until_complete(serialize_response(field=field, response_content=content))
+        )
+
+    def fast_path(content):
+        return lambda: PydanticJSONResponse(content)
+
+    print(f"{'response':<14} | {'bytes':>6} | {'default ms':>10} | {'fast ms':>8} | speedup")
+    for label, (content, field) in cases.items():
+        default_ms, size = _time(default_path(content, field), args.iterations)
+        fast_ms, fast_size = _time(fast_path(content), args.iterations)
+        assert size == fast_size, f"{label}: encodings differ"
+        print(f"{label:<14} | {size:>6} | {default_ms:>10.3f} | {fast_ms:>8.3f} | {default_ms / fast_ms:>6.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
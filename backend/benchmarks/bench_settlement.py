@@ -0,0 +1,46 @@
+"""
+Compare the settlement engine against plain greedy matching.
+
+Run with:
+    uv run python -m backend.benchmarks.bench_settlement
+    uv run python -m backend.benchmarks.bench_settlement --players 10 50 500 --iterations 50
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from backend.services.settlement import _greedy, settle_cents
+
+
+def _table(rng: random.Random, players: int) -> dict[str, int]:
+    cents = [rng.choice((-1, 1)) * rng.randint(1, 40) * rng.choice((5, 25, 100)) for _ in range(players - 1)]
+    cents.append(-sum(cents))
+    return {f"P{i}": amount for i, amount in enumerate(cents)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, nargs="+", default=[6, 10, 14, 16, 50, 200, 500])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'players':>7} | {'greedy xfers':>12} | {'engine xfers':>12} | {'p50 ms':>8} | {'max ms':>8}")
+    for players in args.players:
+        rng = random.Random(players)
+        greedy_counts, engine_counts, timings = [], [], []
+        for _ in range(args.iterations):
+            balances = _table(rng, players)
+            greedy_counts.append(len(_greedy(list(balances.items()))))
+            start = time.perf_counter()
+            engine_counts.append(len(settle_cents(balances)))
+            timings.append((time.perf_counter() - start) * 1000)
+        print(
+            f"{players:>7} | {statistics.mean(greedy_counts):>12.1f} | {statistics.mean(engine_counts):>12.1f} | "
+            f"{statistics.median(timings):>8.2f} | {max(timings):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+
+from fastapi import Request, Response
+
+# Responses depend on the session cookie, so shared caches must not store them
+CACHE_REVALIDATE = "private, no-cache"
+# Closed games reject every change to players, chips and transactions, so their
+# settlement never changes (the blind value a host may still edit is not part of it)
+SETTLEMENT_MAX_AGE = int(os.environ.get("SETTLEMENT_MAX_AGE", "3600"))
+CACHE_IMMUTABLE = f"private, max-age={SETTLEMENT_MAX_AGE}, immutable"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def not_modified(etag: str, cache_control: str = CACHE_REVALIDATE) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
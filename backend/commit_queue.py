@@ -0,0 +1,191 @@
+"""
+Single-writer commit queue for SQLite (DB_COMMIT_QUEUE=1).
+
+SQLite admits one writer at a time. With per-request commits, concurrent writes
+queue on the database lock (or fail with "database is locked" once the busy
+timeout runs out) and each pays for its own commit. With the queue on, the
+mutating routes hand their unit of work to one writer thread per process
+instead of running it in the threadpool. The writer takes whatever units are
+pending, waits up to DB_COMMIT_WINDOW_MS for more (at most DB_COMMIT_MAX_BATCH),
+and runs them in one BEGIN IMMEDIATE transaction that it commits once. Under
+load the units that arrive while a batch commits already form the next one, so
+the window defaults to 0.
+
+Each unit gets its own Session joined to that transaction in savepoint mode: its
+`db.commit()` releases a savepoint and its rollback, or an exception such as a
+404, undoes only its own work. The writer's connections run pysqlite without
+implicit transactions, so these savepoints nest inside the explicit BEGIN rather
+than committing on release. Realtime events and control messages are held back
+until the batch commits; if the commit fails, every unit of the batch fails.
+
+Other workers' writers still take turns on the database lock, once per batch
+rather than once per request.
+"""
+
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from backend.database import IS_SQLITE, SQLALCHEMY_DATABASE_URL, configure_sqlite, instrument_queries, run_db
+from backend.realtime import defer_publishing, publish_deferred
+
+DB_COMMIT_QUEUE = os.environ.get("DB_COMMIT_QUEUE", "0") == "1"
+DB_COMMIT_WINDOW_MS = float(os.environ.get("DB_COMMIT_WINDOW_MS", "0"))
+DB_COMMIT_MAX_BATCH = int(os.environ.get("DB_COMMIT_MAX_BATCH", "64"))
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "context", "future")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        # Statements are attributed to the submitting request's QueryStats
+        self.context = contextvars.copy_context()
+        self.future: Future = Future()
+
+
+def create_writer_engine(url: str):
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        configure_sqlite(dbapi_connection, connection_record)
+        # No implicit BEGIN from pysqlite; _begin issues it, so savepoints nest
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        # Take the write lock up front: reads in the batch never need to upgrade it
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    instrument_queries(engine)
+    return engine
+
+
+class CommitQueue:
+    def __init__(self, url: str, window: float = DB_COMMIT_WINDOW_MS / 1000, max_batch: int = DB_COMMIT_MAX_BATCH):
+        self.engine = create_writer_engine(url)
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: queue.Queue[_Job | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.batches = 0
+        self.units = 0
+        self.failed_commits = 0
+        self.max_batch_seen = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="commit-queue", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Finish the queued units, then stop the writer."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+        self.engine.dispose()
+
+    async def submit(self, fn, *args, **kwargs):
+        """Run `fn(session, *args, **kwargs)` in the next batch and return its result."""
+        self.start()
+        job = _Job(fn, args, kwargs)
+        self._queue.put(job)
+        return await asyncio.wrap_future(job.future)
+
+    def stats(self) -> dict[str, float | int]:
+        return {
+            "batches": self.batches,
+            "units": self.units,
+            "avg_batch": round(self.units / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch_seen,
+            "failed_commits": self.failed_commits,
+            "pending": self._queue.qsize(),
+        }
+
+    def _next_batch(self) -> tuple[list[_Job], bool]:
+        job = self._queue.get()
+        if job is None:
+            return [], True
+        batch = [job]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch: list[_Job]) -> None:
+        results: list[tuple[_Job, object]] = []
+        deferred: list = []
+        try:
+            with self.engine.begin() as conn:
+                for job in batch:
+                    if not job.future.set_running_or_notify_cancel():
+                        continue  # the request went away while queued
+                    db = Session(bind=conn, autoflush=False, join_transaction_mode="create_savepoint")
+                    held = defer_publishing(db)
+                    try:
+                        result = job.context.run(job.fn, db, *job.args, **job.kwargs)
+                    except BaseException as exc:
+                        job.future.set_exception(exc)
+                        continue
+                    finally:
+                        db.close()
+                    results.append((job, result))
+                    deferred.extend(held)
+        except BaseException as exc:
+            self.failed_commits += 1
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(exc)
+            return
+        finally:
+            self.batches += 1
+            self.units += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+        publish_deferred(deferred)
+        for job, result in results:
+            job.future.set_result(result)
+
+
+# One writer per process, created on first use
+commit_queue = CommitQueue(SQLALCHEMY_DATABASE_URL) if DB_COMMIT_QUEUE and IS_SQLITE else None
+
+
+async def run_write(db, fn, *args, **kwargs):
+    """`run_db` for units of work that write: through the commit queue when it is enabled."""
+    if commit_queue is not None:
+        return await commit_queue.submit(fn, *args, **kwargs)
+    return await run_db(db, fn, *args, **kwargs)
@@ -0,0 +1,156 @@
+"""
+Response compression.
+
+Brotli is used when the `brotli` package is installed (`uv sync --extra brotli`)
+and the client accepts it; otherwise gzip. Bodies smaller than
+COMPRESSION_MIN_SIZE, event streams and already-encoded responses are sent as-is.
+
+A plain ASGI middleware on Starlette's public datastructures only, so it does not
+depend on the internals of a particular Starlette release.
+"""
+
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional extra
+    brotli = None
+
+COMPRESSION = os.environ.get("COMPRESSION", "1") == "1"
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "500"))
+# Moderate levels: most of the size win for a fraction of the CPU of the maximums
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+
+# Media type prefixes that are streamed (SSE must not be buffered) or already compressed
+EXCLUDED_CONTENT_TYPES = (
+    "text/event-stream",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zip",
+    "audio/",
+    "font/woff",
+    "image/",
+    "video/",
+)
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Codings listed in an Accept-Encoding header, minus any refused with q=0."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding)
+    return accepted
+
+
+class _GzipCompressor:
+    """zlib in gzip framing, with brotli.Compressor's process/flush/finish interface."""
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Compresses responses with brotli when available and accepted, otherwise gzip."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        compresslevel: int = GZIP_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.brotli_quality = brotli_quality
+
+    def choose_encoding(self, accept_encoding: str) -> str | None:
+        accepted = accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compressor(self, encoding: str):
+        if encoding == "br":
+            return brotli.Compressor(quality=self.brotli_quality)
+        return _GzipCompressor(self.compresslevel)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.choose_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        # The start message is held back until the first body chunk decides the headers
+        start: Message | None = None
+        passthrough = False
+        compressor = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough, compressor
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] == 206
+                    or media_type.startswith(EXCLUDED_CONTENT_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                # File sends, trailers and early hints go out unchanged
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is not None:
+                    compressor = self._compressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    body = compressor.process(body) + (compressor.flush() if more_body else compressor.finish())
+                    if more_body or start.get("trailers", False):
+                        del headers["Content-Length"]
+                    else:
+                        headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+            elif compressor is not None:
+                body = compressor.process(body) + (compressor.flush() if more_body else compressor.finish())
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
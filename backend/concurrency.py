@@ -0,0 +1,106 @@
+"""
+Optimistic concurrency for player counters.
+
+`Player.version` is the mapper's version_id_col: every ORM UPDATE or DELETE of a
+player matches on the version that was read and bumps it, and SQLAlchemy raises
+StaleDataError when another transaction changed the row first. Write paths read
+without row locks and validate (e.g. enough chips to cash out) against what they
+read, and `retry_on_conflict` re-runs the whole unit of work in a new transaction
+when that read turned out stale. This holds on SQLite too, where
+SELECT ... FOR UPDATE is a no-op.
+
+Single buy-ins and cash-outs, the hot path, skip the read: one conditional
+UPDATE applies the change and checks the cash-out limit against the current row
+(routers.transactions._apply_to_player), so they never retry. Every mutation of
+a game still bumps `games.version`, which orders a game's writes for ETags, the
+in-memory game state and the change log; on PostgreSQL writes to one game
+therefore commit one at a time, holding that row lock only from the bump to the
+commit.
+
+The retry is not narrowed to a savepoint around the player UPDATE: with pysqlite
+a SAVEPOINT opened before the transaction's first write commits on release.
+
+With DB_ASYNC=1 the unit of work runs through AsyncSession.run_sync on the event
+loop thread, so the backoff awaits asyncio.sleep there instead of blocking the
+worker.
+"""
+
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.util import await_only
+
+OPTIMISTIC_RETRIES = int(os.environ.get("OPTIMISTIC_RETRIES", "50"))
+# Jittered backoff between attempts, doubling up to the cap
+OPTIMISTIC_BACKOFF = float(os.environ.get("OPTIMISTIC_BACKOFF", "0.001"))
+OPTIMISTIC_BACKOFF_MAX = float(os.environ.get("OPTIMISTIC_BACKOFF_MAX", "0.02"))
+
+
+class ConflictStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.conflicts = 0
+        self.exhausted = 0
+
+    def record(self, attempts: int, conflicts: int, exhausted: bool) -> None:
+        with self._lock:
+            self.attempts += attempts
+            self.conflicts += conflicts
+            self.exhausted += exhausted
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {"attempts": self.attempts, "conflicts": self.conflicts, "exhausted": self.exhausted}
+
+    def clear(self) -> None:
+        with self._lock:
+            self.attempts = self.conflicts = self.exhausted = 0
+
+
+conflict_stats = ConflictStats()
+
+
+def _backoff(db: Session, delay: float) -> float:
+    pause = random.uniform(0, delay)
+    if db.get_bind().dialect.is_async:
+        # Inside run_sync's greenlet: let the event loop serve other requests meanwhile
+        await_only(asyncio.sleep(pause))
+    else:
+        time.sleep(pause)
+    return min(delay * 2, OPTIMISTIC_BACKOFF_MAX)
+
+
+def _too_many_conflicts() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={"error": "Conflict", "message": "Too many concurrent updates, please retry"},
+    )
+
+
+def retry_on_conflict(fn):
+    """Re-run `fn(db, ...)` in a new transaction whenever a versioned write lost a race."""
+
+    @functools.wraps(fn)
+    def wrapper(db: Session, *args, **kwargs):
+        delay = OPTIMISTIC_BACKOFF
+        for attempt in range(1, OPTIMISTIC_RETRIES + 1):
+            try:
+                result = fn(db, *args, **kwargs)
+            except StaleDataError:
+                db.rollback()
+                delay = _backoff(db, delay)
+                continue
+            conflict_stats.record(attempt, attempt - 1, False)
+            return result
+        conflict_stats.record(OPTIMISTIC_RETRIES, OPTIMISTIC_RETRIES, True)
+        raise _too_many_conflicts()
+
+    return wrapper
@@ -1,57 +1,285 @@
 import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Callable
 
-from sqlalchemy import create_engine, inspect, text
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.concurrency import run_in_threadpool
 
 SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./cashtable.db")
 
-connect_args = {}
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    connect_args["check_same_thread"] = False
+# Pool sizing applies per uvicorn worker
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+# Behind PgBouncer (transaction pooling) let the bouncer pool and avoid session state
+DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", "0") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = server default
+DB_APPLICATION_NAME = os.environ.get("DB_APPLICATION_NAME", "cashtable")
+# Serve requests from an AsyncSession (asyncpg / aiosqlite) instead of the threadpool
+DB_ASYNC = os.environ.get("DB_ASYNC", "0") == "1"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args=connect_args,
-)
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+IS_POSTGRES = SQLALCHEMY_DATABASE_URL.startswith("postgresql")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+class PoolMetrics:
+    """Checkout wait time and in-use connection counts for the engine's pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._wait_listeners: list[Callable[[float], None]] = []
+        self._in_use_listeners: list[Callable[[int], None]] = []
+
+    def add_wait_listener(self, listener: Callable[[float], None]) -> None:
+        """Call `listener(seconds)` after every checkout wait (backend.metrics exports them)."""
+        self._wait_listeners.append(listener)
+
+    def add_in_use_listener(self, listener: Callable[[int], None]) -> None:
+        """Call `listener(in_use)` whenever the number of checked-out connections changes."""
+        self._in_use_listeners.append(listener)
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+        for listener in self._wait_listeners:
+            listener(seconds)
+
+    def checked_out(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            in_use = self.in_use
+        for listener in self._in_use_listeners:
+            listener(in_use)
+
+    def checked_in(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+            in_use = self.in_use
+        for listener in self._in_use_listeners:
+            listener(in_use)
+
+    def snapshot(self) -> dict[str, float | int]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "wait_total_ms": round(self.wait_total * 1000, 3),
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_avg_ms": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class QueryStats:
+    """SQL statements run on behalf of one request, and their total duration in seconds."""
+
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Set per request by backend.instrumentation; follows the request into the threadpool
+# (run_in_threadpool copies the context) and into AsyncSession greenlets
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+def instrument_queries(sync_engine) -> None:
+    """Attribute every statement executed on `sync_engine` to the current request's QueryStats."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_query_stats.get()
+        if stats is None:
+            return
+        stats.count += 1
+        started = getattr(context, "_query_started", None)
+        if started is not None:
+            stats.duration += time.perf_counter() - started
+
+
+class _TimedCheckout:
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """Async-engine counterpart of TimedQueuePool."""
+
 
+def _async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}[backend]
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
 
-def ensure_runtime_schema():
-    inspector = inspect(engine)
-    table_names = set(inspector.get_table_names())
 
-    if "games" not in table_names:
-        return
+def _engine_options(use_async: bool = False) -> dict:
+    connect_args: dict = {}
+    options: dict = {"connect_args": connect_args}
 
-    game_columns = {column["name"] for column in inspector.get_columns("games")}
-    if "pin" in game_columns:
-        return
+    if IS_SQLITE:
+        if not use_async:
+            connect_args["check_same_thread"] = False
+        if ":memory:" in SQLALCHEMY_DATABASE_URL or SQLALCHEMY_DATABASE_URL in ("sqlite://", "sqlite:///"):
+            # In-memory databases keep SQLAlchemy's per-thread pool
+            return options
 
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE games ADD COLUMN pin VARCHAR(6)"))
-        rows = conn.execute(text("SELECT id FROM games ORDER BY id")).all()
+    if IS_POSTGRES and use_async:
+        server_settings = {"application_name": DB_APPLICATION_NAME}
+        if DB_STATEMENT_TIMEOUT_MS and not DB_PGBOUNCER:
+            server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+        connect_args["server_settings"] = server_settings
+        if DB_PGBOUNCER:
+            # asyncpg prepares every statement; transaction pooling needs that disabled
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    elif IS_POSTGRES:
+        connect_args["application_name"] = DB_APPLICATION_NAME
+        # PgBouncer rejects the `options` startup parameter; set statement_timeout on the role instead
+        if DB_STATEMENT_TIMEOUT_MS and not DB_PGBOUNCER:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
 
-        used: set[str] = set()
-        for row in rows:
-            game_id = row[0]
-            candidate = str(100000 + (game_id % 900000))
-            while candidate in used:
-                candidate = str(((int(candidate) - 100000 + 1) % 900000) + 100000)
-            used.add(candidate)
-            conn.execute(
-                text("UPDATE games SET pin = :pin WHERE id = :game_id"),
-                {"pin": candidate, "game_id": game_id},
-            )
+    if DB_PGBOUNCER:
+        # psycopg2 never creates server-side prepared statements, so NullPool is all
+        # transaction pooling needs here
+        options["poolclass"] = NullPool
+        return options
 
-        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_games_pin ON games (pin)"))
+    options.update(
+        poolclass=TimedAsyncQueuePool if use_async else TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
 
 
-def get_db():
-    db = SessionLocal()
+def configure_sqlite(dbapi_connection, connection_record) -> None:
+    # WAL lets readers proceed during a write; NORMAL skips the fsync per commit that
+    # WAL makes unnecessary for durability against application crashes
+    cursor = dbapi_connection.cursor()
     try:
-        yield db
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
     finally:
-        db.close()
+        cursor.close()
+
+
+def _instrument_engine(sync_engine) -> None:
+    if IS_SQLITE:
+        event.listen(sync_engine, "connect", configure_sqlite)
+
+    instrument_queries(sync_engine)
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.checked_out()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        pool_metrics.checked_in()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options())
+_instrument_engine(engine)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Route handlers accept either; see run_db
+DbSession = Session | AsyncSession
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        _async_database_url(SQLALCHEMY_DATABASE_URL), **_engine_options(use_async=True)
+    )
+    _instrument_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+
+def pool_status() -> dict:
+    pool = async_engine.pool if async_engine is not None else engine.pool
+    status = {"pool": pool.status(), **pool_metrics.snapshot()}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), overflow=pool.overflow(), checked_out=pool.checkedout())
+    return status
+
+
+Base = declarative_base()
+
+
+if DB_ASYNC:
+
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+else:
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Run synchronous ORM code `fn(session, *args, **kwargs)` without blocking the event loop.
+
+    With an AsyncSession the function runs through `run_sync` on the async driver, so no
+    threadpool slot is held while waiting on the database; a plain Session (the default,
+    and what the tests use) runs in the threadpool as sync routes always did.
+    """
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return await db.run_sync(fn, *args, **kwargs)
+
+
+async def close_db(db) -> None:
+    if isinstance(db, Session):
+        await run_in_threadpool(db.close)
+    else:
+        await db.close()
@@ -0,0 +1,156 @@
+"""
+In-memory state of active games (GAME_STATE_CACHE_SIZE > 0).
+
+An active table's whole state is a handful of players with their running chip
+counters. Each worker keeps the state of its most recently used active games as
+slotted GameState/PlayerState objects, so GET /games/{id} answers from memory
+after the one games-row read it makes anyway, and buy-ins and cash-outs validate
+without reading the player.
+
+The database stays authoritative and every write is still committed before the
+request returns. Each GameState carries the `games.version` it reflects, and
+every mutation bumps that version (services.changes.record_change), so a state
+is used only when its version equals the row just read. That keeps workers
+consistent without game-to-worker affinity: a change made by another worker,
+a script or a rolled-back batch simply makes the local state stale, and the
+next read rebuilds it from `players` with one indexed query, as after a
+restart. Writes that change one player (buy-ins, cash-outs, chip counts) move
+the local state forward after commit instead of discarding it.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from backend.models import Game, Player
+from backend.realtime import call_after_commit
+
+GAME_STATE_CACHE_SIZE = int(os.environ.get("GAME_STATE_CACHE_SIZE", "0"))  # games per worker; 0 disables
+
+
+class PlayerState:
+    __slots__ = ("id", "name", "actual_chips", "buy_in_chips", "cash_out_chips", "version")
+
+    def __init__(self, id: int, name: str, actual_chips: int | None, buy_in_chips: int, cash_out_chips: int, version: int):
+        self.id = id
+        self.name = name
+        self.actual_chips = actual_chips
+        self.buy_in_chips = buy_in_chips
+        self.cash_out_chips = cash_out_chips
+        self.version = version
+
+    @classmethod
+    def of(cls, player: Player) -> "PlayerState":
+        return cls(
+            player.id, player.name, player.actual_chips, player.buy_in_chips, player.cash_out_chips, player.version
+        )
+
+
+class GameState:
+    """One game's players at `version`; treated as immutable once published."""
+
+    __slots__ = ("game_id", "created_at", "version", "players")
+
+    def __init__(self, game_id: int, created_at: datetime, version: int, players: dict[int, PlayerState]):
+        self.game_id = game_id
+        # SQLite may hand a deleted game's id to the next one; this tells them apart
+        self.created_at = created_at
+        self.version = version
+        # Ordered by id, like get_player_totals
+        self.players = players
+
+
+class GameStateStore:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._games: OrderedDict[int, GameState] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.advances = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def cached(self, game: Game) -> GameState | None:
+        """The state of `game` at the version just read, if this worker has it."""
+        if not self.enabled or game.status != "active":
+            return None
+        with self._lock:
+            state = self._games.get(game.id)
+            if state is None or state.version != game.version or state.created_at != game.created_at:
+                return None
+            self._games.move_to_end(game.id)
+            self.hits += 1
+            return state
+
+    def get(self, db: Session, game: Game) -> GameState:
+        """The state of active `game`, rebuilt from `players` unless cached at its version."""
+        state = self.cached(game)
+        if state is not None:
+            return state
+        rows = (
+            db.query(
+                Player.id,
+                Player.name,
+                Player.actual_chips,
+                Player.buy_in_chips,
+                Player.cash_out_chips,
+                Player.version,
+            )
+            .filter(Player.game_id == game.id)
+            .order_by(Player.id)
+        )
+        state = GameState(game.id, game.created_at, game.version, {row[0]: PlayerState(*row) for row in rows})
+        with self._lock:
+            self.misses += 1
+            current = self._games.get(game.id)
+            # A concurrent reader or writer may have stored a newer one meanwhile
+            if current is None or current.version < state.version:
+                self._put(state)
+        return state
+
+    def advance_after_commit(self, db: Session, game_id: int, version: int, player: PlayerState) -> None:
+        """Once the change that produced `version` commits, apply `player`'s new values locally."""
+        if self.enabled:
+            call_after_commit(db, lambda: self._advance(game_id, version, player))
+
+    def _advance(self, game_id: int, version: int, player: PlayerState) -> None:
+        with self._lock:
+            state = self._games.get(game_id)
+            if state is None:
+                return
+            if state.version != version - 1 or player.id not in state.players:
+                # Missed a change made elsewhere; the next read rebuilds
+                del self._games[game_id]
+                return
+            # A new object, so readers iterating the old one are unaffected
+            self._put(GameState(game_id, state.created_at, version, {**state.players, player.id: player}))
+            self.advances += 1
+
+    def _put(self, state: GameState) -> None:
+        self._games[state.game_id] = state
+        self._games.move_to_end(state.game_id)
+        while len(self._games) > self.max_size:
+            self._games.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._games.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._games),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "advances": self.advances,
+            }
+
+
+game_states = GameStateStore(GAME_STATE_CACHE_SIZE)
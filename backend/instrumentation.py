@@ -0,0 +1,159 @@
+"""
+Per-request SQL instrumentation.
+
+QueryStatsMiddleware gives every HTTP request a QueryStats that the engine hooks
+in backend.database fill in. Outside production (DEBUG=1) the totals are returned
+as `X-Query-Count` and `Server-Timing` headers. Every request also feeds per-route
+histograms of query count and database time. They are logged as JSON under
+`backend.instrumentation` every INSTRUMENTATION_LOG_INTERVAL seconds and shown
+in /api/debug/stats, and the same measurements are exported to Prometheus
+through backend.metrics.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.database import QueryStats, current_query_stats
+from backend.metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENTATION_LOG_INTERVAL = float(os.environ.get("INSTRUMENTATION_LOG_INTERVAL", "60"))
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+DB_TIME_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram; not thread-safe on its own."""
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        cumulative, running = {}, 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            running += count
+            cumulative[f"le_{bound}"] = running
+        return {"count": self.count, "sum": round(self.total, 3), "buckets": cumulative}
+
+
+class RouteStats:
+    """Query-count and database-time histograms keyed by "METHOD /route/{template}"."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: dict[str, tuple[Histogram, Histogram]] = {}
+
+    def observe(self, route: str, stats: QueryStats) -> None:
+        with self._lock:
+            histograms = self._routes.get(route)
+            if histograms is None:
+                histograms = self._routes[route] = (Histogram(QUERY_COUNT_BUCKETS), Histogram(DB_TIME_BUCKETS_MS))
+            histograms[0].observe(stats.count)
+            histograms[1].observe(stats.duration * 1000)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                route: {"queries": queries.snapshot(), "db_ms": db_ms.snapshot()}
+                for route, (queries, db_ms) in sorted(self._routes.items())
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats()
+
+
+def route_template(scope: Scope) -> str:
+    # Templates, never raw paths, so ids do not multiply the label values
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+def route_label(scope: Scope) -> str:
+    return f"{scope['method']} {route_template(scope)}"
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, expose_headers: bool = False, log_interval: float = INSTRUMENTATION_LOG_INTERVAL):
+        self.app = app
+        self.expose_headers = expose_headers
+        self.log_interval = log_interval
+        self._next_log = time.monotonic() + log_interval
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def send_with_stats(message: Message) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = MutableHeaders(scope=message).get("content-type", "").startswith("text/event-stream")
+                if self.expose_headers:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(QUERY_COUNT_HEADER, str(stats.count))
+                    headers.append(
+                        "Server-Timing",
+                        f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", '
+                        f"app;dur={(time.perf_counter() - started) * 1000:.2f}",
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            route = route_label(scope)
+            route_stats.observe(route, stats)
+            observe_request(scope["method"], route_template(scope), status, None if streaming else elapsed, stats)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    json.dumps(
+                        {
+                            "event": "request",
+                            "route": route,
+                            "status": status,
+                            "queries": stats.count,
+                            "db_ms": round(stats.duration * 1000, 3),
+                            "total_ms": round(elapsed * 1000, 3),
+                        }
+                    )
+                )
+            self._maybe_log_histograms()
+
+    def _maybe_log_histograms(self) -> None:
+        now = time.monotonic()
+        if now < self._next_log:
+            return
+        self._next_log = now + self.log_interval
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"event": "route_histograms", "routes": route_stats.snapshot()}))
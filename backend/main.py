@@ -1,23 +1,56 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.database import Base, engine, ensure_runtime_schema
-from backend.routers import games, players, session, transactions
+from backend.commit_queue import commit_queue
+from backend.compression import COMPRESSION, CompressionMiddleware
+from backend.instrumentation import QueryStatsMiddleware
+from backend.metrics import METRICS, mark_worker_dead
+from backend.pagination import NEXT_CURSOR_HEADER
+from backend.realtime import broker
+from backend.routers import debug, events, games, metrics, players, session, transactions
+
+DEBUG = os.environ.get("DEBUG", "0") == "1"
+
 
-Base.metadata.create_all(bind=engine)
-ensure_runtime_schema()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    broker.start()
+    try:
+        yield
+    finally:
+        broker.stop()
+        if commit_queue is not None:
+            commit_queue.stop()
+        mark_worker_dead()
 
-app = FastAPI(title="CashTable API")
+
+app = FastAPI(title="CashTable API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
     allow_credentials=True,
 )
+# Query counts / timings as response headers only outside production
+app.add_middleware(QueryStatsMiddleware, expose_headers=DEBUG)
+if COMPRESSION:
+    app.add_middleware(CompressionMiddleware)
 
 app.include_router(games.router, prefix="/api")
 app.include_router(players.router, prefix="/api")
 app.include_router(transactions.router, prefix="/api")
 app.include_router(session.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
+
+# Outside /api, so the frontend proxy does not expose it
+if METRICS:
+    app.include_router(metrics.router)
+
+if DEBUG:
+    app.include_router(debug.router, prefix="/api")
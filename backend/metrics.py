@@ -0,0 +1,159 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Request counters and histograms are updated by QueryStatsMiddleware on every
+request. Gauges for active games and sessions come from one indexed count per
+METRICS_DB_REFRESH seconds rather than from each scrape; open event streams are
+counted as they open and close. Connection pool saturation (connections in use,
+overflow in use and checkout wait) is fed by database.pool_metrics as
+connections are checked out and returned. Session cache hits and misses are
+counted as auth.session_cache is consulted; each hit is a sessions lookup saved.
+
+Each uvicorn worker keeps its own values. With several workers set
+PROMETHEUS_MULTIPROC_DIR to an empty directory shared by them (Dockerfile.prod
+does): workers write their samples there and whichever worker answers the scrape
+aggregates all of them. Clear the directory when the server starts.
+"""
+
+import os
+import threading
+import time
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.auth import session_cache
+from backend.database import DB_POOL_SIZE, QueryStats, pool_metrics, pool_status
+from backend.models import Game, Session as GameSession
+
+METRICS = os.environ.get("METRICS", "1") == "1"
+METRICS_DB_REFRESH = float(os.environ.get("METRICS_DB_REFRESH", "30"))
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+http_requests = Counter(
+    "cashtable_http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+http_request_duration = Histogram(
+    "cashtable_http_request_duration_seconds",
+    "Time to handle an HTTP request (event streams excluded)",
+    ["method", "route"],
+)
+db_time = Histogram(
+    "cashtable_db_time_seconds", "Time spent in SQL per HTTP request", ["method", "route"], buckets=DB_TIME_BUCKETS
+)
+db_queries = Histogram(
+    "cashtable_db_queries_per_request",
+    "SQL statements per HTTP request",
+    ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+# Scrape-time values: every worker reports the same count, keep the latest
+active_games = Gauge("cashtable_active_games", "Games not yet closed", multiprocess_mode="mostrecent")
+active_sessions = Gauge(
+    "cashtable_active_sessions", "Host and player sessions of active games", multiprocess_mode="mostrecent"
+)
+# Per-worker values: sum over live workers
+open_event_streams = Gauge(
+    "cashtable_open_event_streams", "Connected Server-Sent Events clients", multiprocess_mode="livesum"
+)
+db_pool_size = Gauge("cashtable_db_pool_size", "Connections kept open by the pool", multiprocess_mode="livesum")
+db_pool_in_use = Gauge(
+    "cashtable_db_pool_connections_in_use", "Connections checked out of the pool", multiprocess_mode="livesum"
+)
+db_pool_overflow = Gauge(
+    "cashtable_db_pool_overflow_in_use",
+    "Checked-out connections beyond DB_POOL_SIZE (from DB_MAX_OVERFLOW)",
+    multiprocess_mode="livesum",
+)
+db_pool_wait = Histogram(
+    "cashtable_db_pool_checkout_wait_seconds", "Time spent waiting for a pool connection", buckets=POOL_WAIT_BUCKETS
+)
+session_cache_lookups = Counter(
+    "cashtable_session_cache_lookups_total", "Session cache lookups (misses query the sessions table)", ["result"]
+)
+
+
+def _observe_pool_in_use(in_use: int) -> None:
+    db_pool_in_use.set(in_use)
+    db_pool_overflow.set(max(in_use - DB_POOL_SIZE, 0))
+
+
+# Only QueuePool engines report a size (in-memory SQLite keeps one connection per thread)
+if "size" in pool_status():
+    db_pool_size.set(DB_POOL_SIZE)
+pool_metrics.add_in_use_listener(_observe_pool_in_use)
+pool_metrics.add_wait_listener(db_pool_wait.observe)
+# Created up front so both series are exported before the first lookup
+_session_cache_hits = session_cache_lookups.labels("hit")
+_session_cache_misses = session_cache_lookups.labels("miss")
+session_cache.add_lookup_listener(lambda hit: (_session_cache_hits if hit else _session_cache_misses).inc())
+
+
+def observe_request(method: str, route: str, status: int, seconds: float | None, stats: QueryStats) -> None:
+    """Record one finished request; `seconds` is None for long-lived streams."""
+    http_requests.labels(method, route, str(status)).inc()
+    if seconds is not None:
+        http_request_duration.labels(method, route).observe(seconds)
+    db_time.labels(method, route).observe(stats.duration)
+    db_queries.labels(method, route).observe(stats.count)
+
+
+class _DbGauges:
+    """Refreshes the table-derived gauges at most once per `interval` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_refresh = 0.0
+
+    def refresh(self, db: Session) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_refresh:
+                return
+            self._next_refresh = now + self.interval
+        # Both counts read only active games, which the partial unique index on
+        # (pin) WHERE status = 'active' and ix_sessions_game_id cover
+        active_games.set(db.query(func.count(Game.id)).filter(Game.status == "active").scalar())
+        active_sessions.set(
+            db.query(func.count(GameSession.token))
+            .join(Game, Game.id == GameSession.game_id)
+            .filter(Game.status == "active")
+            .scalar()
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._next_refresh = 0.0
+
+
+db_gauges = _DbGauges(METRICS_DB_REFRESH)
+
+
+def render(db: Session) -> bytes:
+    db_gauges.refresh(db)
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's per-process gauges from the aggregate on shutdown."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
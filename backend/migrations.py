@@ -0,0 +1,257 @@
+"""
+Versioned schema migrations.
+
+Run once per deploy, before any worker starts; workers never inspect the schema.
+
+Usage:
+    uv run python -m backend.migrations            # apply pending migrations
+    uv run python -m backend.migrations --status   # list migrations, exit 1 if any are pending
+
+Applied versions are recorded in `schema_migrations`. Migrations written before
+this table existed are idempotent, so databases upgraded by the old import-time
+schema check replay them harmlessly.
+"""
+
+import argparse
+import logging
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import Column, Connection, DateTime, Engine, Integer, MetaData, String, Table, inspect, select, text
+
+from backend.database import Base, engine as default_engine
+from backend.models import (
+    Game,
+    GameArchive,
+    GameChange,
+    Player,
+    Session,
+    SessionRevocation,
+    Settlement,
+    Transaction,
+)
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent runs apply migrations once
+_LOCK_KEY = 7_212_001
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, name: str):
+    def register(fn: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        assert not MIGRATIONS or MIGRATIONS[-1].version < version, "migrations must be declared in order"
+        MIGRATIONS.append(Migration(version, name, fn))
+        return fn
+
+    return register
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+@migration(1, "create_tables")
+def _create_tables(conn: Connection) -> None:
+    Base.metadata.create_all(
+        conn, tables=[Game.__table__, Player.__table__, Transaction.__table__, Session.__table__]
+    )
+
+
+@migration(2, "game_pin")
+def _game_pin(conn: Connection) -> None:
+    if "pin" in _columns(conn, "games"):
+        return
+    conn.execute(text("ALTER TABLE games ADD COLUMN pin VARCHAR(6)"))
+    # Unique for the first 900k games, far beyond any database that predates PINs
+    conn.execute(text("UPDATE games SET pin = CAST(100000 + (id % 900000) AS VARCHAR(6)) WHERE pin IS NULL"))
+
+
+@migration(3, "game_version")
+def _game_version(conn: Connection) -> None:
+    if "version" not in _columns(conn, "games"):
+        conn.execute(text("ALTER TABLE games ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+@migration(4, "player_chip_totals")
+def _player_chip_totals(conn: Connection) -> None:
+    player_columns = _columns(conn, "players")
+    if "buy_in_chips" in player_columns and "cash_out_chips" in player_columns:
+        return
+
+    for column in ("buy_in_chips", "cash_out_chips"):
+        if column not in player_columns:
+            conn.execute(text(f"ALTER TABLE players ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(
+        text(
+            """
+            UPDATE players SET
+                buy_in_chips = COALESCE((
+                    SELECT SUM(t.chips) FROM transactions t
+                    WHERE t.player_id = players.id AND t.type = 'buy_in'
+                ), 0),
+                cash_out_chips = COALESCE((
+                    SELECT SUM(t.chips) FROM transactions t
+                    WHERE t.player_id = players.id AND t.type = 'cash_out'
+                ), 0)
+            """
+        )
+    )
+
+
+@migration(5, "query_indexes")
+def _query_indexes(conn: Connection) -> None:
+    # Game creation relies on uq_games_active_pin (auth.insert_game_with_pin), so
+    # duplicates left by the old read-then-write PIN generator are resolved first
+    _repin_duplicate_active_games(conn)
+
+    inspector = inspect(conn)
+    for table in (Game.__table__, Player.__table__, Transaction.__table__, Session.__table__):
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+
+    # Superseded by the composite indexes above
+    for obsolete in ("ix_games_pin", "ix_sessions_token"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {obsolete}"))
+
+
+def _repin_duplicate_active_games(conn: Connection) -> None:
+    """Give every active game but the oldest of each shared PIN a new one."""
+    # Each round derives PINs from the id with a different offset, in case one
+    # lands on a PIN that is already taken
+    for offset in (0, 300_007, 600_011):
+        if not _has_duplicate_active_pins(conn):
+            return
+        repinned = conn.execute(
+            text(
+                """
+                UPDATE games SET pin = CAST(100000 + ((id + :offset) % 900000) AS VARCHAR(6))
+                WHERE status = 'active' AND EXISTS (
+                    SELECT 1 FROM games AS older
+                    WHERE older.status = 'active' AND older.pin = games.pin AND older.id < games.id
+                )
+                """
+            ),
+            {"offset": offset},
+        ).rowcount
+        logger.warning("Assigned new PINs to %d active games that shared one", repinned)
+    if _has_duplicate_active_pins(conn):
+        raise RuntimeError("Could not resolve duplicate active PINs; uq_games_active_pin cannot be created")
+
+
+def _has_duplicate_active_pins(conn: Connection) -> bool:
+    return (
+        conn.execute(
+            text("SELECT pin FROM games WHERE status = 'active' GROUP BY pin HAVING COUNT(*) > 1 LIMIT 1")
+        ).first()
+        is not None
+    )
+
+
+@migration(6, "settlements")
+def _settlements(conn: Connection) -> None:
+    Settlement.__table__.create(conn, checkfirst=True)
+
+
+@migration(7, "game_archives")
+def _game_archives(conn: Connection) -> None:
+    if "archived_at" not in _columns(conn, "games"):
+        conn.execute(text("ALTER TABLE games ADD COLUMN archived_at TIMESTAMP"))
+    GameArchive.__table__.create(conn, checkfirst=True)
+
+
+@migration(8, "session_revocations")
+def _session_revocations(conn: Connection) -> None:
+    SessionRevocation.__table__.create(conn, checkfirst=True)
+
+
+@migration(9, "player_version")
+def _player_version(conn: Connection) -> None:
+    if "version" not in _columns(conn, "players"):
+        conn.execute(text("ALTER TABLE players ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+@migration(10, "game_changes")
+def _game_changes(conn: Connection) -> None:
+    GameChange.__table__.create(conn, checkfirst=True)
+
+
+@migration(11, "transaction_insert_sentinel")
+def _transaction_insert_sentinel(conn: Connection) -> None:
+    if "_sentinel" not in _columns(conn, "transactions"):
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN _sentinel INTEGER"))
+
+
+def applied_versions(conn: Connection) -> set[int]:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return set()
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def migrate(engine: Engine = default_engine) -> list[Migration]:
+    """Apply every pending migration in order and return the ones applied."""
+    applied: list[Migration] = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        schema_migrations.create(conn, checkfirst=True)
+        done = applied_versions(conn)
+
+        for pending in MIGRATIONS:
+            if pending.version in done:
+                continue
+            logger.info("Applying migration %04d_%s", pending.version, pending.name)
+            pending.apply(conn)
+            conn.execute(
+                schema_migrations.insert().values(
+                    version=pending.version, name=pending.name, applied_at=datetime.now(timezone.utc)
+                )
+            )
+            applied.append(pending)
+    return applied
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="List migrations without applying them")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        with default_engine.connect() as conn:
+            done = applied_versions(conn)
+        for m in MIGRATIONS:
+            print(f"{'applied' if m.version in done else 'pending':<8} {m.version:04d}_{m.name}")
+        return 1 if any(m.version not in done for m in MIGRATIONS) else 0
+
+    applied = migrate()
+    for m in applied:
+        print(f"applied {m.version:04d}_{m.name}")
+    if not applied:
+        print("Schema is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,18 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    insert_sentinel,
+    text,
+)
 from sqlalchemy.orm import relationship
 
 from backend.database import Base
@@ -8,29 +20,56 @@ from backend.database import Base
 
 class Game(Base):
     __tablename__ = "games"
+    __table_args__ = (
+        # join_game_by_pin / PIN allocation look up (pin, status) with bound parameters,
+        # which the partial index below cannot serve
+        Index("ix_games_pin_status", "pin", "status"),
+        # At most one active game per PIN; insert_game_with_pin relies on it
+        Index(
+            "uq_games_active_pin",
+            "pin",
+            unique=True,
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     chip_value = Column(Float, nullable=False, default=1.0)
     big_blind_value = Column(Float, nullable=True)
     status = Column(String, nullable=False, default="active")
-    pin = Column(String(6), nullable=False, index=True)
+    pin = Column(String(6), nullable=False)
+    # Bumped by every mutation of the game or its players/transactions; drives ETags
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     closed_at = Column(DateTime, nullable=True)
+    # Set by backend.retention once players and transactions moved to game_archives
+    archived_at = Column(DateTime, nullable=True)
 
     players = relationship("Player", back_populates="game", cascade="all, delete-orphan")
     sessions = relationship("Session", back_populates="game", cascade="all, delete-orphan")
+    settlement = relationship("Settlement", uselist=False, cascade="all, delete-orphan")
+    archive = relationship("GameArchive", uselist=False, cascade="all, delete-orphan")
 
 
 class Player(Base):
     __tablename__ = "players"
+    __table_args__ = (Index("ix_players_game_id", "game_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), nullable=False)
     name = Column(String, nullable=False)
     actual_chips = Column(Integer, nullable=True)
+    # Running totals maintained by the transaction write path; see backend/reconcile.py
+    buy_in_chips = Column(Integer, nullable=False, default=0, server_default="0")
+    cash_out_chips = Column(Integer, nullable=False, default=0, server_default="0")
+    # Optimistic concurrency: ORM updates match on it and bump it; see backend.concurrency
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
 
+    __mapper_args__ = {"version_id_col": version}
+
     game = relationship("Game", back_populates="players")
     transactions = relationship("Transaction", back_populates="player", cascade="all, delete-orphan")
     sessions = relationship("Session", back_populates="player")
@@ -38,6 +77,12 @@ class Player(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Per-player history, newest first
+        Index("ix_transactions_player_created", "player_id", "created_at", "id"),
+        # Per-game aggregates and feeds
+        Index("ix_transactions_game_created", "game_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), nullable=False)
@@ -45,16 +90,25 @@ class Transaction(Base):
     type = Column(String, nullable=False)  # 'buy_in' | 'cash_out'
     chips = Column(Integer, nullable=False)
     created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    # Lets a multi-row INSERT ... RETURNING hand rows back in parameter order on SQLite
+    # too (the batch endpoint); otherwise SQLAlchemy falls back to one INSERT per row
+    _sentinel = insert_sentinel("_sentinel")
 
     player = relationship("Player", back_populates="transactions")
 
 
 class Session(Base):
     __tablename__ = "sessions"
-    __table_args__ = (UniqueConstraint("token", "game_id", name="uq_sessions_token_game"),)
+    __table_args__ = (
+        UniqueConstraint("token", "game_id", name="uq_sessions_token_game"),
+        # Latest session for a token (get_session_info)
+        Index("ix_sessions_token_created", "token", "created_at"),
+        # Cascades and invalidation when a game is deleted
+        Index("ix_sessions_game_id", "game_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, nullable=False, index=True)
+    token = Column(String, nullable=False)
     game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), nullable=False)
     player_id = Column(Integer, ForeignKey("players.id", ondelete="SET NULL"), nullable=True)
     role = Column(String, nullable=False)  # 'host' | 'player'
@@ -62,3 +116,49 @@ class Session(Base):
 
     game = relationship("Game", back_populates="sessions")
     player = relationship("Player", back_populates="sessions")
+
+
+class Settlement(Base):
+    """Computed settlement of a closed game, valid while `version` matches the game's."""
+
+    __tablename__ = "settlements"
+
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)  # SettlementOut as JSON
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class GameArchive(Base):
+    """Players and transactions of an archived game, serialized by backend.retention."""
+
+    __tablename__ = "game_archives"
+
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
+    payload = Column(Text, nullable=False)  # JSON: {"players": [...], "transactions": [...]}
+    archived_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class SessionRevocation(Base):
+    """Token or game whose signed session claims issued before `revoked_at` are void; see backend.auth."""
+
+    __tablename__ = "session_revocations"
+
+    id = Column(Integer, primary_key=True)
+    token = Column(String, nullable=True)
+    # No foreign key: the revoked game is usually being deleted
+    game_id = Column(Integer, nullable=True)
+    revoked_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class GameChange(Base):
+    """One mutation of a game, written by services.changes.record_change."""
+
+    __tablename__ = "game_changes"
+
+    game_id = Column(Integer, ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
+    # The game version the mutation produced; consecutive per game
+    version = Column(Integer, primary_key=True)
+    type = Column(String, nullable=False)
+    data = Column(Text, nullable=False)  # the realtime delta as JSON
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
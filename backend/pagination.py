@@ -0,0 +1,56 @@
+"""
+Keyset pagination over `(created_at, id)`.
+
+Cursors are opaque to clients: URL-safe base64 of the boundary row's timestamp
+and id. List endpoints return the cursor for the next request in the
+`X-Next-Cursor` header.
+
+`created_at` is set by the application before commit, so on PostgreSQL a row
+can commit after a newer one that a client has already paged past. Newest-first
+history is unaffected in practice; polling feeds can miss such a row (see
+GET /games/{id}/transactions).
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from fastapi import HTTPException, Query
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+PageSize = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+# For endpoints that predate pagination: no `limit` and no cursor returns every row
+OptionalPageSize = Query(None, ge=1, le=MAX_PAGE_SIZE)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "BadRequest", "message": "Invalid pagination cursor"},
+        )
+
+
+def before(model, cursor: str):
+    """Rows strictly older than the cursor, for newest-first pages."""
+    created_at, row_id = decode_cursor(cursor)
+    return or_(model.created_at < created_at, and_(model.created_at == created_at, model.id < row_id))
+
+
+def after(model, cursor: str):
+    """Rows strictly newer than the cursor, for oldest-first feeds."""
+    created_at, row_id = decode_cursor(cursor)
+    return or_(model.created_at > created_at, and_(model.created_at == created_at, model.id > row_id))
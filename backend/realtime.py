@@ -0,0 +1,384 @@
+"""
+Per-game push channel.
+
+Routers queue small delta events with `publish_after_commit`; once the database
+transaction commits they are handed to the configured broker, which fans them
+out to every Server-Sent Events subscriber of that game.
+
+Brokers:
+    memory   (default) delivers within the current process only.
+    postgres uses LISTEN/NOTIFY so every uvicorn worker receives every event.
+             Events too large for a NOTIFY payload are sent as a reference to
+             their `game_changes` row, which each listener reads back.
+
+Select one with REALTIME_BROKER.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import select
+import threading
+from typing import TYPE_CHECKING, Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from backend.models import GameChange, Player
+
+if TYPE_CHECKING:
+    from backend.game_state import PlayerState
+
+logger = logging.getLogger(__name__)
+
+REALTIME_BROKER = os.environ.get("REALTIME_BROKER", "memory")
+SUBSCRIBER_QUEUE_SIZE = 256
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7999
+
+_PENDING_KEY = "realtime_events"
+_PENDING_CONTROL_KEY = "realtime_control"
+_PENDING_CALLBACKS_KEY = "realtime_callbacks"
+_DEFERRED_KEY = "realtime_deferred"
+
+
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+class _Subscription:
+    def __init__(self, broker: "InProcessBroker", game_id: int):
+        self.broker = broker
+        self.game_id = game_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, message: dict[str, Any]) -> None:
+        # Runs on the subscriber's event loop
+        if self.queue.full():
+            # A client that cannot keep up gets told to refetch instead of stale deltas
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "data": {}})
+            return
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: float) -> dict[str, Any] | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fans events out to subscribers living in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[int, set[_Subscription]] = {}
+        self._control_handlers: list[Callable[[dict[str, Any]], None]] = []
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def subscribe(self, game_id: int) -> _Subscription:
+        subscription = _Subscription(self, game_id)
+        with self._lock:
+            self._subscribers.setdefault(game_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: _Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.game_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.game_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def add_control_handler(self, handler: Callable[[dict[str, Any]], None]) -> None:
+        """Register a callback for process-wide control messages such as cache invalidations."""
+        self._control_handlers.append(handler)
+
+    def publish(self, game_id: int, message: dict[str, Any]) -> None:
+        self._dispatch(game_id, message)
+
+    def publish_control(self, message: dict[str, Any]) -> None:
+        self._dispatch_control(message)
+
+    def _dispatch_control(self, message: dict[str, Any]) -> None:
+        for handler in self._control_handlers:
+            try:
+                handler(message)
+            except Exception:
+                logger.exception("Control handler failed for %r", message)
+
+    def _dispatch(self, game_id: int, message: dict[str, Any]) -> None:
+        # Safe to call from any thread; delivery is scheduled on each subscriber's loop
+        with self._lock:
+            subscribers = list(self._subscribers.get(game_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                self.unsubscribe(subscription)
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Cross-worker broker built on PostgreSQL LISTEN/NOTIFY.
+
+    Publishing queues a NOTIFY for a sender thread, so a commit on the event loop
+    (DB_ASYNC) never waits on the broker connection; one thread keeps them in order.
+    A listener thread in every worker receives them (including the publishing
+    worker) and dispatches to local subscribers.
+    """
+
+    CHANNEL = "cashtable_events"
+
+    def __init__(self, database_url: str, session_factory: Callable[[], Session] | None = None):
+        super().__init__()
+        # Reads back events published by reference; defaults to backend.database.SessionLocal
+        self._session_factory = session_factory
+        self._dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._publish_lock = threading.Lock()
+        self._publish_conn = None
+        self._outbox: queue.Queue[str | None] = queue.Queue()
+        self._sender: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._start_sender()
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._listen_forever, name="realtime-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._publish_lock:
+            sender, self._sender = self._sender, None
+        if sender is not None:
+            # Sends what is still queued before the sentinel
+            self._outbox.put(None)
+            sender.join(timeout=5)
+        if self._publish_conn is not None:
+            self._publish_conn.close()
+            self._publish_conn = None
+
+    def flush(self) -> None:
+        """Block until every queued NOTIFY has been sent (or failed)."""
+        self._outbox.join()
+
+    def publish(self, game_id: int, message: dict[str, Any]) -> None:
+        payload = _compact_json({"game_id": game_id, "message": message})
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            # e.g. a large transactions.created batch; record_change has logged it under its version
+            payload = _compact_json(
+                {"game_id": game_id, "ref": {"type": message["type"], "version": message.get("version")}}
+            )
+        self._notify(payload)
+
+    def publish_control(self, message: dict[str, Any]) -> None:
+        self._notify(_compact_json({"control": message}))
+
+    def _notify(self, payload: str) -> None:
+        self._start_sender()
+        self._outbox.put(payload)
+
+    def _start_sender(self) -> None:
+        # Also started on first publish, for processes without the app lifespan
+        with self._publish_lock:
+            if self._sender is None:
+                self._sender = threading.Thread(target=self._send_forever, name="realtime-sender", daemon=True)
+                self._sender.start()
+
+    def _send_forever(self) -> None:
+        while True:
+            payload = self._outbox.get()
+            try:
+                if payload is None:
+                    return
+                self._send(payload)
+            finally:
+                self._outbox.task_done()
+
+    def _send(self, payload: str) -> None:
+        try:
+            conn = self._publish_connection()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, %s)", (self.CHANNEL, payload))
+        except Exception:
+            logger.exception("Failed to publish realtime envelope %s", payload[:200])
+            if self._publish_conn is not None:
+                self._publish_conn.close()
+                self._publish_conn = None
+
+    def _publish_connection(self):
+        import psycopg2
+
+        if self._publish_conn is None or self._publish_conn.closed:
+            self._publish_conn = psycopg2.connect(self._dsn)
+            self._publish_conn.autocommit = True
+        return self._publish_conn
+
+    def _listen_forever(self) -> None:
+        import psycopg2
+
+        backoff = 0.5
+        while not self._stopped.is_set():
+            try:
+                conn = psycopg2.connect(self._dsn)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.CHANNEL}")
+                backoff = 0.5
+                try:
+                    while not self._stopped.is_set():
+                        if select.select([conn], [], [], 1.0) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            self._handle(conn.notifies.pop(0).payload)
+                finally:
+                    conn.close()
+            except Exception:
+                logger.exception("Realtime listener disconnected, retrying in %.1fs", backoff)
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _handle(self, payload: str) -> None:
+        envelope = json.loads(payload)
+        if "control" in envelope:
+            self._dispatch_control(envelope["control"])
+        elif "ref" in envelope:
+            self._dispatch(envelope["game_id"], self._load_referenced(envelope["game_id"], envelope["ref"]))
+        else:
+            self._dispatch(envelope["game_id"], envelope["message"])
+
+    def _load_referenced(self, game_id: int, ref: dict[str, Any]) -> dict[str, Any]:
+        """The logged event `ref` points to, or a resync when it cannot be read."""
+        version = ref.get("version")
+        if version is not None:
+            if self._session_factory is None:
+                from backend.database import SessionLocal
+
+                self._session_factory = SessionLocal
+            try:
+                db = self._session_factory()
+                try:
+                    data = db.query(GameChange.data).filter_by(game_id=game_id, version=version).scalar()
+                finally:
+                    db.close()
+            except Exception:
+                logger.exception("Failed to load %s of game %s", ref, game_id)
+                data = None
+            if data is not None:
+                return {"type": ref["type"], "data": json.loads(data), "version": version}
+        return {"type": "resync", "data": {}}
+
+
+def create_broker(kind: str = REALTIME_BROKER) -> InProcessBroker:
+    if kind == "memory":
+        return InProcessBroker()
+    if kind == "postgres":
+        from backend.database import SQLALCHEMY_DATABASE_URL
+
+        return PostgresBroker(SQLALCHEMY_DATABASE_URL)
+    raise ValueError(f"Unknown REALTIME_BROKER {kind!r}")
+
+
+broker = create_broker()
+
+
+def player_chips_delta(player: "Player | PlayerState") -> dict[str, Any]:
+    return {
+        "id": player.id,
+        "buy_in_chips": player.buy_in_chips,
+        "cash_out_chips": player.cash_out_chips,
+        "actual_chips": player.actual_chips,
+    }
+
+
+def publish_after_commit(
+    db: Session, game_id: int, event_type: str, data: dict[str, Any], version: int | None = None
+) -> None:
+    """Queue an event that is published only if the current transaction commits."""
+    message = {"type": event_type, "data": data}
+    if version is not None:
+        message["version"] = version
+    db.info.setdefault(_PENDING_KEY, []).append((game_id, message))
+
+
+def publish_control_after_commit(db: Session, message: dict[str, Any]) -> None:
+    """Queue a control message for every worker, sent only if the current transaction commits."""
+    db.info.setdefault(_PENDING_CONTROL_KEY, []).append(message)
+
+
+def call_after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run `callback` in this process only if the current transaction commits, after its messages are sent."""
+    db.info.setdefault(_PENDING_CALLBACKS_KEY, []).append(callback)
+
+
+def defer_publishing(db: Session) -> list:
+    """
+    Hold what `db` would publish (and call) on commit in the returned list instead.
+
+    For sessions whose commit only releases a savepoint (backend.commit_queue):
+    pass the list to `publish_deferred` once the enclosing transaction commits.
+    """
+    return db.info.setdefault(_DEFERRED_KEY, [])
+
+
+def publish_deferred(deferred: list) -> None:
+    for pending in deferred:
+        _publish(*pending)
+
+
+def _publish(control, events, callbacks) -> None:
+    for message in control:
+        broker.publish_control(message)
+    for game_id, message in events:
+        broker.publish(game_id, message)
+    for callback in callbacks:
+        callback()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(db: Session) -> None:
+    pending = (
+        db.info.pop(_PENDING_CONTROL_KEY, None) or (),
+        db.info.pop(_PENDING_KEY, None) or (),
+        db.info.pop(_PENDING_CALLBACKS_KEY, None) or (),
+    )
+    deferred = db.info.get(_DEFERRED_KEY)
+    if deferred is not None:
+        deferred.append(pending)
+    else:
+        _publish(*pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(db: Session) -> None:
+    db.info.pop(_PENDING_KEY, None)
+    db.info.pop(_PENDING_CONTROL_KEY, None)
+    db.info.pop(_PENDING_CALLBACKS_KEY, None)
@@ -0,0 +1,121 @@
+"""
+Rebuild the running chip counters on `players` from the `transactions` table.
+
+Usage:
+    uv run python -m backend.reconcile            # report drift and fix it
+    uv run python -m backend.reconcile --check    # report only, exit 1 on drift
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend.models import Player
+from backend.services.changes import bump_game_version
+from backend.services.stats import get_ledger_totals
+
+
+@dataclass
+class Drift:
+    player_id: int
+    game_id: int
+    stored: tuple[int, int]
+    expected: tuple[int, int]
+    version: int
+
+
+def find_drift(db: Session, game_id: int | None = None, lock: bool = False) -> list[Drift]:
+    """
+    Players whose counters disagree with their ledger totals.
+
+    With `lock`, the players are read FOR UPDATE before the ledger is. Every write
+    to a player's ledger also updates that player's row, so once the row locks are
+    held the ledger read (a new snapshot under READ COMMITTED) sees each committed
+    change and no writer can commit another one until this transaction ends.
+    """
+    query = db.query(Player.id, Player.game_id, Player.buy_in_chips, Player.cash_out_chips, Player.version)
+    if game_id is not None:
+        query = query.filter(Player.game_id == game_id)
+    if lock:
+        query = query.with_for_update()
+    players = query.order_by(Player.id).all()
+
+    expected_by_player = get_ledger_totals(db, game_id)
+
+    drift: list[Drift] = []
+    for player_id, player_game_id, buy_in, cash_out, version in players:
+        expected = expected_by_player.get(player_id, (0, 0))
+        if (buy_in, cash_out) != expected:
+            drift.append(
+                Drift(
+                    player_id=player_id,
+                    game_id=player_game_id,
+                    stored=(buy_in, cash_out),
+                    expected=expected,
+                    version=version,
+                )
+            )
+    return drift
+
+
+def reconcile(db: Session, game_id: int | None = None, fix: bool = True) -> list[Drift]:
+    drift = find_drift(db, game_id, lock=fix)
+    if fix and drift:
+        players = Player.__table__
+        # Only rows still at the version that was compared are rewritten (SQLite has
+        # no FOR UPDATE). The bump makes ORM writers that loaded a player earlier,
+        # such as the batch endpoint, fail their version check and retry.
+        db.execute(
+            update(players)
+            .where(players.c.id == bindparam("player_id"), players.c.version == bindparam("read_version"))
+            .values(
+                buy_in_chips=bindparam("buy_in"),
+                cash_out_chips=bindparam("cash_out"),
+                version=players.c.version + 1,
+            ),
+            [
+                {
+                    "player_id": d.player_id,
+                    "read_version": d.version,
+                    "buy_in": d.expected[0],
+                    "cash_out": d.expected[1],
+                }
+                for d in drift
+            ],
+        )
+        # New game versions invalidate ETags and every worker's in-memory game state
+        for drifted_game_id in sorted({d.game_id for d in drift}):
+            bump_game_version(db, drifted_game_id)
+        db.commit()
+    return drift
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reconcile player chip counters with the transactions table.")
+    parser.add_argument("--game-id", type=int, default=None, help="Only reconcile players of this game")
+    parser.add_argument("--check", action="store_true", help="Report drift without fixing it")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        drift = reconcile(db, game_id=args.game_id, fix=not args.check)
+    finally:
+        db.close()
+
+    for d in drift:
+        print(
+            f"player {d.player_id} (game {d.game_id}): "
+            f"stored buy_in={d.stored[0]} cash_out={d.stored[1]}, "
+            f"expected buy_in={d.expected[0]} cash_out={d.expected[1]}"
+        )
+    action = "found" if args.check else "fixed"
+    print(f"{len(drift)} player(s) with drift {action}")
+    return 1 if drift and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
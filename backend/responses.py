@@ -0,0 +1,30 @@
+import os
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+# Render large read responses straight from the models the handler built
+FAST_JSON = os.environ.get("FAST_JSON", "0") == "1"
+
+
+class PydanticJSONResponse(JSONResponse):
+    """JSON response rendered by pydantic-core's serializer; accepts models and lists of models."""
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def model_response(content: Any, response: Response) -> Any:
+    """
+    Return `content` for FastAPI to validate and encode against the route's response_model,
+    or, with FAST_JSON, render it here and skip that second validation pass.
+
+    Headers already set on the injected `response` (ETag, Cache-Control) are carried over.
+    """
+    if not FAST_JSON:
+        return content
+    rendered = PydanticJSONResponse(content)
+    rendered.raw_headers.extend(response.raw_headers)
+    return rendered
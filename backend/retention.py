@@ -0,0 +1,223 @@
+"""
+Retention job: delete expired sessions and archive old closed games.
+
+Usage:
+    uv run python -m backend.retention                  # one pass
+    uv run python -m backend.retention --interval 3600  # run a pass every hour
+    uv run python -m backend.retention --dry-run        # count what a pass would touch
+
+Sessions expire once their token's newest session is older than the cookie
+lifetime (RETENTION_SESSION_MAX_AGE, default SESSION_COOKIE_MAX_AGE): the cookie
+is re-issued on every create or join, so until then an older row of the same
+token can still be presented.
+
+Closed games older than RETENTION_ARCHIVE_AFTER_DAYS keep their `games` row and
+stored settlement; players and transactions are serialized into one
+`game_archives` row and deleted, along with the game's change log. GET
+/games/{id} and the settlement are then served from the archive.
+
+Signed-session revocations older than the cookie lifetime are dropped too; the
+claims they void have expired.
+
+Work is done in batches of RETENTION_SESSION_BATCH_SIZE tokens or
+RETENTION_ARCHIVE_BATCH_SIZE games, one short transaction each, so locks are
+never held for long.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.auth import SESSION_COOKIE_MAX_AGE
+from backend.database import SessionLocal
+from backend.models import (
+    Game,
+    GameArchive,
+    GameChange,
+    Player,
+    Session as GameSession,
+    SessionRevocation,
+    Settlement,
+    Transaction,
+)
+from backend.services.settlement import build_settlement
+
+logger = logging.getLogger(__name__)
+
+RETENTION_SESSION_MAX_AGE = int(os.environ.get("RETENTION_SESSION_MAX_AGE", str(SESSION_COOKIE_MAX_AGE)))
+RETENTION_ARCHIVE_AFTER_DAYS = int(os.environ.get("RETENTION_ARCHIVE_AFTER_DAYS", "90"))
+RETENTION_SESSION_BATCH_SIZE = int(os.environ.get("RETENTION_SESSION_BATCH_SIZE", "500"))
+# Each game carries all its players and transactions
+RETENTION_ARCHIVE_BATCH_SIZE = int(os.environ.get("RETENTION_ARCHIVE_BATCH_SIZE", "50"))
+
+
+def _expired_tokens(db: Session, cutoff: datetime, after: str, limit: int) -> list[str]:
+    # Keyset over ix_sessions_token_created, so each batch resumes where the last stopped
+    rows = (
+        db.query(GameSession.token)
+        .filter(GameSession.token > after)
+        .group_by(GameSession.token)
+        .having(func.max(GameSession.created_at) < cutoff)
+        .order_by(GameSession.token)
+        .limit(limit)
+    )
+    return [token for (token,) in rows]
+
+
+def delete_expired_sessions(
+    db: Session, cutoff: datetime, batch_size: int = RETENTION_SESSION_BATCH_SIZE, dry_run: bool = False
+) -> int:
+    """
+    Delete every session of tokens last issued before `cutoff`; returns the number of tokens.
+
+    No cache invalidation is needed: an expired token has not been presented for
+    far longer than SESSION_CACHE_TTL.
+    """
+    deleted, after = 0, ""
+    while True:
+        tokens = _expired_tokens(db, cutoff, after, batch_size)
+        if not tokens:
+            db.rollback()
+            return deleted
+        after = tokens[-1]
+        deleted += len(tokens)
+        if dry_run:
+            continue
+        db.query(GameSession).filter(GameSession.token.in_(tokens)).delete(synchronize_session=False)
+        db.commit()
+
+
+def prune_revocations(db: Session, cutoff: datetime, batch_size: int = RETENTION_SESSION_BATCH_SIZE) -> int:
+    deleted = 0
+    while True:
+        ids = [
+            row_id
+            for (row_id,) in db.query(SessionRevocation.id)
+            .filter(SessionRevocation.revoked_at < cutoff)
+            .order_by(SessionRevocation.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            db.rollback()
+            return deleted
+        db.query(SessionRevocation).filter(SessionRevocation.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        deleted += len(ids)
+
+
+def _snapshot(db: Session, game_id: int) -> str:
+    players = (
+        db.query(Player.id, Player.name, Player.actual_chips, Player.buy_in_chips, Player.cash_out_chips)
+        .filter(Player.game_id == game_id)
+        .order_by(Player.id)
+        .all()
+    )
+    transactions = (
+        db.query(Transaction.id, Transaction.player_id, Transaction.type, Transaction.chips, Transaction.created_at)
+        .filter(Transaction.game_id == game_id)
+        .order_by(Transaction.created_at, Transaction.id)
+        .all()
+    )
+    # Row order matches PlayerTotals; see services.stats.get_player_totals
+    return json.dumps(
+        {
+            "players": [list(row) for row in players],
+            "transactions": [[*row[:4], row[4].isoformat()] for row in transactions],
+        },
+        separators=(",", ":"),
+    )
+
+
+def archive_game(db: Session, game: Game) -> None:
+    """Move the players and transactions of a closed `game` into `game_archives`, in the current transaction."""
+    stored = (
+        db.query(Settlement.game_id)
+        .filter(Settlement.game_id == game.id, Settlement.version == game.version)
+        .first()
+    )
+    if not stored:
+        # A plain flush, not store_settlement: its savepoint would be this transaction's
+        # first write, which pysqlite commits on release, and a skipped write would
+        # leave the archive without its settlement
+        settlement = build_settlement(db, game)
+        db.merge(Settlement(game_id=game.id, version=game.version, payload=settlement.model_dump_json()))
+        db.flush()
+
+    db.add(GameArchive(game_id=game.id, payload=_snapshot(db, game.id)))
+    # Sessions keep their role; their player_id would dangle once players go
+    db.query(GameSession).filter(GameSession.game_id == game.id).update(
+        {GameSession.player_id: None}, synchronize_session=False
+    )
+    # Deltas against rows that no longer exist; clients resync from the snapshot
+    db.query(GameChange).filter(GameChange.game_id == game.id).delete(synchronize_session=False)
+    db.query(Transaction).filter(Transaction.game_id == game.id).delete(synchronize_session=False)
+    db.query(Player).filter(Player.game_id == game.id).delete(synchronize_session=False)
+    game.archived_at = datetime.now(timezone.utc)
+
+
+def archive_closed_games(
+    db: Session, cutoff: datetime, batch_size: int = RETENTION_ARCHIVE_BATCH_SIZE, dry_run: bool = False
+) -> int:
+    """Archive closed games closed before `cutoff`; returns how many were (or would be) archived."""
+    query = db.query(Game).filter(Game.status == "closed", Game.closed_at < cutoff, Game.archived_at.is_(None))
+    if dry_run:
+        count = query.count()
+        db.rollback()
+        return count
+
+    archived = 0
+    while True:
+        games = query.order_by(Game.id).limit(batch_size).all()
+        if not games:
+            return archived
+        for game in games:
+            archive_game(db, game)
+        db.commit()
+        archived += len(games)
+
+
+def run_once(dry_run: bool = False) -> dict[str, int]:
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        sessions = delete_expired_sessions(
+            db, now - timedelta(seconds=RETENTION_SESSION_MAX_AGE), dry_run=dry_run
+        )
+        if not dry_run:
+            prune_revocations(db, now - timedelta(seconds=SESSION_COOKIE_MAX_AGE))
+        games = archive_closed_games(db, now - timedelta(days=RETENTION_ARCHIVE_AFTER_DAYS), dry_run=dry_run)
+    finally:
+        db.close()
+    return {"expired_tokens": sessions, "archived_games": games}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float, default=0, help="Repeat every INTERVAL seconds (0 = run once)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count expired tokens and archivable games")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    while True:
+        result = run_once(dry_run=args.dry_run)
+        logger.info(
+            "Retention %s sessions of %d token(s), %s %d game(s)",
+            "would remove" if args.dry_run else "removed",
+            result["expired_tokens"],
+            "would archive" if args.dry_run else "archived",
+            result["archived_games"],
+        )
+        if args.interval <= 0:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
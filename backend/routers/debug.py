@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+
+from backend.auth import session_cache
+from backend.commit_queue import commit_queue
+from backend.concurrency import conflict_stats
+from backend.database import pool_status
+from backend.game_state import game_states
+from backend.instrumentation import route_stats
+
+router = APIRouter(tags=["debug"])
+
+
+@router.get("/debug/stats")
+def get_debug_stats():
+    return {
+        "session_cache": session_cache.stats(),
+        "db_pool": pool_status(),
+        "routes": route_stats.snapshot(),
+        "optimistic_writes": conflict_stats.snapshot(),
+        "game_state": game_states.stats(),
+        "commit_queue": commit_queue.stats() if commit_queue is not None else None,
+    }
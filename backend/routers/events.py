@@ -0,0 +1,49 @@
+import json
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from backend.auth import require_game_session
+from backend.database import DbSession, close_db, get_db, run_db
+from backend.metrics import open_event_streams
+from backend.realtime import broker
+
+router = APIRouter(tags=["events"])
+
+HEARTBEAT_SECONDS = 15.0
+
+
+def _format_sse(message: dict) -> str:
+    data = json.dumps(message["data"], separators=(",", ":"))
+    event_id = f"id: {message['version']}\n" if "version" in message else ""
+    return f"{event_id}event: {message['type']}\ndata: {data}\n\n"
+
+
+@router.get("/games/{game_id}/events")
+async def stream_game_events(game_id: int, request: Request, db: DbSession = Depends(get_db)):
+    await run_db(db, require_game_session, request, game_id)
+    # Release the pooled connection now; the stream may stay open for hours
+    await close_db(db)
+
+    async def event_stream():
+        subscription = broker.subscribe(game_id)
+        open_event_streams.inc()
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                message = await subscription.get(timeout=HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": ping\n\n"
+                    continue
+                yield _format_sse(message)
+                if message["type"] == "game.deleted":
+                    break
+        finally:
+            open_event_streams.dec()
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,63 +1,52 @@
+import hashlib
+import json
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
 from backend.auth import (
     SESSION_COOKIE_MAX_AGE,
     SESSION_COOKIE_NAME,
-    generate_pin,
+    ResolvedSession,
+    get_cookie_token,
+    insert_game_with_pin,
+    invalidate_game_sessions,
     issue_or_reuse_token,
     require_game_session,
     require_host_session,
+    session_cookie_value,
 )
-from backend.database import get_db
-from backend.models import Game, Player, Session as GameSession
+from backend.caching import CACHE_IMMUTABLE, CACHE_REVALIDATE, etag_matches, not_modified
+from backend.commit_queue import run_write
+from backend.database import DbSession, get_db, run_db
+from backend.game_state import game_states
+from backend.models import Game, GameChange, Player, Session as GameSession, Settlement
+from backend.realtime import publish_after_commit
+from backend.responses import model_response
 from backend.schemas import (
+    GameChangeOut,
+    GameChanges,
     GameCreate,
     GameDetail,
     JoinGameOut,
     GameOut,
     GameUpdate,
     JoinGameByPin,
-    PlayerStats,
-    PlayerSummary,
+    PlayerOut,
     SettlementOut,
-    TransferOut,
 )
-from backend.services.settlement import calculate_settlement
+from backend.services.changes import changes_between, record_change
+from backend.services.settlement import build_settlement, store_settlement
+from backend.services.stats import compute_player_stats, get_player_totals
 
 router = APIRouter(tags=["games"])
 
 
-def _compute_player_stats(player: Player, chip_value: float) -> PlayerStats:
-    buy_in_chips = sum(t.chips for t in player.transactions if t.type == "buy_in")
-    cash_out_chips = sum(t.chips for t in player.transactions if t.type == "cash_out")
-    chips_in_play = buy_in_chips - cash_out_chips
-
-    money_spent = buy_in_chips * chip_value
-    current_chips = player.actual_chips if player.actual_chips is not None else chips_in_play
-
-    virtual_value = current_chips * chip_value
-    cashed_out_value = cash_out_chips * chip_value
-    net_balance = (virtual_value + cashed_out_value) - money_spent
-
-    return PlayerStats(
-        id=player.id,
-        name=player.name,
-        buy_in_chips=buy_in_chips,
-        cash_out_chips=cash_out_chips,
-        chips_in_play=chips_in_play,
-        actual_chips=player.actual_chips,
-        money_spent=money_spent,
-        net_balance=net_balance,
-    )
-
-
-def _set_session_cookie(response: Response, token: str) -> None:
+def _set_session_cookie(db: Session, response: Response, token: str) -> None:
     response.set_cookie(
         key=SESSION_COOKIE_NAME,
-        value=token,
+        value=session_cookie_value(db, token),
         httponly=True,
         samesite="lax",
         max_age=SESSION_COOKIE_MAX_AGE,
@@ -79,15 +68,17 @@ def _serialize_game_out(game: Game, role: str | None = None) -> GameOut:
 
 
 @router.post("/games/", response_model=GameOut, status_code=201)
-def create_game(body: GameCreate, request: Request, response: Response, db: Session = Depends(get_db)):
-    game = Game(
+async def create_game(body: GameCreate, request: Request, response: Response, db: DbSession = Depends(get_db)):
+    return await run_write(db, _create_game, body, request, response)
+
+
+def _create_game(db: Session, body: GameCreate, request: Request, response: Response):
+    game = insert_game_with_pin(
+        db,
         name=body.name,
-        pin=generate_pin(db),
         chip_value=body.chip_value,
         big_blind_value=body.big_blind_value,
     )
-    db.add(game)
-    db.flush()
 
     token = issue_or_reuse_token(request)
     host_session = GameSession(token=token, game_id=game.id, player_id=None, role="host")
@@ -96,12 +87,16 @@ def create_game(body: GameCreate, request: Request, response: Response, db: Sess
     db.commit()
     db.refresh(game)
 
-    _set_session_cookie(response, token)
+    _set_session_cookie(db, response, token)
     return _serialize_game_out(game, role="host")
 
 
 @router.post("/games/join", response_model=JoinGameOut)
-def join_game_by_pin(body: JoinGameByPin, request: Request, response: Response, db: Session = Depends(get_db)):
+async def join_game_by_pin(body: JoinGameByPin, request: Request, response: Response, db: DbSession = Depends(get_db)):
+    return await run_write(db, _join_game_by_pin, body, request, response)
+
+
+def _join_game_by_pin(db: Session, body: JoinGameByPin, request: Request, response: Response):
     game = db.query(Game).filter(Game.pin == body.pin, Game.status == "active").first()
     if not game:
         raise HTTPException(
@@ -117,7 +112,7 @@ def join_game_by_pin(body: JoinGameByPin, request: Request, response: Response,
     )
 
     if existing_session:
-        _set_session_cookie(response, token)
+        _set_session_cookie(db, response, token)
         return JoinGameOut(
             game=_serialize_game_out(game, role=existing_session.role),
             player=None,
@@ -129,11 +124,14 @@ def join_game_by_pin(body: JoinGameByPin, request: Request, response: Response,
 
     player_session = GameSession(token=token, game_id=game.id, player_id=player.id, role="player")
     db.add(player_session)
+    record_change(
+        db, game.id, "player.added", PlayerOut.model_validate(player).model_dump(mode="json")
+    )
     db.commit()
     db.refresh(game)
     db.refresh(player)
 
-    _set_session_cookie(response, token)
+    _set_session_cookie(db, response, token)
     return JoinGameOut(
         game=_serialize_game_out(game, role="player"),
         player=player,
@@ -141,23 +139,45 @@ def join_game_by_pin(body: JoinGameByPin, request: Request, response: Response,
 
 
 @router.get("/games/", response_model=list[GameOut])
-def list_games(request: Request, db: Session = Depends(get_db)):
-    token = request.cookies.get(SESSION_COOKIE_NAME)
+async def list_games(request: Request, response: Response, db: DbSession = Depends(get_db)):
+    return await run_db(db, _list_games, request, response)
+
+
+def _list_games(db: Session, request: Request, response: Response):
+    token = get_cookie_token(request)
     if not token:
         return []
 
-    sessions = db.query(GameSession).filter(GameSession.token == token).all()
-    if not sessions:
+    memberships = (
+        db.query(GameSession.game_id, GameSession.role, Game.version)
+        .join(Game, Game.id == GameSession.game_id)
+        .filter(GameSession.token == token)
+        .order_by(GameSession.game_id)
+        .all()
+    )
+    if not memberships:
         return []
 
-    game_ids = [s.game_id for s in sessions]
-    role_by_game = {s.game_id: s.role for s in sessions}
-    games = db.query(Game).filter(Game.id.in_(game_ids)).order_by(Game.created_at.desc()).all()
-    return [_serialize_game_out(game, role=role_by_game.get(game.id)) for game in games]
+    fingerprint = ";".join(f"{game_id}:{role}:{version}" for game_id, role, version in memberships)
+    etag = f'"l-{hashlib.sha1(fingerprint.encode()).hexdigest()[:20]}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    role_by_game = {game_id: role for game_id, role, _ in memberships}
+    games = db.query(Game).filter(Game.id.in_(role_by_game)).order_by(Game.created_at.desc()).all()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_REVALIDATE
+    return model_response(
+        [_serialize_game_out(game, role=role_by_game.get(game.id)) for game in games], response
+    )
 
 
 @router.get("/games/{game_id}", response_model=GameDetail)
-def get_game(game_id: int, request: Request, db: Session = Depends(get_db)):
+async def get_game(game_id: int, request: Request, response: Response, db: DbSession = Depends(get_db)):
+    return await run_db(db, _get_game, game_id, request, response)
+
+
+def _get_game(db: Session, game_id: int, request: Request, response: Response):
     session = require_game_session(db, request, game_id)
 
     game = db.query(Game).filter(Game.id == game_id).first()
@@ -167,7 +187,22 @@ def get_game(game_id: int, request: Request, db: Session = Depends(get_db)):
             detail={"error": "NotFound", "message": f"Game {game_id} not found"},
         )
 
-    players_stats = [_compute_player_stats(p, game.chip_value) for p in game.players]
+    # The payload embeds the caller's role, so the tag does too
+    etag = f'"g{game.id}-v{game.version}-{session.role}-{session.player_id or 0}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    detail = _game_detail(db, game, session)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_REVALIDATE
+    return model_response(detail, response)
+
+
+def _game_detail(db: Session, game: Game, session: ResolvedSession) -> GameDetail:
+    if game_states.enabled and game.status == "active":
+        players = game_states.get(db, game).players.values()
+    else:
+        players = get_player_totals(db, game.id, archived=game.archived_at is not None)
     return GameDetail(
         id=game.id,
         name=game.name,
@@ -179,12 +214,55 @@ def get_game(game_id: int, request: Request, db: Session = Depends(get_db)):
         session_player_id=session.player_id,
         created_at=game.created_at,
         closed_at=game.closed_at,
-        players=players_stats,
+        players=[compute_player_stats(p, game.chip_value) for p in players],
+        version=game.version,
     )
 
 
+@router.get("/games/{game_id}/changes", response_model=GameChanges)
+async def get_game_changes(
+    game_id: int, request: Request, response: Response, since: int = Query(ge=0), db: DbSession = Depends(get_db)
+):
+    return await run_db(db, _get_game_changes, game_id, request, response, since)
+
+
+def _get_game_changes(db: Session, game_id: int, request: Request, response: Response, since: int):
+    """
+    Everything that changed after version `since` (a `version` from an earlier
+    response or realtime event), oldest first. Clients that are too far behind,
+    or pass 0, get `snapshot` instead of `changes`; either way `version` is the
+    one to send next time.
+    """
+    session = require_game_session(db, request, game_id)
+
+    game = db.query(Game).filter(Game.id == game_id).first()
+    if not game:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "NotFound", "message": f"Game {game_id} not found"},
+        )
+
+    entries = changes_between(db, game.id, since, game.version)
+    if entries is None:
+        result = GameChanges(version=game.version, snapshot=_game_detail(db, game, session))
+    else:
+        result = GameChanges(
+            version=game.version,
+            changes=[
+                GameChangeOut(version=version, type=event_type, data=json.loads(data))
+                for version, event_type, data in entries
+            ],
+        )
+    response.headers["Cache-Control"] = CACHE_REVALIDATE
+    return model_response(result, response)
+
+
 @router.patch("/games/{game_id}", response_model=GameOut)
-def update_game(game_id: int, body: GameUpdate, request: Request, db: Session = Depends(get_db)):
+async def update_game(game_id: int, body: GameUpdate, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _update_game, game_id, body, request)
+
+
+def _update_game(db: Session, game_id: int, body: GameUpdate, request: Request):
     require_game_session(db, request, game_id)
 
     game = db.query(Game).filter(Game.id == game_id).first()
@@ -195,13 +273,20 @@ def update_game(game_id: int, body: GameUpdate, request: Request, db: Session =
         )
     for field, value in body.model_dump(exclude_unset=True).items():
         setattr(game, field, value)
+    record_change(
+        db, game.id, "game.updated", _serialize_game_out(game).model_dump(mode="json", exclude={"session_role"})
+    )
     db.commit()
     db.refresh(game)
     return _serialize_game_out(game)
 
 
 @router.patch("/games/{game_id}/close", response_model=GameOut)
-def close_game(game_id: int, request: Request, db: Session = Depends(get_db)):
+async def close_game(game_id: int, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _close_game, game_id, request)
+
+
+def _close_game(db: Session, game_id: int, request: Request):
     require_host_session(db, request, game_id)
 
     game = db.query(Game).filter(Game.id == game_id).first()
@@ -218,13 +303,22 @@ def close_game(game_id: int, request: Request, db: Session = Depends(get_db)):
 
     game.status = "closed"
     game.closed_at = datetime.now(timezone.utc)
+    version = record_change(
+        db, game.id, "game.closed", {"status": game.status, "closed_at": game.closed_at.isoformat()}
+    )
+    # Everyone opens the settlement right after closing; have it ready
+    store_settlement(db, game.id, version, build_settlement(db, game))
     db.commit()
     db.refresh(game)
     return _serialize_game_out(game)
 
 
 @router.delete("/games/{game_id}", status_code=204)
-def delete_game(game_id: int, request: Request, db: Session = Depends(get_db)):
+async def delete_game(game_id: int, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _delete_game, game_id, request)
+
+
+def _delete_game(db: Session, game_id: int, request: Request):
     require_host_session(db, request, game_id)
 
     game = db.query(Game).filter(Game.id == game_id).first()
@@ -233,14 +327,39 @@ def delete_game(game_id: int, request: Request, db: Session = Depends(get_db)):
             status_code=404,
             detail={"error": "NotFound", "message": f"Game {game_id} not found"},
         )
+    # No relationship to cascade through, so the log is not loaded row by row
+    db.query(GameChange).filter(GameChange.game_id == game_id).delete(synchronize_session=False)
     db.delete(game)
+    invalidate_game_sessions(db, game_id)
+    publish_after_commit(db, game_id, "game.deleted", {"id": game_id})
     db.commit()
 
 
 @router.get("/games/{game_id}/settlement", response_model=SettlementOut)
-def get_settlement(game_id: int, request: Request, db: Session = Depends(get_db)):
+async def get_settlement(game_id: int, request: Request, response: Response, db: DbSession = Depends(get_db)):
+    return await run_db(db, _get_settlement, game_id, request, response)
+
+
+def _get_settlement(db: Session, game_id: int, request: Request, response: Response):
     require_game_session(db, request, game_id)
 
+    # A closed game only changes if it is edited, which bumps its version
+    cached = (
+        db.query(Settlement.version, Settlement.payload)
+        .join(Game, Game.id == Settlement.game_id)
+        .filter(Settlement.game_id == game_id, Settlement.version == Game.version, Game.status == "closed")
+        .first()
+    )
+    if cached:
+        etag = f'"s{game_id}-v{cached.version}"'
+        if etag_matches(request, etag):
+            return not_modified(etag, CACHE_IMMUTABLE)
+        return Response(
+            content=cached.payload,
+            media_type="application/json",
+            headers={"ETag": etag, "Cache-Control": CACHE_IMMUTABLE},
+        )
+
     game = db.query(Game).filter(Game.id == game_id).first()
     if not game:
         raise HTTPException(
@@ -256,25 +375,15 @@ def get_settlement(game_id: int, request: Request, db: Session = Depends(get_db)
             },
         )
 
-    stats = [_compute_player_stats(p, game.chip_value) for p in game.players]
-    balances = {s.name: s.net_balance for s in stats}
-    transfers = calculate_settlement(balances)
-
-    return SettlementOut(
-        player_summary=[
-            PlayerSummary(
-                id=s.id,
-                name=s.name,
-                money_spent=s.money_spent,
-                final_value=s.net_balance + s.money_spent,
-                profit_loss=s.net_balance,
-            )
-            for s in stats
-        ],
-        transfers=[
-            TransferOut(
-                from_player=t.from_player, to_player=t.to_player, amount=t.amount
-            )
-            for t in transfers
-        ],
-    )
+    etag = f'"s{game.id}-v{game.version}"'
+    if etag_matches(request, etag):
+        return not_modified(etag, CACHE_IMMUTABLE)
+
+    settlement = build_settlement(db, game)
+    # Stays off the commit queue: this is a read route, and the stored row is only
+    # a cache that store_settlement gives up on when it cannot get the write lock
+    store_settlement(db, game.id, game.version, settlement)
+    db.commit()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_IMMUTABLE
+    return model_response(settlement, response)
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from backend.database import DbSession, get_db, run_db
+from backend.metrics import render
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(db: DbSession = Depends(get_db)):
+    return Response(await run_db(db, render), media_type=CONTENT_TYPE_LATEST)
@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
-from backend.auth import require_game_session, require_host_session
-from backend.database import get_db
+from backend.auth import invalidate_game_sessions, require_game_session, require_host_session
+from backend.commit_queue import run_write
+from backend.concurrency import retry_on_conflict
+from backend.database import DbSession, get_db, run_db
+from backend.game_state import PlayerState, game_states
 from backend.models import Game, Player, Transaction
+from backend.pagination import DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER, OptionalPageSize, before, encode_cursor
+from backend.realtime import player_chips_delta
 from backend.schemas import PlayerCreate, PlayerOut, PlayerUpdateChips, TransactionOut
+from backend.services.changes import record_change
 
 router = APIRouter(tags=["players"])
 
 
 @router.post("/games/{game_id}/players/", response_model=PlayerOut, status_code=201)
-def add_player(game_id: int, body: PlayerCreate, request: Request, db: Session = Depends(get_db)):
+async def add_player(game_id: int, body: PlayerCreate, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _add_player, game_id, body, request)
+
+
+def _add_player(db: Session, game_id: int, body: PlayerCreate, request: Request):
     require_game_session(db, request, game_id)
 
     game = db.query(Game).filter(Game.id == game_id).first()
@@ -24,13 +34,20 @@ def add_player(game_id: int, body: PlayerCreate, request: Request, db: Session =
 
     player = Player(game_id=game_id, name=body.name)
     db.add(player)
+    db.flush()
+    record_change(db, game_id, "player.added", PlayerOut.model_validate(player).model_dump(mode="json"))
     db.commit()
     db.refresh(player)
-    return player
+    return PlayerOut.model_validate(player)
 
 
 @router.patch("/players/{player_id}/chips", response_model=PlayerOut)
-def update_player_chips(player_id: int, body: PlayerUpdateChips, request: Request, db: Session = Depends(get_db)):
+async def update_player_chips(player_id: int, body: PlayerUpdateChips, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _update_player_chips, player_id, body, request)
+
+
+@retry_on_conflict
+def _update_player_chips(db: Session, player_id: int, body: PlayerUpdateChips, request: Request):
     player = db.query(Player).filter(Player.id == player_id).first()
     if not player:
         raise HTTPException(status_code=404, detail={"error": "NotFound", "message": f"Player {player_id} not found"})
@@ -44,35 +61,75 @@ def update_player_chips(player_id: int, body: PlayerUpdateChips, request: Reques
             detail={"error": "Conflict", "message": "Cannot update chips in a closed game"},
         )
     player.actual_chips = body.actual_chips
+    db.flush()
+    version = record_change(db, player.game_id, "player.chips", player_chips_delta(player))
+    game_states.advance_after_commit(db, player.game_id, version, PlayerState.of(player))
     db.commit()
     db.refresh(player)
-    return player
+    return PlayerOut.model_validate(player)
 
 
 @router.get("/players/{player_id}/transactions", response_model=list[TransactionOut])
-def list_player_transactions(player_id: int, request: Request, db: Session = Depends(get_db)):
+async def list_player_transactions(
+    player_id: int,
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    limit: int | None = OptionalPageSize,
+    db: DbSession = Depends(get_db),
+):
+    return await run_db(db, _list_player_transactions, player_id, request, response, cursor, limit)
+
+
+def _list_player_transactions(
+    db: Session, player_id: int, request: Request, response: Response, cursor: str | None, limit: int | None
+):
+    """
+    Newest first; pass the X-Next-Cursor header back as `cursor` for the next, older page.
+
+    Without `cursor` or `limit` the whole history is returned, as before pagination.
+    """
     player = db.query(Player).filter(Player.id == player_id).first()
     if not player:
         raise HTTPException(status_code=404, detail={"error": "NotFound", "message": f"Player {player_id} not found"})
 
     require_game_session(db, request, player.game_id)
 
-    return (
-        db.query(Transaction)
-        .filter(Transaction.player_id == player_id)
-        .order_by(Transaction.created_at.desc())
-        .all()
-    )
+    query = db.query(Transaction).filter(Transaction.player_id == player_id)
+    if cursor:
+        query = query.filter(before(Transaction, cursor))
+    query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    if cursor is None and limit is None:
+        return [TransactionOut.model_validate(t) for t in query]
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    transactions = query.limit(limit + 1).all()
+
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return [TransactionOut.model_validate(t) for t in transactions]
 
 
 @router.delete("/players/{player_id}", status_code=204)
-def delete_player(player_id: int, request: Request, db: Session = Depends(get_db)):
+async def delete_player(player_id: int, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _delete_player, player_id, request)
+
+
+@retry_on_conflict
+def _delete_player(db: Session, player_id: int, request: Request):
     player = db.query(Player).filter(Player.id == player_id).first()
     if not player:
         raise HTTPException(status_code=404, detail={"error": "NotFound", "message": f"Player {player_id} not found"})
 
     require_host_session(db, request, player.game_id)
 
+    if db.query(Game.status).filter(Game.id == player.game_id).scalar() == "closed":
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "Conflict", "message": "Cannot delete a player from a closed game"},
+        )
     if player.transactions:
         raise HTTPException(
             status_code=409,
@@ -80,4 +137,9 @@ def delete_player(player_id: int, request: Request, db: Session = Depends(get_db
         )
 
     db.delete(player)
+    # Before the game row is touched: writers lock the player first, then the game
+    db.flush()
+    # Sessions pointing at this player lose their player_id
+    invalidate_game_sessions(db, player.game_id)
+    record_change(db, player.game_id, "player.deleted", {"id": player_id})
     db.commit()
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 
-from backend.auth import SESSION_COOKIE_NAME
-from backend.database import get_db
+from backend.auth import SESSION_COOKIE_NAME, get_cookie_token, invalidate_token_sessions
+from backend.commit_queue import run_write
+from backend.database import DbSession, get_db, run_db
 from backend.models import Session as GameSession
 from backend.schemas import SessionInfoOut
 
@@ -10,8 +11,12 @@ router = APIRouter(tags=["session"])
 
 
 @router.get("/session", response_model=SessionInfoOut | None)
-def get_session_info(request: Request, db: Session = Depends(get_db)):
-    token = request.cookies.get(SESSION_COOKIE_NAME)
+async def get_session_info(request: Request, db: DbSession = Depends(get_db)):
+    return await run_db(db, _get_session_info, request)
+
+
+def _get_session_info(db: Session, request: Request):
+    token = get_cookie_token(request)
     if not token:
         return None
 
@@ -34,10 +39,15 @@ def get_session_info(request: Request, db: Session = Depends(get_db)):
 
 
 @router.delete("/session", status_code=204)
-def delete_session(response: Response, request: Request, db: Session = Depends(get_db)):
-    token = request.cookies.get(SESSION_COOKIE_NAME)
+async def delete_session(response: Response, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _delete_session, response, request)
+
+
+def _delete_session(db: Session, response: Response, request: Request):
+    token = get_cookie_token(request)
     if token:
         db.query(GameSession).filter(GameSession.token == token).delete(synchronize_session=False)
+        invalidate_token_sessions(db, token)
         db.commit()
 
     response.delete_cookie(SESSION_COOKIE_NAME)
@@ -1,16 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from datetime import datetime, timezone
+from typing import NoReturn
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, insert, update
 from sqlalchemy.orm import Session
 
 from backend.auth import require_game_session
-from backend.database import get_db
+from backend.commit_queue import run_write
+from backend.concurrency import retry_on_conflict
+from backend.database import DbSession, get_db, run_db
+from backend.game_state import PlayerState, game_states
 from backend.models import Game, Player, Transaction
-from backend.schemas import TransactionCreate, TransactionOut
+from backend.pagination import NEXT_CURSOR_HEADER, PageSize, after, encode_cursor
+from backend.realtime import player_chips_delta
+from backend.schemas import (
+    TransactionBatchCreate,
+    TransactionBatchOut,
+    TransactionBatchResult,
+    TransactionCreate,
+    TransactionOut,
+)
+from backend.services.changes import record_change
 
 router = APIRouter(tags=["transactions"])
 
 
+def _available_chips(buy_in_chips: int, cash_out_chips: int, actual_chips: int | None) -> int:
+    return actual_chips if actual_chips is not None else buy_in_chips - cash_out_chips
+
+
+def _cash_out_error(chips: int, available: int) -> str:
+    return f"Cannot cash out {chips} chips — player only has {available} available"
+
+
 @router.post("/transactions/", response_model=TransactionOut, status_code=201)
-def create_transaction(body: TransactionCreate, request: Request, db: Session = Depends(get_db)):
+async def create_transaction(body: TransactionCreate, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _create_transaction, body, request)
+
+
+def _create_transaction(db: Session, body: TransactionCreate, request: Request):
     require_game_session(db, request, body.game_id)
 
     game = db.query(Game).filter(Game.id == body.game_id).first()
@@ -28,9 +56,84 @@ def create_transaction(body: TransactionCreate, request: Request, db: Session =
             },
         )
 
-    player = (
-        db.query(Player).with_for_update().filter(Player.id == body.player_id).first()
+    if body.type == "cash_out":
+        # When this worker holds the game at the version just read, an overdraft is
+        # rejected without touching the player row
+        state = game_states.cached(game)
+        cached = state.players.get(body.player_id) if state else None
+        if cached is not None:
+            current_chips = _available_chips(cached.buy_in_chips, cached.cash_out_chips, cached.actual_chips)
+            if body.chips > current_chips:
+                raise HTTPException(
+                    status_code=400,
+                    detail={"error": "BadRequest", "message": _cash_out_error(body.chips, current_chips)},
+                )
+
+    player = _apply_to_player(db, body)
+    if player is None:
+        _raise_rejected(db, body)
+
+    transaction = Transaction(
+        game_id=body.game_id,
+        player_id=body.player_id,
+        type=body.type,
+        chips=body.chips,
     )
+    db.add(transaction)
+    db.flush()
+    version = record_change(
+        db,
+        body.game_id,
+        "transaction.created",
+        {
+            "transaction": TransactionOut.model_validate(transaction).model_dump(mode="json"),
+            "player": player_chips_delta(player),
+        },
+    )
+    game_states.advance_after_commit(db, body.game_id, version, player)
+    db.commit()
+    db.refresh(transaction)
+    return TransactionOut.model_validate(transaction)
+
+
+def _apply_to_player(db: Session, body: TransactionCreate) -> PlayerState | None:
+    """
+    Add a buy-in or cash-out to the player's counters in one conditional UPDATE.
+
+    The cash-out limit is part of the WHERE clause, so it is checked against the row
+    as it stands when the UPDATE runs: concurrent writers to the same player queue
+    on its row lock (or SQLite's write lock) instead of failing a version check and
+    retrying. The version is still bumped for the ORM paths that check it. Returns
+    the new values, or None when no row qualified.
+    """
+    buy_in = body.chips if body.type == "buy_in" else 0
+    cash_out = body.chips if body.type == "cash_out" else 0
+    statement = (
+        update(Player)
+        .where(Player.id == body.player_id, Player.game_id == body.game_id)
+        .values(
+            buy_in_chips=Player.buy_in_chips + buy_in,
+            cash_out_chips=Player.cash_out_chips + cash_out,
+            # Stays NULL while the player's chips have not been counted
+            actual_chips=Player.actual_chips + (buy_in - cash_out),
+            version=Player.version + 1,
+        )
+        .returning(
+            Player.id, Player.name, Player.actual_chips, Player.buy_in_chips, Player.cash_out_chips, Player.version
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if cash_out:
+        statement = statement.where(
+            func.coalesce(Player.actual_chips, Player.buy_in_chips - Player.cash_out_chips) >= cash_out
+        )
+    row = db.execute(statement).first()
+    return PlayerState(*row) if row else None
+
+
+def _raise_rejected(db: Session, body: TransactionCreate) -> NoReturn:
+    """Explain why `_apply_to_player` matched no row."""
+    player = db.query(Player).filter(Player.id == body.player_id).first()
     if not player:
         raise HTTPException(
             status_code=404,
@@ -47,50 +150,190 @@ def create_transaction(body: TransactionCreate, request: Request, db: Session =
                 "message": "Player does not belong to the specified game",
             },
         )
+    current_chips = _available_chips(player.buy_in_chips, player.cash_out_chips, player.actual_chips)
+    raise HTTPException(
+        status_code=400,
+        detail={"error": "BadRequest", "message": _cash_out_error(body.chips, current_chips)},
+    )
 
-    if body.type == "cash_out":
-        buy_in = sum(t.chips for t in player.transactions if t.type == "buy_in")
-        cash_out = sum(t.chips for t in player.transactions if t.type == "cash_out")
-        chips_in_play = buy_in - cash_out
-        current_chips = (
-            player.actual_chips if player.actual_chips is not None else chips_in_play
+
+@router.get("/games/{game_id}/transactions", response_model=list[TransactionOut])
+async def list_game_transactions(
+    game_id: int,
+    request: Request,
+    response: Response,
+    since: str | None = None,
+    limit: int = PageSize,
+    db: DbSession = Depends(get_db),
+):
+    return await run_db(db, _list_game_transactions, game_id, request, response, since, limit)
+
+
+def _list_game_transactions(
+    db: Session, game_id: int, request: Request, response: Response, since: str | None, limit: int
+):
+    """
+    Game-wide feed, oldest first.
+
+    X-Next-Cursor always names the last entry the client has seen (or echoes
+    `since` when nothing is new), so polling with it returns only newer entries.
+
+    The cursor orders by `created_at`, which is set before commit. On PostgreSQL a
+    transaction that commits after a later-stamped one may already be behind a
+    client's cursor and is then never returned. Clients that must not miss an
+    entry should sync with GET /games/{id}/changes, which is keyed on the game
+    version and so follows commit order.
+    """
+    require_game_session(db, request, game_id)
+
+    query = db.query(Transaction).filter(Transaction.game_id == game_id)
+    if since:
+        query = query.filter(after(Transaction, since))
+    transactions = query.order_by(Transaction.created_at, Transaction.id).limit(limit).all()
+
+    if transactions:
+        last = transactions[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    elif since:
+        response.headers[NEXT_CURSOR_HEADER] = since
+    return [TransactionOut.model_validate(t) for t in transactions]
+
+
+@router.post("/games/{game_id}/transactions/batch", response_model=TransactionBatchOut)
+async def create_transactions_batch(
+    game_id: int, body: TransactionBatchCreate, request: Request, db: DbSession = Depends(get_db)
+):
+    return await run_write(db, _create_transactions_batch, game_id, body, request)
+
+
+@retry_on_conflict
+def _create_transactions_batch(db: Session, game_id: int, body: TransactionBatchCreate, request: Request):
+    require_game_session(db, request, game_id)
+
+    game = db.query(Game).filter(Game.id == game_id).first()
+    if not game:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "NotFound", "message": f"Game {game_id} not found"},
+        )
+    if game.status == "closed":
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "Conflict", "message": "Cannot add transactions to a closed game"},
         )
 
-        if body.chips > current_chips:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": "BadRequest",
-                    "message": f"Cannot cash out {body.chips} chips — player only has {current_chips} available",
+    # Validated against this read; a concurrent write to any of these players makes
+    # the versioned UPDATEs fail and the whole batch is retried
+    player_ids = sorted({item.player_id for item in body.items})
+    players = {p.id: p for p in db.query(Player).filter(Player.id.in_(player_ids)).order_by(Player.id).all()}
+    running = {p.id: [p.buy_in_chips, p.cash_out_chips, p.actual_chips] for p in players.values()}
+
+    results: list[TransactionBatchResult] = []
+    accepted: list[tuple[int, dict]] = []
+    now = datetime.now(timezone.utc)
+    for index, item in enumerate(body.items):
+        player = players.get(item.player_id)
+        if not player:
+            results.append(
+                TransactionBatchResult(index=index, status="rejected", error=f"Player {item.player_id} not found")
+            )
+            continue
+        if player.game_id != game_id:
+            results.append(
+                TransactionBatchResult(
+                    index=index, status="rejected", error="Player does not belong to the specified game"
+                )
+            )
+            continue
+
+        totals = running[player.id]
+        if item.type == "cash_out":
+            current_chips = _available_chips(*totals)
+            if item.chips > current_chips:
+                results.append(
+                    TransactionBatchResult(
+                        index=index, status="rejected", error=_cash_out_error(item.chips, current_chips)
+                    )
+                )
+                continue
+            totals[1] += item.chips
+            if totals[2] is not None:
+                totals[2] -= item.chips
+        else:
+            totals[0] += item.chips
+            if totals[2] is not None:
+                totals[2] += item.chips
+
+        results.append(TransactionBatchResult(index=index, status="created"))
+        accepted.append(
+            (
+                len(results) - 1,
+                {
+                    "game_id": game_id,
+                    "player_id": item.player_id,
+                    "type": item.type,
+                    "chips": item.chips,
+                    "created_at": now,
                 },
             )
+        )
 
-    if player.actual_chips is not None:
-        if body.type == "buy_in":
-            player.actual_chips += body.chips
-        elif body.type == "cash_out":
-            player.actual_chips -= body.chips
+    if accepted:
+        # RETURNING rows come back in parameter order, so they line up with `accepted`
+        transactions = db.scalars(
+            insert(Transaction).returning(Transaction, sort_by_parameter_order=True),
+            [row for _, row in accepted],
+        ).all()
+        for (result_index, _), transaction in zip(accepted, transactions):
+            results[result_index].transaction = TransactionOut.model_validate(transaction)
 
-    transaction = Transaction(
-        game_id=body.game_id,
-        player_id=body.player_id,
-        type=body.type,
-        chips=body.chips,
+        touched = {row["player_id"] for _, row in accepted}
+        for player_id in touched:
+            player = players[player_id]
+            buy_in_delta = running[player_id][0] - player.buy_in_chips
+            cash_out_delta = running[player_id][1] - player.cash_out_chips
+            if buy_in_delta:
+                player.buy_in_chips = Player.buy_in_chips + buy_in_delta
+            if cash_out_delta:
+                player.cash_out_chips = Player.cash_out_chips + cash_out_delta
+            player.actual_chips = running[player_id][2]
+        db.flush()
+
+        record_change(
+            db,
+            game_id,
+            "transactions.created",
+            {
+                "transactions": [r.transaction.model_dump(mode="json") for r in results if r.transaction],
+                "players": [
+                    {
+                        "id": player_id,
+                        "buy_in_chips": running[player_id][0],
+                        "cash_out_chips": running[player_id][1],
+                        "actual_chips": running[player_id][2],
+                    }
+                    for player_id in sorted(touched)
+                ],
+            },
+        )
+        db.commit()
+
+    return TransactionBatchOut(
+        created=len(accepted),
+        rejected=len(results) - len(accepted),
+        results=results,
     )
-    db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
-    return transaction
 
 
 @router.delete("/transactions/{transaction_id}", status_code=204)
-def delete_transaction(transaction_id: int, request: Request, db: Session = Depends(get_db)):
-    transaction = (
-        db.query(Transaction)
-        .with_for_update()
-        .filter(Transaction.id == transaction_id)
-        .first()
-    )
+async def delete_transaction(transaction_id: int, request: Request, db: DbSession = Depends(get_db)):
+    return await run_write(db, _delete_transaction, transaction_id, request)
+
+
+@retry_on_conflict
+def _delete_transaction(db: Session, transaction_id: int, request: Request):
+    # A concurrent delete of the same row makes the DELETE match nothing; the retry then 404s
+    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
     if not transaction:
         raise HTTPException(
             status_code=404,
@@ -102,17 +345,32 @@ def delete_transaction(transaction_id: int, request: Request, db: Session = Depe
 
     require_game_session(db, request, transaction.game_id)
 
-    player = (
-        db.query(Player)
-        .with_for_update()
-        .filter(Player.id == transaction.player_id)
-        .first()
-    )
-    if player and player.actual_chips is not None:
+    # Closed games' settlements are served as immutable (backend.caching)
+    if db.query(Game.status).filter(Game.id == transaction.game_id).scalar() == "closed":
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "Conflict", "message": "Cannot delete transactions from a closed game"},
+        )
+
+    player = db.query(Player).filter(Player.id == transaction.player_id).first()
+    if player:
+        if player.actual_chips is not None:
+            if transaction.type == "buy_in":
+                player.actual_chips -= transaction.chips
+            elif transaction.type == "cash_out":
+                player.actual_chips += transaction.chips
+
         if transaction.type == "buy_in":
-            player.actual_chips -= transaction.chips
+            player.buy_in_chips = Player.buy_in_chips - transaction.chips
         elif transaction.type == "cash_out":
-            player.actual_chips += transaction.chips
+            player.cash_out_chips = Player.cash_out_chips - transaction.chips
 
     db.delete(transaction)
+    db.flush()
+    record_change(
+        db,
+        transaction.game_id,
+        "transaction.deleted",
+        {"id": transaction_id, "player": player_chips_delta(player) if player else None},
+    )
     db.commit()
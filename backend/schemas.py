@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Literal
 
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 # --- Requests ---
@@ -58,8 +58,7 @@ class PlayerUpdateChips(BaseModel):
         return v
 
 
-class TransactionCreate(BaseModel):
-    game_id: int
+class TransactionItem(BaseModel):
     player_id: int
     type: Literal["buy_in", "cash_out"]
     chips: int
@@ -72,6 +71,14 @@ class TransactionCreate(BaseModel):
         return v
 
 
+class TransactionCreate(TransactionItem):
+    game_id: int
+
+
+class TransactionBatchCreate(BaseModel):
+    items: list[TransactionItem] = Field(min_length=1, max_length=500)
+
+
 # --- Responses ---
 
 class GameOut(BaseModel):
@@ -115,6 +122,8 @@ class GameDetail(BaseModel):
     created_at: datetime
     closed_at: datetime | None
     players: list[PlayerStats]
+    # Pass as `since` to GET /games/{id}/changes
+    version: int | None = None
 
 
 class PlayerOut(BaseModel):
@@ -137,6 +146,33 @@ class TransactionOut(BaseModel):
     created_at: datetime
 
 
+class TransactionBatchResult(BaseModel):
+    index: int
+    status: Literal["created", "rejected"]
+    transaction: TransactionOut | None = None
+    error: str | None = None
+
+
+class TransactionBatchOut(BaseModel):
+    created: int
+    rejected: int
+    results: list[TransactionBatchResult]
+
+
+class GameChangeOut(BaseModel):
+    version: int
+    type: str
+    data: dict
+
+
+class GameChanges(BaseModel):
+    """Either every change after `since` or, when the log cannot provide them, a full snapshot."""
+
+    version: int
+    changes: list[GameChangeOut] | None = None
+    snapshot: GameDetail | None = None
+
+
 class JoinGameOut(BaseModel):
     game: GameOut
     player: PlayerOut | None = None
@@ -0,0 +1,63 @@
+import json
+import os
+from typing import Any
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from backend.models import Game, GameChange
+from backend.realtime import publish_after_commit
+
+# Clients further behind than this get a snapshot instead of the entries
+CHANGE_LOG_MAX_ENTRIES = int(os.environ.get("CHANGE_LOG_MAX_ENTRIES", "200"))
+
+
+def bump_game_version(db: Session, game_id: int) -> int:
+    """Increment the game's version inside the current transaction and return the new value."""
+    return db.execute(
+        update(Game)
+        .where(Game.id == game_id)
+        .values(version=Game.version + 1)
+        .returning(Game.version)
+    ).scalar_one()
+
+
+def record_change(db: Session, game_id: int, event_type: str, data: dict[str, Any]) -> int:
+    """
+    Register a mutation of a game.
+
+    Bumps the game version (invalidating ETags), appends the delta to the game's
+    change log under that version and queues it for realtime subscribers once
+    the transaction commits.
+    """
+    version = bump_game_version(db, game_id)
+    db.execute(
+        insert(GameChange).values(
+            game_id=game_id, version=version, type=event_type, data=json.dumps(data, separators=(",", ":"))
+        )
+    )
+    publish_after_commit(db, game_id, event_type, data, version=version)
+    return version
+
+
+def changes_between(db: Session, game_id: int, since: int, version: int) -> list[tuple[int, str, str]] | None:
+    """
+    The (version, type, JSON data) entries that took the game from `since` to `version`.
+
+    None when the log cannot provide all of them: more than CHANGE_LOG_MAX_ENTRIES
+    are needed, or some were never recorded (creation, repairs by backend.reconcile)
+    or already pruned.
+    """
+    missing = version - since
+    if missing < 0 or missing > CHANGE_LOG_MAX_ENTRIES:
+        return None
+    if missing == 0:
+        return []
+    rows = (
+        db.query(GameChange.version, GameChange.type, GameChange.data)
+        .filter(GameChange.game_id == game_id, GameChange.version > since, GameChange.version <= version)
+        .order_by(GameChange.version)
+        .all()
+    )
+    # Versions are unique per game, so a full count means no gaps
+    return [tuple(row) for row in rows] if len(rows) == missing else None
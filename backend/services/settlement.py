@@ -1,4 +1,21 @@
+import time
 from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from backend.models import Game, Settlement
+from backend.schemas import PlayerSummary, SettlementOut, TransferOut
+from backend.services.stats import compute_player_stats, get_player_totals
+
+# Above this many unmatched players the exact search (2^n states) is skipped
+EXACT_MAX_PLAYERS = 16
+DEFAULT_TIME_BUDGET = 0.2  # seconds per call
+
+# Absorbs any imbalance (chips lost or miscounted) so the exact search always sees
+# a zero-sum table; transfers to or from it are dropped
+_RESIDUAL = None
 
 
 @dataclass
@@ -8,47 +25,176 @@ class Transfer:
     amount: float
 
 
-def calculate_settlement(balances: dict[str, float]) -> list[Transfer]:
+def to_cents(amount: float | Decimal) -> int:
+    """Round a money amount to whole cents, half away from zero."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def calculate_settlement(
+    balances: dict[str, float], time_budget: float = DEFAULT_TIME_BUDGET
+) -> list[Transfer]:
     """
-    Greedy O(n log n) settlement algorithm.
+    Settle a table with as few transfers as possible.
 
     Args:
         balances: dict mapping player name → net balance (positive = owed money, negative = owes money)
+        time_budget: seconds the exact search may spend before falling back to greedy
 
     Returns:
-        Minimal list of transfers to settle all debts.
+        Transfers whose amounts are whole cents and sum exactly to what is owed.
     """
-    # Filter out zero balances
-    debtors = sorted(
-        [(name, -bal) for name, bal in balances.items() if bal < -0.005],
-        key=lambda x: x[1],
-        reverse=True,
-    )  # (name, amount_owed), largest first
-    creditors = sorted(
-        [(name, bal) for name, bal in balances.items() if bal > 0.005],
-        key=lambda x: x[1],
-        reverse=True,
-    )  # (name, amount_to_receive), largest first
-
-    transfers: list[Transfer] = []
+    cents = {name: to_cents(balance) for name, balance in balances.items()}
+    return [
+        Transfer(from_player=debtor, to_player=creditor, amount=amount / 100)
+        for debtor, creditor, amount in settle_cents(cents, time_budget)
+    ]
 
-    d_idx, c_idx = 0, 0
-    debtors_list = [list(d) for d in debtors]
-    creditors_list = [list(c) for c in creditors]
 
-    while d_idx < len(debtors_list) and c_idx < len(creditors_list):
-        debtor_name, debt = debtors_list[d_idx]
-        creditor_name, credit = creditors_list[c_idx]
+def build_settlement(db: Session, game: Game) -> SettlementOut:
+    stats = [
+        compute_player_stats(p, game.chip_value)
+        for p in get_player_totals(db, game.id, archived=game.archived_at is not None)
+    ]
+    balances = {s.name: s.net_balance for s in stats}
+    transfers = calculate_settlement(balances)
+
+    return SettlementOut(
+        player_summary=[
+            PlayerSummary(
+                id=s.id,
+                name=s.name,
+                money_spent=s.money_spent,
+                final_value=s.net_balance + s.money_spent,
+                profit_loss=s.net_balance,
+            )
+            for s in stats
+        ],
+        transfers=[
+            TransferOut(
+                from_player=t.from_player, to_player=t.to_player, amount=t.amount
+            )
+            for t in transfers
+        ],
+    )
+
+
+def store_settlement(db: Session, game_id: int, version: int, settlement: SettlementOut) -> None:
+    """Keep `settlement` as the rendered settlement of `game_id` at `version`, if the write can go ahead."""
+    try:
+        with db.begin_nested():
+            db.merge(Settlement(game_id=game_id, version=version, payload=settlement.model_dump_json()))
+    except (IntegrityError, OperationalError):
+        # A concurrent request stored it first (Postgres), or holds the write lock
+        # this read transaction would need to upgrade to (SQLite). The row is only a
+        # cache; the next read stores it.
+        pass
+
+
+def settle_cents(balances: dict[str, int], time_budget: float = DEFAULT_TIME_BUDGET) -> list[tuple[str, str, int]]:
+    """
+    Integer core of `calculate_settlement`: returns (debtor, creditor, cents) triples.
+
+    A table of n players splits into k groups that each sum to zero needs exactly
+    n - k transfers, so the fewest transfers come from the most zero-sum groups.
+    Equal and opposite pairs are cancelled first; the rest is partitioned exactly
+    when small enough and within the time budget, otherwise settled greedily.
+    """
+    deadline = time.perf_counter() + time_budget
+    remaining = {name: amount for name, amount in sorted(balances.items()) if amount != 0}
+    imbalance = sum(remaining.values())
+    if imbalance:
+        remaining[_RESIDUAL] = -imbalance
+
+    transfers = _cancel_pairs(remaining)
 
-        amount = min(debt, credit)
-        transfers.append(Transfer(from_player=debtor_name, to_player=creditor_name, amount=round(amount, 2)))
+    groups = None
+    if len(remaining) <= EXACT_MAX_PLAYERS:
+        groups = _zero_sum_groups(list(remaining.items()), deadline)
+    for group in groups or [list(remaining.items())]:
+        transfers.extend(_greedy(group))
 
-        debtors_list[d_idx][1] -= amount
-        creditors_list[c_idx][1] -= amount
+    return [t for t in transfers if _RESIDUAL not in (t[0], t[1])]
 
-        if debtors_list[d_idx][1] < 0.005:
+
+def _cancel_pairs(remaining: dict[str, int]) -> list[tuple[str, str, int]]:
+    transfers = []
+    creditors_by_amount: dict[int, list[str]] = {}
+    for name, amount in remaining.items():
+        if amount > 0:
+            creditors_by_amount.setdefault(amount, []).append(name)
+
+    for name, amount in list(remaining.items()):
+        if amount >= 0:
+            continue
+        creditors = creditors_by_amount.get(-amount)
+        if creditors:
+            creditor = creditors.pop(0)
+            transfers.append((name, creditor, -amount))
+            del remaining[name], remaining[creditor]
+    return transfers
+
+
+def _zero_sum_groups(players: list[tuple[str, int]], deadline: float) -> list[list[tuple[str, int]]] | None:
+    """
+    Partition players into the largest number of zero-sum groups, or None past the deadline.
+
+    best[mask] is the most zero-sum groups that the players in `mask` can be
+    ordered into when removed one at a time; it counts every zero-sum prefix.
+    """
+    n = len(players)
+    if n == 0:
+        return []
+    full = (1 << n) - 1
+    sums = [0] * (full + 1)
+    best = [0] * (full + 1)
+
+    for mask in range(1, full + 1):
+        if not mask & 0x3FF and time.perf_counter() > deadline:
+            return None
+        low = mask & -mask
+        sums[mask] = sums[mask ^ low] + players[low.bit_length() - 1][1]
+        top = 0
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            if best[mask ^ bit] > top:
+                top = best[mask ^ bit]
+        best[mask] = top + (sums[mask] == 0)
+
+    groups = []
+    mask = boundary = full
+    while mask:
+        target = best[mask] - (sums[mask] == 0)
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            if best[mask ^ bit] == target:
+                break
+        mask ^= bit
+        if mask and sums[mask] == 0:
+            groups.append(boundary ^ mask)
+            boundary = mask
+    groups.append(boundary)
+
+    return [[players[i] for i in range(n) if group >> i & 1] for group in groups]
+
+
+def _greedy(players: list[tuple[str, int]]) -> list[tuple[str, str, int]]:
+    """Largest debtor pays largest creditor until one side runs out."""
+    debtors = sorted(([name, -amount] for name, amount in players if amount < 0), key=lambda d: -d[1])
+    creditors = sorted(([name, amount] for name, amount in players if amount > 0), key=lambda c: -c[1])
+
+    transfers = []
+    d_idx, c_idx = 0, 0
+    while d_idx < len(debtors) and c_idx < len(creditors):
+        amount = min(debtors[d_idx][1], creditors[c_idx][1])
+        transfers.append((debtors[d_idx][0], creditors[c_idx][0], amount))
+        debtors[d_idx][1] -= amount
+        creditors[c_idx][1] -= amount
+        if debtors[d_idx][1] == 0:
             d_idx += 1
-        if creditors_list[c_idx][1] < 0.005:
+        if creditors[c_idx][1] == 0:
             c_idx += 1
-
     return transfers
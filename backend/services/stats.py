@@ -0,0 +1,86 @@
+import json
+from dataclasses import dataclass
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from backend.models import GameArchive, Player, Transaction
+from backend.schemas import PlayerStats
+
+
+@dataclass
+class PlayerTotals:
+    id: int
+    name: str
+    actual_chips: int | None
+    buy_in_chips: int
+    cash_out_chips: int
+
+
+def get_player_totals(db: Session, game_id: int, archived: bool = False) -> list[PlayerTotals]:
+    """
+    Buy-in and cash-out totals for every player in a game.
+
+    Reads the running counters kept on `players`, so the cost is one indexed
+    query regardless of how many transactions the game has. Pass `archived` for
+    games whose `archived_at` is set; their players live in `game_archives`.
+    """
+    if archived:
+        payload = db.query(GameArchive.payload).filter(GameArchive.game_id == game_id).scalar()
+        return [PlayerTotals(*row) for row in json.loads(payload)["players"]] if payload else []
+
+    rows = (
+        db.query(Player.id, Player.name, Player.actual_chips, Player.buy_in_chips, Player.cash_out_chips)
+        .filter(Player.game_id == game_id)
+        .order_by(Player.id)
+        .all()
+    )
+    return [
+        PlayerTotals(
+            id=row[0],
+            name=row[1],
+            actual_chips=row[2],
+            buy_in_chips=row[3],
+            cash_out_chips=row[4],
+        )
+        for row in rows
+    ]
+
+
+def compute_player_stats(player: PlayerTotals, chip_value: float) -> PlayerStats:
+    buy_in_chips = player.buy_in_chips
+    cash_out_chips = player.cash_out_chips
+    chips_in_play = buy_in_chips - cash_out_chips
+
+    money_spent = buy_in_chips * chip_value
+    current_chips = player.actual_chips if player.actual_chips is not None else chips_in_play
+
+    virtual_value = current_chips * chip_value
+    cashed_out_value = cash_out_chips * chip_value
+    net_balance = (virtual_value + cashed_out_value) - money_spent
+
+    return PlayerStats(
+        id=player.id,
+        name=player.name,
+        buy_in_chips=buy_in_chips,
+        cash_out_chips=cash_out_chips,
+        chips_in_play=chips_in_play,
+        actual_chips=player.actual_chips,
+        money_spent=money_spent,
+        net_balance=net_balance,
+    )
+
+
+def get_ledger_totals(db: Session, game_id: int | None = None) -> dict[int, tuple[int, int]]:
+    """
+    Buy-in and cash-out totals per player derived from the `transactions` table.
+
+    This is the source of truth the counters on `players` are reconciled against.
+    Players without transactions are absent from the result.
+    """
+    buy_in = func.sum(case((Transaction.type == "buy_in", Transaction.chips), else_=0))
+    cash_out = func.sum(case((Transaction.type == "cash_out", Transaction.chips), else_=0))
+    query = db.query(Transaction.player_id, buy_in, cash_out).group_by(Transaction.player_id)
+    if game_id is not None:
+        query = query.filter(Transaction.game_id == game_id)
+    return {row[0]: (int(row[1]), int(row[2])) for row in query.all()}
@@ -1,10 +1,14 @@
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from backend.database import Base, get_db
+from backend.auth import session_cache
+from backend.database import Base, get_db, instrument_queries
+from backend.game_state import game_states
 from backend.main import app
 
 # Use in-memory SQLite for testing
@@ -15,11 +19,16 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+instrument_queries(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 @pytest.fixture()
-def db():
+def db(monkeypatch):
+    # Budgets and tests assume the cache a postgres-broker deployment has on by default
+    monkeypatch.setattr(session_cache, "max_size", 10000)
+    session_cache.clear()
+    game_states.clear()
     Base.metadata.create_all(bind=engine)
     db = TestingSessionLocal()
     try:
@@ -41,3 +50,53 @@ def client(db):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def record_statements():
+    """`with record_statements(engine) as statements:` collects the SQL `engine` runs in the block."""
+
+    @contextmanager
+    def record(bind):
+        statements: list[str] = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(bind, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(bind, "before_cursor_execute", listener)
+
+    return record
+
+
+@pytest.fixture()
+def max_queries(db, record_statements):
+    """
+    `with max_queries(n): client.get(...)` fails if the block runs more than n SQL
+    statements, so N+1 regressions show up as test failures.
+    """
+
+    @contextmanager
+    def check(limit: int):
+        with record_statements(db.get_bind()) as statements:
+            yield statements
+        assert len(statements) <= limit, f"{len(statements)} queries (max {limit}):\n" + "\n".join(statements)
+
+    return check
+
+
+@pytest.fixture()
+def closed_game(client) -> int:
+    """A closed game at 0.5 per chip where Bob owes Ana 25: both bought in for 100, Ana ended with 150."""
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 0.5}).json()["id"]
+    ana = client.post(f"/api/games/{game_id}/players/", json={"name": "Ana"}).json()["id"]
+    bob = client.post(f"/api/games/{game_id}/players/", json={"name": "Bob"}).json()["id"]
+    for player_id in (ana, bob):
+        client.post(
+            "/api/transactions/",
+            json={"game_id": game_id, "player_id": player_id, "type": "buy_in", "chips": 100},
+        )
+    client.patch(f"/api/players/{ana}/chips", json={"actual_chips": 150})
+    client.patch(f"/api/players/{bob}/chips", json={"actual_chips": 50})
+    client.patch(f"/api/games/{game_id}/close")
+    return game_id
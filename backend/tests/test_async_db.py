@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm.exc import StaleDataError  # noqa: E402
+
+from backend import concurrency  # noqa: E402
+from backend.concurrency import retry_on_conflict  # noqa: E402
+from backend.database import Base, get_db  # noqa: E402
+from backend.routers import games, players, session, transactions  # noqa: E402
+
+
+@pytest.fixture()
+def async_client(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+
+    async def create_schema():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_schema())
+    AsyncTestingSession = async_sessionmaker(engine, autoflush=False)
+
+    app = FastAPI()
+    for module in (games, players, transactions, session):
+        app.include_router(module.router, prefix="/api")
+
+    seen_sessions = []
+
+    async def override_get_db():
+        async with AsyncTestingSession() as db:
+            seen_sessions.append(db)
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as client:
+        client.seen_sessions = seen_sessions
+        yield client
+    asyncio.run(engine.dispose())
+
+
+def test_routes_run_on_async_session(async_client):
+    created = async_client.post("/api/games/", json={"name": "Async", "chip_value": 0.5}).json()
+    player = async_client.post(f"/api/games/{created['id']}/players/", json={"name": "Ana"}).json()
+    txn = async_client.post(
+        "/api/transactions/",
+        json={"game_id": created["id"], "player_id": player["id"], "type": "buy_in", "chips": 100},
+    )
+    assert txn.status_code == 201
+
+    detail = async_client.get(f"/api/games/{created['id']}").json()
+    assert detail["players"][0]["buy_in_chips"] == 100
+    assert detail["players"][0]["money_spent"] == 50.0
+
+    history = async_client.get(f"/api/players/{player['id']}/transactions").json()
+    assert [t["chips"] for t in history] == [100]
+
+    assert async_client.patch(f"/api/games/{created['id']}/close").status_code == 200
+    assert async_client.get(f"/api/games/{created['id']}/settlement").status_code == 200
+    assert all(isinstance(db, AsyncSession) for db in async_client.seen_sessions)
+
+
+def test_async_session_errors_map_to_http_responses(async_client):
+    created = async_client.post("/api/games/", json={"name": "Async", "chip_value": 1.0}).json()
+    player = async_client.post(f"/api/games/{created['id']}/players/", json={"name": "Ana"}).json()
+
+    res = async_client.post(
+        "/api/transactions/",
+        json={"game_id": created["id"], "player_id": player["id"], "type": "cash_out", "chips": 1},
+    )
+    assert res.status_code == 400
+    assert async_client.get("/api/games/999").status_code == 401
+
+
+def test_conflict_backoff_does_not_block_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(concurrency, "OPTIMISTIC_BACKOFF", 0.05)
+    monkeypatch.setattr(concurrency.random, "uniform", lambda low, high: high)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'backoff.db'}")
+    attempts = []
+
+    @retry_on_conflict
+    def unit(db):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise StaleDataError("lost a race")
+        return len(attempts)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        async with AsyncSession(engine) as db:
+            result = await db.run_sync(unit)
+        task.cancel()
+        await engine.dispose()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result == 3
+    # Two backoffs of 50 and 100 ms; a blocking sleep would leave the ticker at 0
+    assert ticks >= 10
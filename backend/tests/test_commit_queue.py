@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import commit_queue as queue_module
+from backend.auth import session_cache
+from backend.benchmarks import bench_player_contention
+from backend.commit_queue import CommitQueue
+from backend.database import get_db
+from backend.main import app
+from backend.migrations import migrate
+from backend.models import Game
+from backend.realtime import broker, publish_after_commit
+
+
+@pytest.fixture()
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path}/queue.db"
+    engine = create_engine(url)
+    migrate(engine)
+    engine.dispose()
+    return url
+
+
+def _add_game(db, name: str, fail: bool = False) -> int:
+    game = Game(name=name, chip_value=1, pin=str(100000 + len(name)))
+    db.add(game)
+    db.flush()
+    if fail:
+        raise HTTPException(status_code=409, detail={"error": "Conflict", "message": name})
+    db.commit()
+    return game.id
+
+
+def test_units_share_one_commit_and_fail_alone(database_url):
+    queue = CommitQueue(database_url, window=0.2)
+
+    async def submit_all():
+        return await asyncio.gather(
+            queue.submit(_add_game, "a"),
+            queue.submit(_add_game, "bb", fail=True),
+            queue.submit(_add_game, "ccc"),
+            return_exceptions=True,
+        )
+
+    try:
+        first, failed, third = asyncio.run(submit_all())
+    finally:
+        queue.stop()
+
+    assert isinstance(failed, HTTPException)
+    assert queue.stats()["batches"] == 1 and queue.stats()["units"] == 3
+    db = sessionmaker(bind=create_engine(database_url))()
+    try:
+        assert sorted(name for (name,) in db.query(Game.name)) == ["a", "ccc"]
+        assert {first, third} == {game_id for (game_id,) in db.query(Game.id)}
+    finally:
+        db.close()
+
+
+def test_events_are_published_after_the_batch_commits(database_url, monkeypatch):
+    published = []
+    monkeypatch.setattr(broker, "publish", lambda game_id, message: published.append(game_id))
+    queue = CommitQueue(database_url)
+
+    def unit(db):
+        publish_after_commit(db, 7, "player.added", {})
+        db.commit()  # releases the unit's savepoint only
+        return list(published)
+
+    try:
+        seen_inside = asyncio.run(queue.submit(unit))
+    finally:
+        queue.stop()
+
+    assert seen_inside == []
+    assert published == [7]
+
+
+def test_api_writes_through_the_queue_keep_invariants(database_url, monkeypatch):
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    queue = CommitQueue(database_url)
+    monkeypatch.setattr(queue_module, "commit_queue", queue)
+    session_cache.clear()
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        result = asyncio.run(bench_player_contention.run(app, Session, requests=80, concurrency=10))
+    finally:
+        app.dependency_overrides.clear()
+        queue.stop()
+        engine.dispose()
+
+    assert all(result["invariants"].values()), result
+    assert queue.stats()["batches"] < queue.stats()["units"]
@@ -0,0 +1,101 @@
+import gzip
+
+import pytest
+from starlette.testclient import TestClient
+
+from backend.caching import CACHE_IMMUTABLE, CACHE_REVALIDATE
+from backend.compression import COMPRESSION_MIN_SIZE, CompressionMiddleware, accepted_encodings
+
+
+def _busy_game(client, players: int = 30) -> int:
+    game_id = client.post("/api/games/", json={"name": "Friday", "chip_value": 0.25}).json()["id"]
+    for i in range(players):
+        player_id = client.post(f"/api/games/{game_id}/players/", json={"name": f"Player {i}"}).json()["id"]
+        client.post(
+            "/api/transactions/",
+            json={"game_id": game_id, "player_id": player_id, "type": "buy_in", "chips": 100 + i},
+        )
+    return game_id
+
+
+def _raw_get(client, path: str, encoding: str) -> tuple[dict, bytes]:
+    with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as res:
+        return res.headers, b"".join(res.iter_raw())
+
+
+def test_accept_encoding_parsing():
+    assert accepted_encodings("gzip, deflate, br;q=0.8") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip") == {"gzip"}
+    assert accepted_encodings("") == set()
+
+
+def test_game_detail_is_gzipped_when_accepted(client):
+    game_id = _busy_game(client)
+
+    identity_headers, identity = _raw_get(client, f"/api/games/{game_id}", "identity")
+    headers, body = _raw_get(client, f"/api/games/{game_id}", "gzip")
+
+    assert "content-encoding" not in identity_headers
+    assert headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in headers["vary"].lower()
+    assert gzip.decompress(body) == identity
+    assert len(body) < len(identity) / 4
+
+
+def test_brotli_is_preferred_when_installed(client):
+    brotli = pytest.importorskip("brotli")
+    game_id = _busy_game(client)
+
+    _, identity = _raw_get(client, f"/api/games/{game_id}", "identity")
+    headers, body = _raw_get(client, f"/api/games/{game_id}", "gzip, br")
+
+    assert headers["content-encoding"] == "br"
+    assert brotli.decompress(body) == identity
+
+
+def test_small_responses_are_not_compressed(client):
+    headers, body = _raw_get(client, "/api/games/", "gzip")
+    assert len(body) < COMPRESSION_MIN_SIZE
+    assert "content-encoding" not in headers
+
+
+def test_cache_policies(client):
+    game_id = _busy_game(client, players=2)
+
+    detail = client.get(f"/api/games/{game_id}")
+    assert detail.headers["cache-control"] == CACHE_REVALIDATE
+    revalidated = client.get(f"/api/games/{game_id}", headers={"If-None-Match": detail.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["cache-control"] == CACHE_REVALIDATE
+
+    client.patch(f"/api/games/{game_id}/close")
+    settlement = client.get(f"/api/games/{game_id}/settlement")
+    assert settlement.headers["cache-control"] == CACHE_IMMUTABLE
+    assert "immutable" in CACHE_IMMUTABLE
+
+
+def _app_sending(content_type: str, chunks: list[bytes]):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type.encode())]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    return CompressionMiddleware(app, minimum_size=10)
+
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk():
+    chunks = [b"x" * 1000, b"y" * 1000, b""]
+    headers, body = _raw_get(TestClient(_app_sending("text/plain", chunks)), "/", "gzip")
+
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert gzip.decompress(body) == b"".join(chunks)
+
+
+def test_event_streams_are_not_compressed():
+    chunks = [b"data: " + b"x" * 1000 + b"\n\n", b""]
+    headers, body = _raw_get(TestClient(_app_sending("text/event-stream", chunks)), "/", "gzip")
+
+    assert "content-encoding" not in headers
+    assert body == b"".join(chunks)
@@ -0,0 +1,78 @@
+def _create_game_with_player(client) -> tuple[int, int]:
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    player = client.post(f"/api/games/{created['id']}/players/", json={"name": "Ana"}).json()
+    return created["id"], player["id"]
+
+
+def test_game_detail_revalidates_until_a_mutation(client):
+    game_id, player_id = _create_game_with_player(client)
+
+    first = client.get(f"/api/games/{game_id}")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+
+    unchanged = client.get(f"/api/games/{game_id}", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+    assert unchanged.content == b""
+
+    client.post(
+        "/api/transactions/",
+        json={"game_id": game_id, "player_id": player_id, "type": "buy_in", "chips": 10},
+    )
+    changed = client.get(f"/api/games/{game_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_every_mutation_bumps_the_version(client):
+    game_id, player_id = _create_game_with_player(client)
+    tags = [client.get(f"/api/games/{game_id}").headers["etag"]]
+
+    txn = client.post(
+        "/api/transactions/",
+        json={"game_id": game_id, "player_id": player_id, "type": "buy_in", "chips": 10},
+    ).json()
+    tags.append(client.get(f"/api/games/{game_id}").headers["etag"])
+    client.delete(f"/api/transactions/{txn['id']}")
+    tags.append(client.get(f"/api/games/{game_id}").headers["etag"])
+    client.patch(f"/api/players/{player_id}/chips", json={"actual_chips": 5})
+    tags.append(client.get(f"/api/games/{game_id}").headers["etag"])
+    client.patch(f"/api/games/{game_id}", json={"big_blind_value": 2.0})
+    tags.append(client.get(f"/api/games/{game_id}").headers["etag"])
+    client.delete(f"/api/players/{player_id}")
+    tags.append(client.get(f"/api/games/{game_id}").headers["etag"])
+    client.patch(f"/api/games/{game_id}/close")
+    tags.append(client.get(f"/api/games/{game_id}").headers["etag"])
+
+    assert len(set(tags)) == len(tags)
+
+
+def test_unchanged_poll_does_not_load_players(client, db, record_statements):
+    game_id, _ = _create_game_with_player(client)
+    etag = client.get(f"/api/games/{game_id}").headers["etag"]
+
+    with record_statements(db.get_bind()) as statements:
+        res = client.get(f"/api/games/{game_id}", headers={"If-None-Match": etag})
+
+    assert res.status_code == 304
+    assert not any("FROM players" in statement for statement in statements)
+
+
+def test_settlement_and_list_support_if_none_match(client):
+    game_id, _ = _create_game_with_player(client)
+    client.patch(f"/api/games/{game_id}/close")
+
+    settlement = client.get(f"/api/games/{game_id}/settlement")
+    assert client.get(
+        f"/api/games/{game_id}/settlement", headers={"If-None-Match": settlement.headers["etag"]}
+    ).status_code == 304
+
+    listing = client.get("/api/games/")
+    list_etag = listing.headers["etag"]
+    assert client.get("/api/games/", headers={"If-None-Match": list_etag}).status_code == 304
+
+    client.post("/api/games/", json={"name": "B", "chip_value": 1.0})
+    relisted = client.get("/api/games/", headers={"If-None-Match": list_etag})
+    assert relisted.status_code == 200
+    assert len(relisted.json()) == 2
@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine, event, text
+
+from backend.database import PoolMetrics, TimedQueuePool, configure_sqlite, pool_metrics
+
+
+def test_pool_metrics_track_in_use_and_peak():
+    metrics = PoolMetrics()
+    metrics.checked_out()
+    metrics.checked_out()
+    metrics.checked_in()
+    metrics.record_wait(0.002)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["in_use"] == 1
+    assert snapshot["max_in_use"] == 2
+    assert snapshot["checkouts"] == 2
+    assert snapshot["wait_max_ms"] == 2.0
+
+
+def test_timed_queue_pool_records_checkout_wait(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1)
+    before = pool_metrics.snapshot()["wait_total_ms"]
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert pool_metrics.snapshot()["wait_total_ms"] > before
+    engine.dispose()
+
+
+def test_sqlite_connections_use_wal(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    event.listen(engine, "connect", configure_sqlite)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # 1 == NORMAL
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+    engine.dispose()
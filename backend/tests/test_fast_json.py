@@ -0,0 +1,37 @@
+import pytest
+
+from backend import responses
+
+
+@pytest.fixture()
+def fast_json(monkeypatch):
+    monkeypatch.setattr(responses, "FAST_JSON", True)
+
+
+def _read_endpoints(client, game_id: int) -> dict[str, tuple[bytes, str]]:
+    bodies = {}
+    for path in ("/api/games/", f"/api/games/{game_id}"):
+        res = client.get(path)
+        assert res.status_code == 200
+        bodies[path] = (res.content, res.headers["etag"])
+    return bodies
+
+
+def test_fast_json_matches_default_encoding(client, closed_game, monkeypatch):
+    default = _read_endpoints(client, closed_game)
+
+    monkeypatch.setattr(responses, "FAST_JSON", True)
+    assert _read_endpoints(client, closed_game) == default
+
+
+def test_fast_json_settlement_keeps_headers_and_payload(client, closed_game, fast_json):
+    game_id = closed_game
+    # Drop the stored copy so the response is rendered from the model
+    client.patch(f"/api/games/{game_id}", json={"big_blind_value": 1.0})
+
+    res = client.get(f"/api/games/{game_id}/settlement")
+
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/json"
+    assert res.headers["etag"].startswith(f'"s{game_id}-v')
+    assert res.json()["transfers"] == [{"from_player": "Bob", "to_player": "Ana", "amount": 25.0}]
@@ -0,0 +1,77 @@
+import pytest
+
+from backend.game_state import game_states
+from backend.models import Player
+from backend.services.changes import bump_game_version
+
+
+@pytest.fixture()
+def table(client, monkeypatch) -> dict[str, int]:
+    monkeypatch.setattr(game_states, "max_size", 100)
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 0.5}).json()["id"]
+    player_ids = [
+        client.post(f"/api/games/{game_id}/players/", json={"name": f"P{i}"}).json()["id"] for i in range(3)
+    ]
+    for player_id in player_ids:
+        client.post(
+            "/api/transactions/",
+            json={"game_id": game_id, "player_id": player_id, "type": "buy_in", "chips": 100},
+        )
+    return {"game_id": game_id, "player_id": player_ids[0]}
+
+
+def _players(client, game_id: int) -> dict[int, dict]:
+    return {p["id"]: p for p in client.get(f"/api/games/{game_id}").json()["players"]}
+
+
+def test_game_detail_is_served_from_memory(client, table, max_queries):
+    before = _players(client, table["game_id"])
+
+    # Only the games row, to compare versions
+    with max_queries(1):
+        assert _players(client, table["game_id"]) == before
+    assert game_states.stats()["hits"] >= 1
+
+
+def test_writes_advance_the_state_instead_of_discarding_it(client, table, max_queries):
+    _players(client, table["game_id"])
+    client.post(
+        "/api/transactions/",
+        json={"game_id": table["game_id"], "player_id": table["player_id"], "type": "cash_out", "chips": 40},
+    )
+    client.patch(f"/api/players/{table['player_id']}/chips", json={"actual_chips": 55})
+
+    with max_queries(1):
+        player = _players(client, table["game_id"])[table["player_id"]]
+    assert (player["buy_in_chips"], player["cash_out_chips"], player["actual_chips"]) == (100, 40, 55)
+    assert game_states.stats()["advances"] == 2
+
+
+def test_cash_out_is_validated_without_reading_the_player(client, table, max_queries):
+    _players(client, table["game_id"])
+
+    with max_queries(1) as statements:
+        res = client.post(
+            "/api/transactions/",
+            json={"game_id": table["game_id"], "player_id": table["player_id"], "type": "cash_out", "chips": 500},
+        )
+    assert res.status_code == 400
+    assert "FROM players" not in statements[0]
+
+
+def test_changes_made_elsewhere_rebuild_the_state(client, db, table):
+    _players(client, table["game_id"])
+
+    # Another worker (or a script) changes the player and bumps the game version
+    db.query(Player).filter(Player.id == table["player_id"]).update(
+        {Player.buy_in_chips: 300, Player.version: Player.version + 1}
+    )
+    bump_game_version(db, table["game_id"])
+    db.commit()
+
+    assert _players(client, table["game_id"])[table["player_id"]]["buy_in_chips"] == 300
+    res = client.post(
+        "/api/transactions/",
+        json={"game_id": table["game_id"], "player_id": table["player_id"], "type": "cash_out", "chips": 250},
+    )
+    assert res.status_code == 201
@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+from backend.database import pool_metrics
+from backend.metrics import db_gauges
+
+
+def _samples(text: str) -> dict[tuple, float]:
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(text)
+        for sample in family.samples
+    }
+
+
+def _scrape(client) -> dict[tuple, float]:
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    return _samples(res.text)
+
+
+def test_requests_are_labelled_by_route_template_and_status(client):
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 0.5}).json()["id"]
+    key = ("cashtable_http_requests_total", (("method", "GET"), ("route", "/games/{game_id}"), ("status", "200")))
+    denied = ("cashtable_http_requests_total", (("method", "GET"), ("route", "/games/{game_id}"), ("status", "401")))
+    before = _scrape(client)
+
+    client.get(f"/api/games/{game_id}")
+    client.get(f"/api/games/{game_id}")
+    client.get("/api/games/999999")
+    after = _scrape(client)
+
+    assert after[key] - before.get(key, 0) == 2
+    assert after[denied] - before.get(denied, 0) == 1
+    db_count = ("cashtable_db_time_seconds_count", (("method", "GET"), ("route", "/games/{game_id}")))
+    assert after[db_count] - before.get(db_count, 0) == 3
+
+
+def test_active_gauges_are_refreshed_on_an_interval(client, monkeypatch):
+    monkeypatch.setattr(db_gauges, "interval", 3600)
+    db_gauges.reset()
+    client.post("/api/games/", json={"name": "A", "chip_value": 0.5})
+    closed = client.post("/api/games/", json={"name": "B", "chip_value": 0.5}).json()["id"]
+    client.patch(f"/api/games/{closed}/close")
+
+    samples = _scrape(client)
+    assert samples[("cashtable_active_games", ())] == 1
+    assert samples[("cashtable_active_sessions", ())] == 1
+
+    # Within the interval scrapes reuse the last count instead of querying again
+    client.post("/api/games/", json={"name": "C", "chip_value": 0.5})
+    assert _scrape(client)[("cashtable_active_games", ())] == 1
+    db_gauges.reset()
+    assert _scrape(client)[("cashtable_active_games", ())] == 2
+
+
+def test_pool_saturation_is_exported(client):
+    wait_count = ("cashtable_db_pool_checkout_wait_seconds_count", ())
+    before = _scrape(client)
+
+    pool_metrics.checked_out()
+    pool_metrics.record_wait(0.02)
+    try:
+        during = _scrape(client)
+    finally:
+        pool_metrics.checked_in()
+
+    in_use = ("cashtable_db_pool_connections_in_use", ())
+    assert during[in_use] == pool_metrics.snapshot()["in_use"] + 1
+    assert during[wait_count] - before.get(wait_count, 0) == 1
+    assert ("cashtable_db_pool_overflow_in_use", ()) in during
+    assert _scrape(client)[in_use] == pool_metrics.snapshot()["in_use"]
+
+
+
+def test_session_cache_lookups_are_exported(client):
+    hits = ("cashtable_session_cache_lookups_total", (("result", "hit"),))
+    misses = ("cashtable_session_cache_lookups_total", (("result", "miss"),))
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 0.5}).json()["id"]
+    before = _scrape(client)
+
+    client.get(f"/api/games/{game_id}")
+    client.get(f"/api/games/{game_id}")
+    after = _scrape(client)
+
+    assert after[misses] - before[misses] == 1
+    assert after[hits] - before[hits] == 1
+
+
+WORKER = """
+from backend.database import QueryStats
+from backend.metrics import observe_request
+observe_request("GET", "/games/{game_id}", 200, 0.01, QueryStats())
+"""
+
+SCRAPE = """
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+registry = CollectorRegistry()
+multiprocess.MultiProcessCollector(registry)
+print(generate_latest(registry).decode())
+"""
+
+
+def test_multiprocess_mode_sums_workers(tmp_path):
+    env = {
+        **os.environ,
+        "PROMETHEUS_MULTIPROC_DIR": str(tmp_path),
+        "DATABASE_URL": f"sqlite:///{tmp_path}/metrics.db",
+    }
+    for _ in range(3):
+        subprocess.run([sys.executable, "-c", WORKER], env=env, check=True)
+
+    out = subprocess.run([sys.executable, "-c", SCRAPE], env=env, check=True, capture_output=True, text=True).stdout
+
+    key = ("cashtable_http_requests_total", (("method", "GET"), ("route", "/games/{game_id}"), ("status", "200")))
+    assert _samples(out)[key] == pytest.approx(3)
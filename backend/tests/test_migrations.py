@@ -0,0 +1,107 @@
+from sqlalchemy import create_engine, inspect, text
+
+from backend.database import Base
+from backend.migrations import MIGRATIONS, applied_versions, migrate
+
+LEGACY_SCHEMA = [
+    """
+    CREATE TABLE games (
+        id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, chip_value FLOAT NOT NULL,
+        big_blind_value FLOAT, status VARCHAR NOT NULL, created_at DATETIME NOT NULL, closed_at DATETIME
+    )
+    """,
+    """
+    CREATE TABLE players (
+        id INTEGER PRIMARY KEY, game_id INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+        name VARCHAR NOT NULL, actual_chips INTEGER, created_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY, game_id INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+        player_id INTEGER NOT NULL REFERENCES players (id) ON DELETE CASCADE,
+        type VARCHAR NOT NULL, chips INTEGER NOT NULL, created_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE sessions (
+        id INTEGER PRIMARY KEY, token VARCHAR NOT NULL,
+        game_id INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+        player_id INTEGER REFERENCES players (id) ON DELETE SET NULL,
+        role VARCHAR NOT NULL, created_at DATETIME NOT NULL,
+        CONSTRAINT uq_sessions_token_game UNIQUE (token, game_id)
+    )
+    """,
+    "CREATE INDEX ix_sessions_token ON sessions (token)",
+    "INSERT INTO games VALUES (1, 'old', 0.5, NULL, 'active', '2024-01-01', NULL)",
+    "INSERT INTO games VALUES (2, 'older', 0.5, NULL, 'closed', '2024-01-01', '2024-01-02')",
+    "INSERT INTO players VALUES (1, 1, 'Ana', NULL, '2024-01-01')",
+    "INSERT INTO transactions VALUES (1, 1, 1, 'buy_in', 100, '2024-01-01')",
+    "INSERT INTO transactions VALUES (2, 1, 1, 'buy_in', 50, '2024-01-01')",
+    "INSERT INTO transactions VALUES (3, 1, 1, 'cash_out', 30, '2024-01-01')",
+]
+
+
+def test_migrate_creates_the_current_schema_on_an_empty_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+    applied = migrate(engine)
+
+    assert [m.version for m in applied] == [m.version for m in MIGRATIONS]
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        assert inspector.has_table(table.name)
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= existing
+    engine.dispose()
+
+
+def test_migrate_upgrades_a_legacy_database_with_set_based_backfills(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+
+    migrate(engine)
+
+    with engine.connect() as conn:
+        pins = conn.execute(text("SELECT id, pin, version FROM games ORDER BY id")).all()
+        totals = conn.execute(text("SELECT buy_in_chips, cash_out_chips FROM players")).one()
+        assert applied_versions(conn) == {m.version for m in MIGRATIONS}
+    assert pins == [(1, "100001", 1), (2, "100002", 1)]
+    assert tuple(totals) == (150, 30)
+
+    session_indexes = {index["name"] for index in inspect(engine).get_indexes("sessions")}
+    assert "ix_sessions_token" not in session_indexes
+    assert "ix_sessions_token_created" in session_indexes
+    engine.dispose()
+
+
+def test_migrate_is_a_no_op_once_applied(tmp_path, record_statements):
+    engine = create_engine(f"sqlite:///{tmp_path / 'twice.db'}")
+    migrate(engine)
+
+    with record_statements(engine) as statements:
+        assert migrate(engine) == []
+    assert not any(s.lstrip().upper().startswith(("CREATE", "ALTER", "UPDATE")) for s in statements)
+    engine.dispose()
+
+
+def test_migrate_repins_duplicate_active_games_before_indexing(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pins.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+        # A database from before the unique index, where two PIN draws raced
+        conn.execute(text("ALTER TABLE games ADD COLUMN pin VARCHAR(6)"))
+        conn.execute(text("UPDATE games SET pin = '123456'"))
+        conn.execute(text("INSERT INTO games VALUES (3, 'race', 0.5, NULL, 'active', '2024-01-01', NULL, '123456')"))
+
+    migrate(engine)
+
+    with engine.connect() as conn:
+        pins = dict(conn.execute(text("SELECT id, pin FROM games")).all())
+    assert pins[1] == "123456" and pins[2] == "123456"  # oldest active game and the closed one keep theirs
+    assert pins[3] not in ("123456", None)
+    assert "uq_games_active_pin" in {index["name"] for index in inspect(engine).get_indexes("games")}
+    engine.dispose()
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+
+from backend.auth import session_cache
+from backend.benchmarks import bench_player_contention
+from backend.concurrency import conflict_stats, retry_on_conflict
+from backend.database import get_db
+from backend.main import app
+from backend.migrations import migrate
+from backend.models import Game, Player
+
+
+@pytest.fixture()
+def file_db(tmp_path):
+    # Concurrent requests need their own connections, which :memory: cannot share
+    engine = create_engine(f"sqlite:///{tmp_path}/contention.db", connect_args={"check_same_thread": False})
+    migrate(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    session_cache.clear()
+    app.dependency_overrides[get_db] = override_get_db
+    yield Session
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+def test_concurrent_writes_to_one_player_keep_invariants(file_db):
+    result = asyncio.run(bench_player_contention.run(app, file_db, requests=120, concurrency=12))
+
+    assert all(result["invariants"].values()), result
+    assert result["exhausted"] == 0
+
+
+def test_stale_player_write_is_retried(file_db):
+    db, other = file_db(), file_db()
+    game = Game(name="A", chip_value=1, pin="123456")
+    db.add(game)
+    db.flush()
+    player = Player(game_id=game.id, name="P", buy_in_chips=100)
+    db.add(player)
+    db.commit()
+    player_id = player.id
+
+    calls = []
+
+    @retry_on_conflict
+    def add_chips(db, chips):
+        row = db.get(Player, player_id)
+        calls.append(row.version)
+        if len(calls) == 1:
+            # Another transaction commits between this read and the write
+            other.get(Player, player_id).buy_in_chips += 50
+            other.commit()
+        row.buy_in_chips += chips
+        db.commit()
+        return row.buy_in_chips
+
+    conflict_stats.clear()
+    assert add_chips(db, 10) == 160
+    assert calls == [1, 2]
+    assert conflict_stats.snapshot() == {"attempts": 2, "conflicts": 1, "exhausted": 0}
+    other.close()
+    db.close()
+
+
+def test_stale_player_write_raises_without_retry(file_db):
+    db, other = file_db(), file_db()
+    game = Game(name="A", chip_value=1, pin="123456")
+    db.add(game)
+    db.flush()
+    db.add(Player(game_id=game.id, name="P", buy_in_chips=100))
+    db.commit()
+
+    row = db.query(Player).one()
+    other.query(Player).one().buy_in_chips += 1
+    other.commit()
+    row.buy_in_chips += 1
+    # The lost update surfaces instead of being applied
+    with pytest.raises(StaleDataError):
+        db.commit()
+    other.close()
+    db.close()
+
+
+def test_rejected_single_transactions_leave_counters_alone(client):
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 1}).json()["id"]
+    player = client.post(f"/api/games/{game_id}/players/", json={"name": "P"}).json()
+    other_game_id = client.post("/api/games/", json={"name": "B", "chip_value": 1}).json()["id"]
+
+    def post(game, player_id, kind, chips):
+        return client.post(
+            "/api/transactions/", json={"game_id": game, "player_id": player_id, "type": kind, "chips": chips}
+        )
+
+    assert post(game_id, player["id"], "buy_in", 100).status_code == 201
+    overdraft = post(game_id, player["id"], "cash_out", 101)
+    assert overdraft.status_code == 400
+    assert "only has 100 available" in overdraft.json()["detail"]["message"]
+    assert post(game_id, 9999, "buy_in", 10).status_code == 404
+    assert post(other_game_id, player["id"], "buy_in", 10).status_code == 409
+
+    stats = client.get(f"/api/games/{game_id}").json()["players"][0]
+    assert (stats["buy_in_chips"], stats["cash_out_chips"]) == (100, 0)
+
+
+def test_player_delete_locks_the_player_before_the_game(client, db, record_statements):
+    # The lock order of _create_transaction; the reverse would deadlock with it on Postgres
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()["id"]
+    player_id = client.post(f"/api/games/{game_id}/players/", json={"name": "Ana"}).json()["id"]
+
+    with record_statements(db.get_bind()) as statements:
+        assert client.delete(f"/api/players/{player_id}").status_code == 204
+
+    delete = next(i for i, s in enumerate(statements) if s.startswith("DELETE FROM players"))
+    bump = next(i for i, s in enumerate(statements) if s.startswith("UPDATE games"))
+    assert delete < bump
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from backend.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def _game_with_history(client, transactions: int) -> tuple[int, int, list[int]]:
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()["id"]
+    player_id = client.post(f"/api/games/{game_id}/players/", json={"name": "Ana"}).json()["id"]
+    ids = [
+        client.post(
+            "/api/transactions/",
+            json={"game_id": game_id, "player_id": player_id, "type": "buy_in", "chips": 10 + i},
+        ).json()["id"]
+        for i in range(transactions)
+    ]
+    return game_id, player_id, ids
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 1, 2, 3, 4, 5, 678901)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_player_history_pages_newest_first(client):
+    _, player_id, ids = _game_with_history(client, 7)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        res = client.get(f"/api/players/{player_id}/transactions", params=params)
+        assert res.status_code == 200
+        seen.extend(t["id"] for t in res.json())
+        cursor = res.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    assert seen == list(reversed(ids))
+
+
+def test_player_history_without_paging_parameters_is_complete(client, monkeypatch):
+    monkeypatch.setattr("backend.routers.players.DEFAULT_PAGE_SIZE", 2)
+    _, player_id, ids = _game_with_history(client, 3)
+
+    res = client.get(f"/api/players/{player_id}/transactions")
+
+    assert [t["id"] for t in res.json()] == list(reversed(ids))
+    assert NEXT_CURSOR_HEADER not in res.headers
+
+
+def test_game_feed_returns_only_new_entries(client):
+    game_id, player_id, ids = _game_with_history(client, 4)
+
+    first = client.get(f"/api/games/{game_id}/transactions", params={"limit": 10})
+    assert [t["id"] for t in first.json()] == ids
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+
+    idle = client.get(f"/api/games/{game_id}/transactions", params={"since": cursor})
+    assert idle.json() == []
+    assert idle.headers[NEXT_CURSOR_HEADER] == cursor
+
+    new = client.post(
+        "/api/transactions/",
+        json={"game_id": game_id, "player_id": player_id, "type": "buy_in", "chips": 5},
+    ).json()
+    update = client.get(f"/api/games/{game_id}/transactions", params={"since": cursor})
+    assert [t["id"] for t in update.json()] == [new["id"]]
+
+
+def test_invalid_cursor_is_a_bad_request(client):
+    game_id, _, _ = _game_with_history(client, 1)
+    res = client.get(f"/api/games/{game_id}/transactions", params={"since": "not-a-cursor"})
+    assert res.status_code == 400
+    assert res.json()["detail"]["error"] == "BadRequest"
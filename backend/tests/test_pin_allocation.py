@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import auth
+from backend.auth import PIN_MAX, PIN_MIN, insert_game_with_pin
+from backend.database import Base
+from backend.models import Game
+
+
+def _fill(engine, pins) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            Game.__table__.insert(),
+            [{"name": "g", "pin": str(pin), "status": "active", "chip_value": 1} for pin in pins],
+        )
+
+
+@pytest.fixture()
+def make_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pins.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine, sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_allocation_stays_fast_at_90_percent_occupancy(make_session, record_statements):
+    engine, Session = make_session
+    # Generated inside SQLite: ten times faster than inserting 810k rows from Python
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "WITH RECURSIVE pins(n) AS (SELECT :low UNION ALL SELECT n + 1 FROM pins WHERE n < :high) "
+                "INSERT INTO games (name, pin, status, chip_value, version, created_at) "
+                "SELECT 'g', CAST(n AS TEXT), 'active', 1, 1, CURRENT_TIMESTAMP FROM pins WHERE n % 10 != 0"
+            ),
+            {"low": PIN_MIN, "high": PIN_MAX},
+        )
+
+    latencies, queries, pins = [], [], set()
+    db = Session()
+    try:
+        with record_statements(engine) as statements:
+            for _ in range(200):
+                before = len(statements)
+                started = time.perf_counter()
+                game = insert_game_with_pin(db, name="new", chip_value=1)
+                db.commit()
+                latencies.append(time.perf_counter() - started)
+                queries.append(len(statements) - before)
+                pins.add(game.pin)
+    finally:
+        db.close()
+
+    assert len(pins) == 200
+    # Bounded work per allocation: one insert per attempt plus the window reads and
+    # the commit, however full the table is
+    assert max(queries) <= 2 * (auth.PIN_RANDOM_ATTEMPTS + 3) + 1
+    assert max(latencies) < 0.5
+
+
+def test_full_window_range_still_finds_the_last_free_pin(make_session, monkeypatch):
+    engine, Session = make_session
+    monkeypatch.setattr(auth, "PIN_MIN", 100000)
+    monkeypatch.setattr(auth, "PIN_MAX", 100999)
+    monkeypatch.setattr(auth, "PIN_WINDOW", 64)
+    _fill(engine, (pin for pin in range(100000, 101000) if pin != 100500))
+
+    db = Session()
+    try:
+        game = insert_game_with_pin(db, name="last", chip_value=1)
+        db.commit()
+        assert game.pin == "100500"
+
+        with pytest.raises(HTTPException) as exc:
+            insert_game_with_pin(db, name="none left", chip_value=1)
+        assert exc.value.status_code == 503
+    finally:
+        db.close()
+
+
+def test_closed_games_release_their_pin(make_session, monkeypatch):
+    engine, Session = make_session
+    monkeypatch.setattr(auth, "PIN_MIN", 100000)
+    monkeypatch.setattr(auth, "PIN_MAX", 100000)
+    _fill(engine, [100000])
+
+    db = Session()
+    try:
+        db.query(Game).update({"status": "closed"})
+        game = insert_game_with_pin(db, name="reuse", chip_value=1)
+        db.commit()
+        assert game.pin == "100000"
+    finally:
+        db.close()
+
+
+def test_create_game_endpoint_assigns_distinct_pins(client):
+    pins = {client.post("/api/games/", json={"name": f"G{i}", "chip_value": 1}).json()["pin"] for i in range(20)}
+    assert len(pins) == 20
+
+
+def test_pin_allocation_stays_in_the_callers_transaction(make_session):
+    _, Session = make_session
+    db = Session()
+    try:
+        insert_game_with_pin(db, name="abandoned", chip_value=1)
+        db.rollback()
+        assert db.query(Game).count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,120 @@
+from backend import reconcile as reconcile_module
+from backend.models import Game, Player, Transaction
+from backend.reconcile import find_drift, reconcile
+from backend.services.stats import get_ledger_totals, get_player_totals
+
+
+def _seed_game(db, transactions: list[tuple[int, str, int]]) -> tuple[Game, list[Player]]:
+    game = Game(name="Stats", pin="111111", chip_value=0.5)
+    db.add(game)
+    db.flush()
+    players = [Player(game_id=game.id, name=name) for name in ("Ana", "Bob", "Cid")]
+    db.add_all(players)
+    db.flush()
+    for player_index, kind, chips in transactions:
+        db.add(Transaction(game_id=game.id, player_id=players[player_index].id, type=kind, chips=chips))
+    db.commit()
+    return game, players
+
+
+def _post_transaction(client, game_id: int, player_id: int, kind: str, chips: int):
+    return client.post(
+        "/api/transactions/",
+        json={"game_id": game_id, "player_id": player_id, "type": kind, "chips": chips},
+    )
+
+
+def test_ledger_totals_aggregate_per_player(db):
+    game, players = _seed_game(
+        db,
+        [(0, "buy_in", 100), (0, "buy_in", 50), (0, "cash_out", 30), (1, "buy_in", 200)],
+    )
+
+    totals = get_ledger_totals(db, game.id)
+
+    assert totals[players[0].id] == (150, 30)
+    assert totals[players[1].id] == (200, 0)
+    assert players[2].id not in totals
+
+
+def test_player_totals_use_single_query_regardless_of_history(db, max_queries):
+    game, _ = _seed_game(db, [(i % 3, "buy_in", 10) for i in range(300)])
+    reconcile(db, game.id)
+    game_id = game.id
+    db.expire_all()
+
+    with max_queries(1):
+        totals = get_player_totals(db, game_id)
+
+    assert sum(t.buy_in_chips for t in totals) == 3000
+
+
+def test_reconcile_reports_and_fixes_drift(db):
+    game, players = _seed_game(db, [(0, "buy_in", 100), (1, "cash_out", 20)])
+    players[2].buy_in_chips = 999
+    db.commit()
+
+    drift = find_drift(db, game.id)
+    assert {d.player_id for d in drift} == {p.id for p in players}
+
+    reconcile(db, game.id)
+    assert find_drift(db, game.id) == []
+    db.refresh(players[2])
+    assert players[2].buy_in_chips == 0
+
+
+def test_reconcile_leaves_players_changed_since_they_were_compared(db, monkeypatch):
+    game, players = _seed_game(db, [(0, "buy_in", 100)])
+    players[0].buy_in_chips = 999
+    db.commit()
+    stale = find_drift(db, game.id)
+
+    # A buy-in that also repairs the counter commits between the comparison and the fix
+    db.add(Transaction(game_id=game.id, player_id=players[0].id, type="buy_in", chips=50))
+    players[0].buy_in_chips = 150
+    db.commit()
+    monkeypatch.setattr(reconcile_module, "find_drift", lambda *args, **kwargs: stale)
+
+    reconcile(db, game.id)
+    db.refresh(players[0])
+    assert players[0].buy_in_chips == 150
+
+
+def test_counters_follow_create_and_delete(client, db):
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    ana = client.post(f"/api/games/{created['id']}/players/", json={"name": "Ana"}).json()
+
+    _post_transaction(client, created["id"], ana["id"], "buy_in", 100)
+    rebuy = _post_transaction(client, created["id"], ana["id"], "buy_in", 50).json()
+    _post_transaction(client, created["id"], ana["id"], "cash_out", 40)
+    client.delete(f"/api/transactions/{rebuy['id']}")
+
+    player = db.get(Player, ana["id"])
+    db.refresh(player)
+    assert (player.buy_in_chips, player.cash_out_chips) == (100, 40)
+    assert find_drift(db, created["id"]) == []
+
+    too_much = _post_transaction(client, created["id"], ana["id"], "cash_out", 61)
+    assert too_much.status_code == 400
+
+
+def test_settlement_endpoint_uses_aggregated_totals(client):
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    ana = client.post(f"/api/games/{created['id']}/players/", json={"name": "Ana"}).json()
+    bob = client.post(f"/api/games/{created['id']}/players/", json={"name": "Bob"}).json()
+
+    _post_transaction(client, created["id"], ana["id"], "buy_in", 200)
+    _post_transaction(client, created["id"], bob["id"], "buy_in", 100)
+    _post_transaction(client, created["id"], ana["id"], "cash_out", 150)
+    client.patch(f"/api/players/{ana['id']}/chips", json={"actual_chips": 0})
+    client.patch(f"/api/players/{bob['id']}/chips", json={"actual_chips": 150})
+
+    detail = client.get(f"/api/games/{created['id']}").json()
+    by_name = {p["name"]: p for p in detail["players"]}
+    assert by_name["Ana"]["cash_out_chips"] == 150
+    assert by_name["Ana"]["chips_in_play"] == 50
+    assert by_name["Bob"]["net_balance"] == 50.0
+
+    client.patch(f"/api/games/{created['id']}/close")
+    settlement = client.get(f"/api/games/{created['id']}/settlement").json()
+    assert settlement["transfers"] == [{"from_player": "Ana", "to_player": "Bob", "amount": 50.0}]
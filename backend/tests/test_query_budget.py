@@ -0,0 +1,73 @@
+import pytest
+
+from backend.instrumentation import QUERY_COUNT_HEADER, QueryStatsMiddleware, route_stats
+from backend.main import app
+
+PLAYERS = 8
+
+
+@pytest.fixture()
+def table(client) -> dict[str, int]:
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 0.5}).json()["id"]
+    player_ids = [
+        client.post(f"/api/games/{game_id}/players/", json={"name": f"P{i}"}).json()["id"] for i in range(PLAYERS)
+    ]
+    for player_id in player_ids:
+        for _ in range(3):
+            client.post(
+                "/api/transactions/",
+                json={"game_id": game_id, "player_id": player_id, "type": "buy_in", "chips": 100},
+            )
+    client.get(f"/api/games/{game_id}")  # warm the session cache
+    return {"game_id": game_id, "player_id": player_ids[0]}
+
+
+# Budgets are independent of the number of players and transactions; a loop that
+# queries per row breaks them
+@pytest.mark.parametrize(
+    "method, path, body, limit",
+    [
+        ("GET", "/api/games/", None, 2),
+        ("GET", "/api/games/{game_id}", None, 2),
+        ("GET", "/api/players/{player_id}/transactions", None, 2),
+        ("GET", "/api/games/{game_id}/transactions", None, 1),
+        (
+            "POST",
+            "/api/transactions/",
+            {"game_id": "{game_id}", "player_id": "{player_id}", "type": "buy_in", "chips": 10},
+            7,
+        ),
+        ("PATCH", "/api/players/{player_id}/chips", {"actual_chips": 250}, 6),
+    ],
+)
+def test_endpoint_query_budget(client, table, max_queries, method, path, body, limit):
+    if body is not None:
+        body = {k: int(v.format(**table)) if isinstance(v, str) and "{" in v else v for k, v in body.items()}
+
+    with max_queries(limit):
+        res = client.request(method, path.format(**table), json=body)
+
+    assert res.status_code < 400, res.text
+
+
+def test_settlement_query_budget(client, table, max_queries):
+    client.patch(f"/api/games/{table['game_id']}/close")
+    with max_queries(1):
+        assert client.get(f"/api/games/{table['game_id']}/settlement").status_code == 200
+
+
+def test_debug_headers_report_queries_per_request(client, table, monkeypatch):
+    # The stack is built by the requests in `table`; enable headers as DEBUG=1 would
+    layer = app.middleware_stack
+    while not isinstance(layer, QueryStatsMiddleware):
+        layer = layer.app
+    monkeypatch.setattr(layer, "expose_headers", True)
+    route_stats.clear()
+
+    res = client.get(f"/api/games/{table['game_id']}")
+
+    assert res.status_code == 200
+    assert int(res.headers[QUERY_COUNT_HEADER]) >= 1
+    assert res.headers["server-timing"].startswith("db;dur=")
+    # Labels are route templates (relative to the /api mount), not concrete paths
+    assert route_stats.snapshot()["GET /games/{game_id}"]["queries"]["count"] == 1
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from backend.database import Base
+from backend.models import Game, Player, Session as GameSession, Transaction
+
+GAMES = 100_000
+
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+
+    ids = range(1, GAMES + 1)
+    with engine.begin() as conn:
+        conn.execute(
+            Game.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "name": "g",
+                    "pin": str(100000 + i),
+                    "status": "active" if i % 10 == 0 else "closed",
+                    "chip_value": 1,
+                }
+                for i in ids
+            ],
+        )
+        conn.execute(Player.__table__.insert(), [{"id": i, "game_id": i, "name": "p"} for i in ids])
+        conn.execute(
+            GameSession.__table__.insert(),
+            [{"token": f"t{i % 5000}", "game_id": i, "player_id": i, "role": "player"} for i in ids],
+        )
+        conn.execute(
+            Transaction.__table__.insert(),
+            [{"game_id": i, "player_id": i, "type": "buy_in", "chips": 10} for i in ids],
+        )
+        conn.execute(text("ANALYZE"))
+
+    yield engine
+    engine.dispose()
+
+
+def _plan(engine, sql: str, params: dict) -> str:
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "sql, params, index",
+    [
+        (
+            "SELECT * FROM sessions WHERE token = :token AND game_id = :game_id",
+            {"token": "t1", "game_id": 1},
+            # the unique constraint's backing index; SQLite names it sqlite_autoindex_*
+            "(token=? AND game_id=?)",
+        ),
+        (
+            "SELECT * FROM sessions WHERE token = :token ORDER BY created_at DESC LIMIT 1",
+            {"token": "t1"},
+            "ix_sessions_token_created",
+        ),
+        (
+            "SELECT * FROM transactions WHERE player_id = :player_id ORDER BY created_at DESC",
+            {"player_id": 1},
+            "ix_transactions_player_created",
+        ),
+        (
+            "SELECT * FROM players WHERE game_id = :game_id ORDER BY id",
+            {"game_id": 1},
+            "ix_players_game_id",
+        ),
+        (
+            "SELECT * FROM games WHERE pin = :pin AND status = 'active' LIMIT 1",
+            {"pin": "100010"},
+            "_pin",
+        ),
+        (
+            "SELECT id FROM games WHERE pin = :pin AND status = :status LIMIT 1",
+            {"pin": "100010", "status": "active"},
+            "ix_games_pin_status",
+        ),
+    ],
+)
+def test_hot_queries_use_an_index(seeded, sql, params, index):
+    plan = _plan(seeded, sql, params)
+
+    assert index in plan, plan
+    assert all(line.startswith("SEARCH") for line in plan.splitlines()), plan
+
+
+def test_active_pin_is_unique_but_closed_games_may_reuse_it(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pins.db'}")
+    Base.metadata.create_all(bind=engine)
+    insert = Game.__table__.insert().values(name="g", pin="123456", chip_value=1)
+
+    with engine.begin() as conn:
+        conn.execute(insert, [{"status": "closed"}, {"status": "closed"}, {"status": "active"}])
+    with pytest.raises(IntegrityError):
+        with engine.begin() as conn:
+            conn.execute(insert, {"status": "active"})
+    engine.dispose()
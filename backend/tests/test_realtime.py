@@ -0,0 +1,208 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from backend import realtime
+from backend.models import Game
+from backend.realtime import NOTIFY_PAYLOAD_LIMIT, InProcessBroker, PostgresBroker, publish_after_commit
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.published: list[tuple[int, dict]] = []
+
+    def publish(self, game_id, message):
+        self.published.append((game_id, message))
+
+    def publish_control(self, message):
+        pass
+
+
+@pytest.fixture()
+def recorder(monkeypatch):
+    recording = RecordingBroker()
+    monkeypatch.setattr(realtime, "broker", recording)
+    return recording
+
+
+def test_in_process_broker_delivers_from_other_threads():
+    async def scenario():
+        broker = InProcessBroker()
+        subscription = broker.subscribe(7)
+        other = broker.subscribe(8)
+
+        thread = threading.Thread(target=broker.publish, args=(7, {"type": "ping", "data": {}}))
+        thread.start()
+        thread.join()
+
+        received = await subscription.get(timeout=1.0)
+        missing = await other.get(timeout=0.05)
+        subscription.close()
+        other.close()
+        return received, missing, broker.subscriber_count()
+
+    received, missing, remaining = asyncio.run(scenario())
+    assert received == {"type": "ping", "data": {}}
+    assert missing is None
+    assert remaining == 0
+
+
+def test_events_are_published_only_after_commit(db, recorder):
+    game = Game(name="A", pin="123456")
+    db.add(game)
+    db.flush()
+
+    publish_after_commit(db, game.id, "game.updated", {"name": "A"})
+    assert recorder.published == []
+    db.rollback()
+    db.commit()
+    assert recorder.published == []
+
+    db.add(Game(name="B", pin="654321"))
+    publish_after_commit(db, 1, "game.updated", {"name": "B"})
+    db.commit()
+    assert recorder.published == [(1, {"type": "game.updated", "data": {"name": "B"}})]
+
+
+def test_mutations_broadcast_small_deltas(client, recorder):
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    game_id = created["id"]
+    ana = client.post(f"/api/games/{game_id}/players/", json={"name": "Ana"}).json()
+    txn = client.post(
+        "/api/transactions/",
+        json={"game_id": game_id, "player_id": ana["id"], "type": "buy_in", "chips": 100},
+    ).json()
+    client.delete(f"/api/transactions/{txn['id']}")
+    client.patch(f"/api/games/{game_id}/close")
+
+    types = [message["type"] for _, message in recorder.published]
+    assert types == ["player.added", "transaction.created", "transaction.deleted", "game.closed"]
+    assert all(published_game_id == game_id for published_game_id, _ in recorder.published)
+
+    created_event = recorder.published[1][1]["data"]
+    assert created_event["transaction"]["chips"] == 100
+    assert created_event["player"] == {"id": ana["id"], "buy_in_chips": 100, "cash_out_chips": 0, "actual_chips": None}
+    assert recorder.published[2][1]["data"]["player"]["buy_in_chips"] == 0
+
+
+def test_event_stream_requires_session(client):
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    client.cookies.clear()
+
+    res = client.get(f"/api/games/{created['id']}/events")
+    assert res.status_code == 401
+
+
+def test_event_stream_delivers_deltas_until_game_deleted(client):
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    game_id = created["id"]
+
+    def mutate_once_subscribed():
+        deadline = time.monotonic() + 5
+        while realtime.broker.subscriber_count() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        client.post(f"/api/games/{game_id}/players/", json={"name": "Ana"})
+        client.delete(f"/api/games/{game_id}")
+
+    writer = threading.Thread(target=mutate_once_subscribed)
+    writer.start()
+    with client.stream("GET", f"/api/games/{game_id}/events") as res:
+        assert res.headers["content-type"].startswith("text/event-stream")
+        events = [line for line in res.iter_lines() if line.startswith("event: ")]
+    writer.join()
+
+    assert events == ["event: player.added", "event: game.deleted"]
+
+
+class NotifyRecorder:
+    """Stands in for the publishing connection; records the pg_notify payloads."""
+
+    def __init__(self):
+        self.payloads: list[str] = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.payloads.append(params[1])
+
+
+@pytest.fixture()
+def postgres_broker(db, monkeypatch):
+    broker = PostgresBroker("postgresql://cashtable@localhost/cashtable", sessionmaker(bind=db.get_bind()))
+    connection = NotifyRecorder()
+    monkeypatch.setattr(broker, "_publish_connection", lambda: connection)
+    monkeypatch.setattr(realtime, "broker", broker)
+    yield broker, connection.payloads
+    broker.stop()
+
+
+def _receive(broker, game_id: int, payloads: list[str]) -> list[dict]:
+    async def scenario():
+        subscription = broker.subscribe(game_id)
+        for payload in payloads:
+            broker._handle(payload)
+        received = []
+        while (message := await subscription.get(timeout=0.05)) is not None:
+            received.append(message)
+        subscription.close()
+        return received
+
+    return asyncio.run(scenario())
+
+
+def test_postgres_broker_sends_large_events_by_reference(client, postgres_broker):
+    broker, payloads = postgres_broker
+    game_id = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()["id"]
+    player_id = client.post(f"/api/games/{game_id}/players/", json={"name": "Ana"}).json()["id"]
+    items = [{"player_id": player_id, "type": "buy_in", "chips": 10}] * 200
+    assert client.post(f"/api/games/{game_id}/transactions/batch", json={"items": items}).status_code == 200
+    broker.flush()
+
+    assert all(len(payload.encode()) <= NOTIFY_PAYLOAD_LIMIT for payload in payloads)
+    assert '"ref"' in payloads[-1]
+    added, batch = _receive(broker, game_id, payloads)
+    assert added["type"] == "player.added"
+    assert batch["type"] == "transactions.created"
+    assert len(batch["data"]["transactions"]) == 200
+    assert batch["data"]["players"][0]["buy_in_chips"] == 2000
+
+
+def test_postgres_broker_resyncs_when_a_large_event_was_not_logged(client, postgres_broker):
+    broker, payloads = postgres_broker
+    broker.publish(7, {"type": "game.updated", "data": {"name": "x" * NOTIFY_PAYLOAD_LIMIT}})
+    broker.flush()
+
+    assert _receive(broker, 7, payloads) == [{"type": "resync", "data": {}}]
+
+
+def test_postgres_broker_publishes_without_waiting_for_the_connection(postgres_broker, monkeypatch):
+    broker, payloads = postgres_broker
+    release = threading.Event()
+
+    class SlowConnection(NotifyRecorder):
+        def execute(self, sql, params):
+            release.wait(5)
+            payloads.append(params[1])
+
+    connection = SlowConnection()
+    monkeypatch.setattr(broker, "_publish_connection", lambda: connection)
+
+    started = time.perf_counter()
+    broker.publish(7, {"type": "game.updated", "data": {"n": 1}})
+    broker.publish(7, {"type": "game.updated", "data": {"n": 2}})
+    assert time.perf_counter() - started < 1
+
+    release.set()
+    broker.flush()
+    assert [json.loads(payload)["message"]["data"]["n"] for payload in payloads] == [1, 2]
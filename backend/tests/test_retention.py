@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend import retention
+from backend.models import Game, GameArchive, Player, Session as GameSession, Settlement, Transaction
+from backend.retention import archive_closed_games, delete_expired_sessions
+
+
+def test_expired_sessions_are_deleted_in_batches(db):
+    now = datetime.now(timezone.utc)
+    game = Game(name="g", pin="123456", chip_value=1)
+    db.add(game)
+    db.flush()
+    for i in range(7):
+        db.add(GameSession(token=f"old-{i}", game_id=game.id, role="player", created_at=now - timedelta(days=40)))
+    # An old row is kept while the same token was issued again recently
+    db.add(GameSession(token="renewed", game_id=game.id, role="host", created_at=now - timedelta(days=40)))
+    other = Game(name="h", pin="654321", chip_value=1)
+    db.add(other)
+    db.flush()
+    db.add(GameSession(token="renewed", game_id=other.id, role="host", created_at=now))
+    db.commit()
+
+    assert delete_expired_sessions(db, now - timedelta(days=30), batch_size=3) == 7
+
+    remaining = sorted((s.token, s.game_id) for s in db.query(GameSession))
+    assert remaining == [("renewed", game.id), ("renewed", other.id)]
+
+
+def test_archived_game_keeps_detail_and_settlement(client, db, closed_game):
+    game_id = closed_game
+    detail = client.get(f"/api/games/{game_id}").json()
+    settlement = client.get(f"/api/games/{game_id}/settlement").json()
+
+    assert archive_closed_games(db, datetime.now(timezone.utc) + timedelta(days=1), batch_size=1) == 1
+
+    assert db.query(Player).filter(Player.game_id == game_id).count() == 0
+    assert db.query(Transaction).filter(Transaction.game_id == game_id).count() == 0
+    assert db.get(GameArchive, game_id) is not None
+    assert client.get(f"/api/games/{game_id}").json()["players"] == detail["players"]
+    assert client.get(f"/api/games/{game_id}/settlement").json() == settlement
+
+    # Edits after archiving rebuild the settlement from the archive
+    client.patch(f"/api/games/{game_id}", json={"name": "Renamed"})
+    assert client.get(f"/api/games/{game_id}/settlement").json() == settlement
+
+
+def test_recent_and_active_games_are_not_archived(client, db, closed_game):
+    client.post("/api/games/", json={"name": "Live", "chip_value": 0.5})
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=1)
+    assert archive_closed_games(db, cutoff, dry_run=True) == 0
+    assert archive_closed_games(db, cutoff) == 0
+    assert db.query(GameArchive).count() == 0
+
+
+def test_failed_archive_stores_nothing(db, closed_game, monkeypatch):
+    db.query(Settlement).delete()
+    db.commit()
+
+    def fail(db, game_id):
+        raise RuntimeError("snapshot failed")
+
+    monkeypatch.setattr(retention, "_snapshot", fail)
+    with pytest.raises(RuntimeError):
+        archive_closed_games(db, datetime.now(timezone.utc) + timedelta(days=1))
+    db.rollback()
+
+    assert db.get(Settlement, closed_game) is None
+    assert db.query(Player).filter(Player.game_id == closed_game).count() == 2
@@ -0,0 +1,72 @@
+from backend.auth import ResolvedSession, SessionCache, session_cache
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SessionCache(max_size=2, ttl=60)
+    cache.put(ResolvedSession("a", 1, "host", None))
+    cache.put(ResolvedSession("b", 1, "player", 3))
+    assert cache.get("a", 1) is not None
+    cache.put(ResolvedSession("c", 1, "player", 4))
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1).role == "host"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_entries_expire_after_ttl():
+    cache = SessionCache(max_size=10, ttl=-1)
+    cache.put(ResolvedSession("a", 1, "host", None))
+
+    assert cache.get("a", 1) is None
+    assert cache.stats() == {"size": 0, "max_size": 10, "hits": 0, "misses": 1, "evictions": 0}
+
+
+def test_cache_invalidation_by_token_and_game():
+    cache = SessionCache(max_size=10, ttl=60)
+    for token, game_id in (("a", 1), ("a", 2), ("b", 1), ("b", 3)):
+        cache.put(ResolvedSession(token, game_id, "player", None))
+
+    cache.invalidate_token("a")
+    cache.handle_control({"kind": "session_cache", "game_id": 1})
+
+    assert cache.get("a", 2) is None
+    assert cache.get("b", 1) is None
+    assert cache.get("b", 3) is not None
+
+
+def test_repeated_requests_hit_the_cache(client):
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    client.get(f"/api/games/{created['id']}")
+    before = session_cache.stats()
+
+    client.get(f"/api/games/{created['id']}")
+
+    after = session_cache.stats()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+
+
+def test_logout_invalidates_cached_session(client):
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    token = client.cookies["session_token"]
+    assert client.get(f"/api/games/{created['id']}").status_code == 200
+
+    client.delete("/api/session")
+    client.cookies.set("session_token", token)
+
+    assert client.get(f"/api/games/{created['id']}").status_code == 401
+
+
+def test_deleting_player_invalidates_their_cached_session(client):
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    host_token = client.cookies["session_token"]
+    client.cookies.clear()
+    joined = client.post("/api/games/join", json={"pin": created["pin"], "player_name": "Ana"}).json()
+    player_token = client.cookies["session_token"]
+    assert client.get(f"/api/games/{created['id']}").json()["session_player_id"] == joined["player"]["id"]
+
+    client.cookies.set("session_token", host_token)
+    assert client.delete(f"/api/players/{joined['player']['id']}").status_code == 204
+
+    client.cookies.set("session_token", player_token)
+    assert client.get(f"/api/games/{created['id']}").json()["session_player_id"] is None
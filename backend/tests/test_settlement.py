@@ -1,6 +1,10 @@
+import random
+import time
+from itertools import combinations
+
 import pytest
 
-from backend.services.settlement import Transfer, calculate_settlement
+from backend.services.settlement import Transfer, calculate_settlement, settle_cents
 
 
 def test_two_players_simple():
@@ -53,3 +57,87 @@ def test_floating_point_tolerance():
     assert len(transfers) <= 1
     if transfers:
         assert abs(transfers[0].amount - 10.0) < 0.01
+
+
+def _random_table(rng: random.Random, players: int) -> dict[str, int]:
+    cents = [rng.choice((-1, 1)) * rng.randint(1, 40) * rng.choice((5, 25, 100)) for _ in range(players - 1)]
+    cents.append(-sum(cents))
+    return {f"P{i}": amount for i, amount in enumerate(cents)}
+
+
+def _assert_conserved(balances: dict[str, int], transfers: list[tuple[str, str, int]]):
+    flow = dict.fromkeys(balances, 0)
+    for debtor, creditor, amount in transfers:
+        assert amount > 0
+        flow[debtor] -= amount
+        flow[creditor] += amount
+    assert flow == balances
+
+
+def _optimal_transfer_count(amounts: list[int]) -> int:
+    """n minus the largest number of zero-sum groups, by exhaustive search."""
+
+    def most_groups(rest: tuple[int, ...]) -> int:
+        if not rest:
+            return 0
+        first, others = rest[0], rest[1:]
+        best = 0
+        for size in range(len(others) + 1):
+            for picked in combinations(range(len(others)), size):
+                if first + sum(others[i] for i in picked) == 0:
+                    left = tuple(v for i, v in enumerate(others) if i not in picked)
+                    best = max(best, 1 + most_groups(left))
+        return best
+
+    nonzero = tuple(a for a in amounts if a)
+    return len(nonzero) - most_groups(nonzero)
+
+
+def test_amounts_are_whole_cents_and_sum_exactly():
+    balances = {"Alice": 0.1 + 0.2, "Bob": -0.3, "Carol": 33.335, "Dave": -33.335}
+    transfers = calculate_settlement(balances)
+    assert sorted((t.from_player, t.to_player, t.amount) for t in transfers) == [
+        ("Bob", "Alice", 0.3),
+        ("Dave", "Carol", 33.34),
+    ]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_small_tables_match_the_optimal_transfer_count(seed):
+    rng = random.Random(seed)
+    balances = _random_table(rng, rng.randint(2, 8))
+
+    transfers = settle_cents(balances)
+
+    _assert_conserved(balances, transfers)
+    assert len(transfers) == _optimal_transfer_count(list(balances.values()))
+
+
+def test_exact_search_beats_greedy():
+    # Greedy pairs 6 with -5 first and needs four transfers; {6,-4,-2} and {5,-5} need three
+    balances = {"A": 600, "B": 500, "C": -500, "D": -400, "E": -200}
+    assert len(settle_cents(balances)) == 3
+
+
+def test_imbalanced_table_settles_what_it_can():
+    balances = {"Alice": 1001, "Bob": -1000}
+    assert settle_cents(balances) == [("Bob", "Alice", 1000)]
+
+
+@pytest.mark.parametrize("players", [16, 100, 500])
+def test_large_tables_conserve_money_within_budget(players):
+    balances = _random_table(random.Random(players), players)
+
+    start = time.perf_counter()
+    transfers = settle_cents(balances, time_budget=0.2)
+    elapsed = time.perf_counter() - start
+
+    _assert_conserved(balances, transfers)
+    assert len(transfers) <= players - 1
+    assert elapsed < 1.0
+
+
+def test_exhausted_budget_falls_back_to_greedy():
+    balances = _random_table(random.Random(7), 14)
+    transfers = settle_cents(balances, time_budget=0)
+    _assert_conserved(balances, transfers)
@@ -0,0 +1,51 @@
+from backend.models import Settlement
+
+
+def test_close_game_stores_the_settlement(client, db, closed_game):
+    game_id = closed_game
+
+    stored = db.get(Settlement, game_id)
+    assert stored is not None
+    res = client.get(f"/api/games/{game_id}/settlement")
+    assert res.status_code == 200
+    assert res.json()["transfers"] == [{"from_player": "Bob", "to_player": "Ana", "amount": 25.0}]
+    assert res.text == stored.payload
+
+
+def test_closed_game_settlement_is_a_single_row_read(client, closed_game, max_queries):
+    client.get(f"/api/games/{closed_game}/settlement")  # warms the session cache
+
+    with max_queries(1) as statements:
+        client.get(f"/api/games/{closed_game}/settlement")
+
+    assert "FROM settlements" in statements[0]
+
+
+def test_editing_a_closed_game_recomputes_the_settlement(client, db, closed_game):
+    game_id = closed_game
+    before = client.get(f"/api/games/{game_id}/settlement")
+
+    client.patch(f"/api/games/{game_id}", json={"big_blind_value": 2.0})
+    after = client.get(f"/api/games/{game_id}/settlement")
+
+    assert after.headers["etag"] != before.headers["etag"]
+    assert after.json() == before.json()
+    db.expire_all()
+    assert f'-v{db.get(Settlement, game_id).version}"' in after.headers["etag"]
+
+
+def test_closed_game_rejects_deletes_that_would_change_its_settlement(client, closed_game):
+    game = client.get(f"/api/games/{closed_game}").json()
+    transaction_id = client.get(f"/api/games/{closed_game}/transactions").json()[0]["id"]
+    before = client.get(f"/api/games/{closed_game}/settlement")
+
+    deleted = client.delete(f"/api/transactions/{transaction_id}")
+    assert deleted.status_code == 409
+    assert deleted.json()["detail"]["message"] == "Cannot delete transactions from a closed game"
+    removed = client.delete(f"/api/players/{game['players'][0]['id']}")
+    assert removed.status_code == 409
+    assert removed.json()["detail"]["message"] == "Cannot delete a player from a closed game"
+
+    after = client.get(f"/api/games/{closed_game}/settlement")
+    assert after.headers["etag"] == before.headers["etag"]
+    assert after.json() == before.json()
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from backend import auth
+from backend.auth import RevocationList, decode_session_cookie, encode_session_cookie, revocations
+from backend.models import SessionRevocation
+
+
+@pytest.fixture()
+def signed(monkeypatch):
+    monkeypatch.setattr(auth, "SIGNED_SESSIONS", True)
+    monkeypatch.setattr(auth, "SECRET_KEY", "test-secret")
+    revocations.clear()
+    yield
+    revocations.clear()
+
+
+def _sessions_queries(statements: list[str]) -> list[str]:
+    return [s for s in statements if "FROM sessions" in s]
+
+
+def test_cookie_round_trip_and_tampering(signed):
+    value = encode_session_cookie("tok", [(1, "host", None), (2, "player", 7)], issued_at=2_000_000_000)
+    claims = decode_session_cookie(value)
+    assert claims.token == "tok"
+    assert claims.games == {1: ("host", None), 2: ("player", 7)}
+
+    token, _, signature = value.split(".")
+    forged = encode_session_cookie("tok", [(1, "host", None), (3, "host", None)], 2_000_000_000).split(".")[1]
+    assert decode_session_cookie(f"{token}.{forged}.{signature}") is None
+    assert decode_session_cookie(value.replace("tok", "other", 1)) is None
+    assert decode_session_cookie("plain-uuid-token") is None
+    # Past SESSION_COOKIE_MAX_AGE
+    assert decode_session_cookie(encode_session_cookie("tok", [(1, "host", None)], issued_at=1)) is None
+
+
+
+def test_malformed_signed_cookie_is_unauthorized(signed, client):
+    game = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    assert decode_session_cookie("abc.def.\xe9\xe9") is None
+    assert decode_session_cookie("ab\xe9.def.ghi") is None
+
+    client.cookies.clear()
+    res = client.get(f"/api/games/{game['id']}", headers={"Cookie": "session_token=abc.def.\xe9\xe9".encode("latin-1")})
+    assert res.status_code == 401
+
+def test_signed_claims_authorize_without_a_sessions_query(signed, client, max_queries):
+    game = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    assert client.cookies["session_token"].count(".") == 2
+    client.get(f"/api/games/{game['id']}")  # revocations load once per REVOCATION_REFRESH
+    auth.session_cache.clear()
+
+    with max_queries(2) as statements:
+        res = client.get(f"/api/games/{game['id']}")
+
+    assert res.status_code == 200
+    assert res.json()["session_role"] == "host"
+    assert _sessions_queries(statements) == []
+
+
+def test_unsigned_and_unknown_games_fall_back_to_the_sessions_table(signed, client, max_queries):
+    first = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    signed_cookie = client.cookies["session_token"]
+    token = signed_cookie.split(".")[0]
+
+    # A plain token from before signing was enabled still works, through the table
+    client.cookies.set("session_token", token)
+    with max_queries(3) as statements:
+        assert client.get(f"/api/games/{first['id']}").status_code == 200
+    assert _sessions_queries(statements)
+
+    # Claims only cover games known when the cookie was issued
+    client.cookies.set("session_token", signed_cookie)
+    assert client.get("/api/games/999").status_code == 401
+
+
+def test_logout_revokes_signed_claims(signed, client, db):
+    game = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    cookie = client.cookies["session_token"]
+
+    client.delete("/api/session")
+    client.cookies.set("session_token", cookie)
+
+    assert client.get(f"/api/games/{game['id']}").status_code == 401
+    assert db.query(SessionRevocation).filter(SessionRevocation.token == cookie.split(".")[0]).count() == 1
+
+
+def test_deleting_a_player_revokes_claims_for_the_game(signed, client):
+    game = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    host_cookie = client.cookies["session_token"]
+    client.cookies.clear()
+    joined = client.post("/api/games/join", json={"pin": game["pin"], "player_name": "Ana"}).json()
+    player_cookie = client.cookies["session_token"]
+    assert client.get(f"/api/games/{game['id']}").json()["session_player_id"] == joined["player"]["id"]
+
+    client.cookies.set("session_token", host_cookie)
+    assert client.delete(f"/api/players/{joined['player']['id']}").status_code == 204
+
+    client.cookies.set("session_token", player_cookie)
+    assert client.get(f"/api/games/{game['id']}").json()["session_player_id"] is None
+
+
+def test_revocations_are_reloaded_from_the_database(signed, db):
+    issued_at = int(time.time()) - 10
+    claims = decode_session_cookie(encode_session_cookie("tok", [(5, "host", None)], issued_at))
+    db.add(SessionRevocation(game_id=5))
+    db.commit()
+
+    # A worker that missed the control message picks the row up on refresh
+    fresh = RevocationList(interval=60)
+    assert not fresh.is_revoked(claims, 5)
+    fresh.refresh(db)
+    assert fresh.is_revoked(claims, 5)
+    assert not fresh.is_revoked(claims, 6)
@@ -0,0 +1,89 @@
+from backend.models import Player
+from backend.reconcile import find_drift
+
+
+def _setup(client) -> tuple[int, int, int]:
+    created = client.post("/api/games/", json={"name": "A", "chip_value": 1.0}).json()
+    ana = client.post(f"/api/games/{created['id']}/players/", json={"name": "Ana"}).json()
+    bob = client.post(f"/api/games/{created['id']}/players/", json={"name": "Bob"}).json()
+    return created["id"], ana["id"], bob["id"]
+
+
+def test_batch_records_items_and_reports_each_outcome(client, db):
+    game_id, ana, bob = _setup(client)
+
+    res = client.post(
+        f"/api/games/{game_id}/transactions/batch",
+        json={
+            "items": [
+                {"player_id": ana, "type": "buy_in", "chips": 100},
+                {"player_id": bob, "type": "buy_in", "chips": 50},
+                {"player_id": ana, "type": "cash_out", "chips": 80},
+                {"player_id": ana, "type": "cash_out", "chips": 30},
+                {"player_id": 9999, "type": "buy_in", "chips": 10},
+            ]
+        },
+    )
+
+    assert res.status_code == 200
+    payload = res.json()
+    assert (payload["created"], payload["rejected"]) == (3, 2)
+    statuses = [r["status"] for r in payload["results"]]
+    assert statuses == ["created", "created", "created", "rejected", "rejected"]
+    assert "only has 20 available" in payload["results"][3]["error"]
+    assert payload["results"][4]["error"] == "Player 9999 not found"
+    assert payload["results"][0]["transaction"]["chips"] == 100
+
+    db.expire_all()
+    assert (db.get(Player, ana).buy_in_chips, db.get(Player, ana).cash_out_chips) == (100, 80)
+    assert find_drift(db, game_id) == []
+
+
+def test_batch_respects_actual_chips_and_other_games(client):
+    game_id, ana, _ = _setup(client)
+    other = client.post("/api/games/", json={"name": "B", "chip_value": 1.0}).json()
+    stranger = client.post(f"/api/games/{other['id']}/players/", json={"name": "Cid"}).json()
+    client.post(f"/api/games/{game_id}/transactions/batch", json={"items": [{"player_id": ana, "type": "buy_in", "chips": 100}]})
+    client.patch(f"/api/players/{ana}/chips", json={"actual_chips": 40})
+
+    res = client.post(
+        f"/api/games/{game_id}/transactions/batch",
+        json={
+            "items": [
+                {"player_id": ana, "type": "cash_out", "chips": 50},
+                {"player_id": ana, "type": "buy_in", "chips": 20},
+                {"player_id": ana, "type": "cash_out", "chips": 50},
+                {"player_id": stranger["id"], "type": "buy_in", "chips": 5},
+            ]
+        },
+    ).json()
+
+    assert [r["status"] for r in res["results"]] == ["rejected", "created", "created", "rejected"]
+    detail = client.get(f"/api/games/{game_id}").json()
+    assert {p["name"]: p["actual_chips"] for p in detail["players"]}["Ana"] == 10
+
+
+def test_batch_uses_constant_number_of_statements(client, db, record_statements):
+    game_id, ana, bob = _setup(client)
+
+    def count_statements(items) -> int:
+        with record_statements(db.get_bind()) as statements:
+            assert client.post(f"/api/games/{game_id}/transactions/batch", json={"items": items}).status_code == 200
+        return len(statements)
+
+    small = count_statements([{"player_id": ana, "type": "buy_in", "chips": 1}, {"player_id": bob, "type": "buy_in", "chips": 1}])
+    large = count_statements(
+        [{"player_id": pid, "type": "buy_in", "chips": 1} for pid in (ana, bob) for _ in range(50)]
+    )
+    assert large == small
+
+
+def test_batch_rejected_on_closed_game(client):
+    game_id, ana, _ = _setup(client)
+    client.patch(f"/api/games/{game_id}/close")
+
+    res = client.post(
+        f"/api/games/{game_id}/transactions/batch",
+        json={"items": [{"player_id": ana, "type": "buy_in", "chips": 10}]},
+    )
+    assert res.status_code == 409